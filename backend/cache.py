@@ -0,0 +1,218 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+from urllib.parse import urlencode
+from cachetools import TTLCache
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """Bounded TTL/LRU cache of authenticated users keyed by user_id"""
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 60):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._version = 0  # Bumped on every invalidation
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def version(self) -> int:
+        """Invalidation counter, captured before a DB read and passed to set()"""
+        return self._version
+
+    def get(self, user_id: str) -> Optional[Any]:
+        """Return cached user or None"""
+        user = self._cache.get(user_id)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    def set(self, user_id: str, user: Any, version: Optional[int] = None):
+        """Cache user unless an invalidation happened since `version` was read"""
+        if version is not None and version != self._version:
+            return
+        self._cache[user_id] = user
+
+    def invalidate(self, user_id: str):
+        """Drop user entry after any write to the user document"""
+        self._version += 1
+        self.invalidations += 1
+        self._cache.pop(user_id, None)
+
+    def clear(self):
+        """Drop all entries"""
+        self._version += 1
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for cache sizing"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+class CachedResponse:
+    """Serialized JSON body with its ETag and extra headers (e.g. X-Next-Cursor)"""
+
+    __slots__ = ("body", "etag", "headers")
+
+    def __init__(self, body: bytes, headers: Dict[str, str]):
+        self.body = body
+        self.headers = headers
+        # Weak: equal JSON means an equal representation, not byte-identical transfer encoding.
+        # Headers are part of it, so pages with equal rows but different cursors differ.
+        digest = hashlib.blake2b(body, digest_size=16)
+        for name, value in sorted(headers.items()):
+            digest.update(f"\n{name}:{value}".encode())
+        self.etag = 'W/"' + digest.hexdigest() + '"'
+
+class ResponseCache:
+    """Rendered responses of anonymous GET routes keyed by normalized path and query.
+
+    Entries carry tags naming the entities they were built from ("cars",
+    "car:<id>", ...); writes drop every entry with a matching tag. The cache
+    is per process, so other workers see a write after at most ttl seconds,
+    and browsers or nginx after at most max_age more.
+    """
+
+    def __init__(self, maxsize: int = 2000, ttl: int = 60, max_age: int = 15):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._tags: Dict[str, Set[str]] = {}
+        self._version = 0  # Bumped on every invalidation, as in UserCache
+        self._stores_since_prune = 0
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def cache_key(request: Request) -> str:
+        path = request.url.path.rstrip("/") or "/"
+        query = sorted(
+            (name, value) for name, value in request.query_params.multi_items() if value != ""
+        )
+        return f"{path}?{urlencode(query)}" if query else path
+
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" and "x" are the same validator
+        opaque = etag[2:] if etag.startswith("W/") else etag
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == opaque:
+                return True
+        return False
+
+    async def respond(self, request: Request, tags: Iterable[str], build: Callable[[], Awaitable[Any]],
+                      response: Optional[Response] = None) -> Response:
+        """Cached response for request, calling build() on a miss.
+
+        build() returns the route's JSON content; headers it sets on the
+        route's injected response are cached along with the body. Exceptions
+        (404 and friends) are not cached.
+        """
+        key = self.cache_key(request)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            version = self._version
+            content = await build()
+            body = json.dumps(
+                jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+            entry = CachedResponse(body, dict(response.headers) if response is not None else {})
+            self._store(key, entry, tags, version)
+        else:
+            self.hits += 1
+
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": f"public, max-age={self.max_age}"}
+        if self.etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def _store(self, key: str, entry: CachedResponse, tags: Iterable[str], version: int):
+        # A write landed while the response was being built; it may predate the write
+        if version != self._version:
+            return
+        self._entries[key] = entry
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        self._stores_since_prune += 1
+        if self._stores_since_prune >= self.maxsize:
+            self._prune_tags()
+
+    def _prune_tags(self):
+        """Forget keys that expired or were evicted, so tag sets stay bounded"""
+        self._stores_since_prune = 0
+        live = set(self._entries.keys())
+        for tag in list(self._tags):
+            keys = self._tags[tag] & live
+            if keys:
+                self._tags[tag] = keys
+            else:
+                del self._tags[tag]
+
+    def invalidate(self, *tags: str):
+        """Drop every entry built from any of tags; call after the write"""
+        self._version += 1
+        self.invalidations += 1
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        self._version += 1
+        self._entries.clear()
+        self._tags.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "max_age_seconds": self.max_age,
+            "tags": len(self._tags),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations
+        }
+
+# Global instances
+user_cache = UserCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+)
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', 2000)),
+    ttl=int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', 60)),
+    max_age=int(os.environ.get('RESPONSE_CACHE_MAX_AGE_SECONDS', 15))
+)
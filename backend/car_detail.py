@@ -0,0 +1,107 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Parts of GET /cars/{id}/full besides the car itself
+DETAIL_PARTS = ("dealer", "rating", "reviews", "auction")
+DEALER_SUMMARY_FIELDS = ("id", "user_id", "company_name", "address", "phone", "email", "website",
+                         "logo_url", "rating", "reviews_count", "is_verified")
+TOP_REVIEWS = 5
+TOP_BIDS = 5
+
+class InvalidInclude(ValueError):
+    """include= names a part the detail endpoint does not have"""
+
+def parse_include(include: Optional[str]) -> Set[str]:
+    """include=None or all gives every part; include=a,b gives that subset"""
+    if not include or include == "all":
+        return set(DETAIL_PARTS)
+    parts = {part.strip() for part in include.split(",") if part.strip()}
+    unknown = sorted(parts - set(DETAIL_PARTS))
+    if unknown:
+        raise InvalidInclude(f"Unknown include parts: {', '.join(unknown)}")
+    return parts
+
+def _dealer_lookup(parts: Set[str]) -> Dict[str, Any]:
+    pipeline: List[Dict[str, Any]] = [
+        {"$limit": 1},
+        {"$project": {"_id": 0, **{name: 1 for name in DEALER_SUMMARY_FIELDS}}}
+    ]
+    # Reviews hang off the dealer profile id, so they are looked up from inside the dealer
+    if "rating" in parts:
+        pipeline.append({"$lookup": {
+            "from": "reviews", "localField": "id", "foreignField": "dealer_id", "as": "rating_histogram",
+            "pipeline": [{"$group": {"_id": "$rating", "count": {"$sum": 1}}}]
+        }})
+    if "reviews" in parts:
+        pipeline.append({"$lookup": {
+            "from": "reviews", "localField": "id", "foreignField": "dealer_id", "as": "top_reviews",
+            "pipeline": [
+                {"$sort": {"rating": -1, "created_at": -1}},
+                {"$limit": TOP_REVIEWS},
+                {"$project": {"_id": 0}}
+            ]
+        }})
+    return {"$lookup": {
+        "from": "dealers", "localField": "dealer_id", "foreignField": "user_id", "as": "dealer",
+        "pipeline": pipeline
+    }}
+
+def _auction_lookup(now: datetime) -> Dict[str, Any]:
+    return {"$lookup": {
+        "from": "auctions", "localField": "id", "foreignField": "car_id", "as": "auction",
+        "pipeline": [
+            {"$match": {"status": "active", "end_time": {"$gt": now}}},
+            {"$sort": {"created_at": -1}},
+            {"$limit": 1},
+            {"$project": {"_id": 0}},
+            {"$lookup": {
+                "from": "bids", "localField": "id", "foreignField": "auction_id", "as": "top_bids",
+                "pipeline": [{"$sort": {"amount": -1}}, {"$limit": TOP_BIDS}, {"$project": {"_id": 0}}]
+            }}
+        ]
+    }}
+
+def car_detail_pipeline(car_id: str, parts: Set[str], now: datetime) -> List[Dict[str, Any]]:
+    """One aggregation over cars: the car, then a $lookup per requested part"""
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"id": car_id}},
+        {"$limit": 1},
+        {"$project": {"_id": 0}}
+    ]
+    if parts & {"dealer", "rating", "reviews"}:
+        pipeline.append(_dealer_lookup(parts))
+    if "auction" in parts:
+        pipeline.append(_auction_lookup(now))
+    return pipeline
+
+def shape_car_detail(raw: Dict[str, Any], parts: Set[str]) -> Dict[str, Any]:
+    """Split the aggregation output into the response parts; the car is returned as stored"""
+    dealer = (raw.pop("dealer", None) or [None])[0]
+    auction = (raw.pop("auction", None) or [None])[0]
+    detail: Dict[str, Any] = {"car": raw}
+
+    histogram = (dealer or {}).pop("rating_histogram", [])
+    reviews = (dealer or {}).pop("top_reviews", [])
+    if "dealer" in parts:
+        detail["dealer"] = dealer
+    if "rating" in parts:
+        counts = {str(stars): 0 for stars in range(1, 6)}
+        for row in histogram:
+            counts[str(row["_id"])] = row["count"]
+        detail["rating"] = {
+            "average": dealer["rating"] if dealer else None,
+            "count": sum(counts.values()),
+            "histogram": counts
+        }
+    if "reviews" in parts:
+        detail["reviews"] = reviews
+    if "auction" in parts:
+        if auction:
+            top_bids = auction.pop("top_bids")
+            auction["next_min_bid"] = auction["current_price"] + auction.get("min_bid_increment", 0)
+            auction["top_bids"] = top_bids
+        detail["auction"] = auction
+    return detail
@@ -0,0 +1,281 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from catalog_keys import normalize_key
+
+logger = logging.getLogger(__name__)
+
+# Statuses under which a car is on the market; the unique VIN index only covers these,
+# so a sold car can be listed again by whoever owns it next
+LISTED_STATUSES = ("available", "reserved")
+VIN_INDEX_FILTER = {"vin_key": {"$exists": True}, "status": {"$in": list(LISTED_STATUSES)}}
+DUPLICATE_VIN_MESSAGE = "A listing with this VIN already exists"
+
+# Mileage grids for the fingerprint; two offset grids make any two readings
+# less than half a bucket apart share at least one cell. The same-dealer grid
+# is coarse because reposts often come with an edited mileage.
+MILEAGE_BUCKET_KM = 2000
+DEALER_MILEAGE_BUCKET_KM = 20000
+# Bump when fingerprint() changes so the backfill recomputes stored fingerprints
+FINGERPRINT_VERSION = 2
+FINGERPRINT_SOURCE_FIELDS = {"_id": 1, "id": 1, "dealer_id": 1, "status": 1, "vin": 1, "brand": 1, "model": 1,
+                             "year": 1, "mileage": 1, "color": 1}
+SCAN_FIELDS = {**FINGERPRINT_SOURCE_FIELDS, "_id": 0, "vin_key": 1, "dup_fingerprint": 1, "dup_fingerprint_version": 1}
+
+# Letters VINs never contain, mapped to the digits they get mistyped for
+VIN_CONFUSABLES = str.maketrans({"I": "1", "O": "0", "Q": "0"})
+
+def normalize_vin(vin: Optional[str]) -> Optional[str]:
+    """Uppercase VIN without separators and with I/O/Q read as 1/0/0; None when empty"""
+    if not vin:
+        return None
+    key = re.sub(r"[^A-Z0-9]", "", vin.upper()).translate(VIN_CONFUSABLES)
+    return key or None
+
+def _band(name: str, *parts: Any) -> str:
+    digest = hashlib.blake2b("\x1f".join(str(part) for part in parts).encode(), digest_size=8).hexdigest()
+    return f"{name}:{digest}"
+
+def _mileage_bands(name: str, parts: tuple, mileage: Any, bucket_km: int) -> List[str]:
+    if mileage is None:
+        return [_band(name, *parts, None)]
+    return [_band(name, *parts, offset, (int(mileage) + offset) // bucket_km) for offset in (0, bucket_km // 2)]
+
+def fingerprint(car: Dict[str, Any]) -> List[str]:
+    """Locality-sensitive bands of (brand, model, year, color, mileage bucket, dealer).
+
+    Two listings are candidate duplicates when any band matches: the same
+    dealer reposting the vehicle with roughly the same mileage, or any dealer
+    listing it with nearly the same mileage. New cars (0 km) get no bands, as
+    identical new cars of one fleet would all match; only their VIN links them.
+    """
+    mileage = car.get("mileage")
+    if mileage == 0:
+        return []
+    vehicle = (normalize_key(car.get("brand")), normalize_key(car.get("model")), car.get("year"),
+               normalize_key(car.get("color")))
+    return [
+        *_mileage_bands("dealer", (car.get("dealer_id"), *vehicle), mileage, DEALER_MILEAGE_BUCKET_KM),
+        *_mileage_bands("mileage", vehicle, mileage, MILEAGE_BUCKET_KM)
+    ]
+
+def duplicate_keys(car: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields stored alongside every car write; vin_key is left out when there is no VIN"""
+    keys: Dict[str, Any] = {"dup_fingerprint": fingerprint(car), "dup_fingerprint_version": FINGERPRINT_VERSION}
+    vin_key = normalize_vin(car.get("vin"))
+    if vin_key:
+        keys["vin_key"] = vin_key
+    return keys
+
+def write_error_message(error: Dict[str, Any]) -> str:
+    """Client-facing text for one bulk write error"""
+    if error.get("code") == 11000:
+        return DUPLICATE_VIN_MESSAGE
+    return error["errmsg"]
+
+async def update_duplicate_keys(cars_collection, query: Dict[str, Any], batch_size: int = 500) -> int:
+    """Recompute vin_key/dup_fingerprint for the cars matching query.
+
+    Only the first listed car seen per VIN gets vin_key; the checks below do
+    not rely on the unique index existing yet, so a backfill run before it
+    is built leaves nothing that would make the build fail. A car whose VIN
+    is taken gets its fingerprint only; it is logged and still found by the
+    duplicate scanner through its raw VIN.
+    """
+    updated = 0
+    conflicts = 0
+    claimed: Set[str] = set()  # vin_keys given to listed cars during this run
+
+    async def write(batch):
+        nonlocal updated, conflicts
+        vin_keys = [keys["vin_key"] for _, keys, listed in batch if listed and "vin_key" in keys]
+        taken = set()
+        if vin_keys:
+            async for car in cars_collection.find({
+                "vin_key": {"$in": vin_keys},
+                "status": {"$in": list(LISTED_STATUSES)},
+                "_id": {"$nin": [car_id for car_id, _, _ in batch]}
+            }, {"_id": 0, "vin_key": 1}):
+                taken.add(car["vin_key"])
+
+        operations = []
+        for car_id, keys, listed in batch:
+            if listed and keys.get("vin_key"):
+                if keys["vin_key"] in taken or keys["vin_key"] in claimed:
+                    conflicts += 1
+                    keys = {name: value for name, value in keys.items() if name != "vin_key"}
+                else:
+                    claimed.add(keys["vin_key"])
+            update: Dict[str, Any] = {"$set": keys}
+            if "vin_key" not in keys:
+                update["$unset"] = {"vin_key": ""}
+            operations.append(UpdateOne({"_id": car_id}, update))
+        try:
+            result = await cars_collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            return
+        except BulkWriteError as e:
+            updated += e.details.get("nModified", 0)
+            raced = [error["index"] for error in e.details.get("writeErrors", []) if error.get("code") == 11000]
+        if raced:
+            # Another write took the VIN between the check and this batch
+            conflicts += len(raced)
+            result = await cars_collection.bulk_write([
+                UpdateOne({"_id": batch[index][0]},
+                          {"$set": {name: value for name, value in batch[index][1].items() if name != "vin_key"},
+                           "$unset": {"vin_key": ""}})
+                for index in raced
+            ], ordered=False)
+            updated += result.modified_count
+
+    batch = []
+    async for car in cars_collection.find(query, FINGERPRINT_SOURCE_FIELDS):
+        batch.append((car["_id"], duplicate_keys(car), car.get("status") in LISTED_STATUSES))
+        if len(batch) >= batch_size:
+            await write(batch)
+            batch = []
+    if batch:
+        await write(batch)
+
+    if conflicts:
+        logger.warning(f"{conflicts} cars share a VIN with another listing; run car_duplicates.py to list them")
+    return updated
+
+async def backfill_duplicate_keys(cars_collection) -> int:
+    """Set vin_key/dup_fingerprint on cars written before they existed or before
+    the fingerprint last changed; safe to re-run.
+
+    Listed cars left without vin_key because their VIN was taken are
+    retried too, so one gets it once the other listing is gone.
+    """
+    updated = await update_duplicate_keys(cars_collection, {"$or": [
+        {"dup_fingerprint_version": {"$ne": FINGERPRINT_VERSION}},
+        {"vin_key": {"$exists": False}, "vin": {"$nin": [None, ""]}, "status": {"$in": list(LISTED_STATUSES)}}
+    ]})
+    if updated:
+        logger.info(f"Backfilled duplicate keys on {updated} cars")
+    return updated
+
+async def refresh_duplicate_keys(cars_collection, car_ids: Iterable[str]) -> int:
+    """Recompute after a partial update (e.g. an import upsert) that could not derive them itself"""
+    car_ids = list(car_ids)
+    if not car_ids:
+        return 0
+    return await update_duplicate_keys(cars_collection, {"id": {"$in": car_ids}})
+
+class _Clusters:
+    """Union-find over scanned cars; a component carries at most one known VIN"""
+
+    def __init__(self):
+        self.parent: List[int] = []
+        self.vin: List[Optional[str]] = []
+        self.reasons: List[Set[str]] = []
+
+    def add(self, vin_key: Optional[str]) -> int:
+        self.parent.append(len(self.parent))
+        self.vin.append(vin_key)
+        self.reasons.append(set())
+        return len(self.parent) - 1
+
+    def find(self, node: int) -> int:
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a: int, b: int, reason: str) -> bool:
+        """Merge unless the two sides carry different VINs (then they are different vehicles)"""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            self.reasons[a].add(reason)
+            return True
+        if self.vin[a] and self.vin[b] and self.vin[a] != self.vin[b]:
+            return False
+        self.parent[b] = a
+        self.vin[a] = self.vin[a] or self.vin[b]
+        self.reasons[a] |= self.reasons[b] | {reason}
+        return True
+
+async def find_duplicate_clusters(cars_collection, min_size: int = 2) -> Dict[str, Any]:
+    """Group listed cars into duplicate clusters in one pass over the catalog.
+
+    Each car is hashed into its VIN and fingerprint buckets; a bucket keeps
+    the components already seen in it and the car is merged into the first
+    compatible one, so the work is linear in the number of cars instead of
+    pairwise. Cars with different known VINs are never merged.
+    """
+    clusters = _Clusters()
+    buckets: Dict[str, List[int]] = {}
+    cars: List[Dict[str, Any]] = []
+
+    cursor = cars_collection.find({"status": {"$in": list(LISTED_STATUSES)}}, SCAN_FIELDS)
+    async for car in cursor:
+        vin_key = car.get("vin_key") or normalize_vin(car.get("vin"))
+        node = clusters.add(vin_key)
+        cars.append({"id": car["id"], "dealer_id": car.get("dealer_id"), "vin": vin_key})
+
+        if car.get("dup_fingerprint_version") == FINGERPRINT_VERSION:
+            band_keys = car.get("dup_fingerprint") or []
+        else:
+            band_keys = fingerprint(car)
+        if vin_key:
+            band_keys = [f"vin:{vin_key}", *band_keys]
+        for band_key in band_keys:
+            reason = band_key.split(":", 1)[0]
+            seen = buckets.setdefault(band_key, [])
+            if not any(clusters.union(other, node, reason) for other in seen):
+                seen.append(node)
+
+    members: Dict[int, List[int]] = {}
+    for node in range(len(cars)):
+        members.setdefault(clusters.find(node), []).append(node)
+
+    found = []
+    for root, nodes in members.items():
+        if len(nodes) < min_size:
+            continue
+        found.append({
+            "car_ids": [cars[node]["id"] for node in nodes],
+            "dealer_ids": sorted({cars[node]["dealer_id"] for node in nodes if cars[node]["dealer_id"]}),
+            "vin": clusters.vin[root],
+            "reasons": sorted(clusters.reasons[root])
+        })
+    found.sort(key=lambda cluster: -len(cluster["car_ids"]))
+    return {"scanned": len(cars), "clusters": found}
+
+async def _main(argv: List[str]):
+    import json
+    import argparse
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="List duplicate listing clusters")
+    parser.add_argument("--backfill", action="store_true", help="set vin_key/dup_fingerprint on older cars first")
+    parser.add_argument("--min-size", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        cars = client[os.environ['DB_NAME']].cars
+        if args.backfill:
+            print(f"Backfilled duplicate keys on {await backfill_duplicate_keys(cars)} cars")
+        result = await find_duplicate_clusters(cars, args.min_size)
+        for cluster in result["clusters"]:
+            print(json.dumps(cluster, ensure_ascii=False))
+        print(f"Scanned {result['scanned']} cars, {len(result['clusters'])} duplicate clusters")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
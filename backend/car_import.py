@@ -0,0 +1,309 @@
+import csv
+import json
+import codecs
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from starlette.responses import StreamingResponse
+from car_duplicates import write_error_message, LISTED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/x-jsonlines": "jsonl",
+}
+LIST_FIELDS = ("images", "features")
+LIST_SEPARATOR = "|"
+MAX_LINE_CHARS = 1 << 20
+# Fields an upsert by VIN must not overwrite on an existing listing
+INSERT_ONLY_FIELDS = ("id", "dealer_id", "status", "created_at")
+STATS_FIELDS = {"_id": 0, "id": 1, "vin_key": 1, "status": 1, "vehicle_type": 1, "price": 1}
+
+# (row number, payload, error) as produced by the readers
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+class ImportFormatError(ValueError):
+    """The stream cannot be read any further (encoding, oversized line, bad header)"""
+
+def detect_format(content_type: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """csv or jsonl from ?format= or the Content-Type, None when neither says"""
+    if requested:
+        return requested
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPES.get(media_type)
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_chars: int = MAX_LINE_CHARS) -> AsyncIterator[str]:
+    """Decode a byte stream to lines without holding more than one line in memory"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        try:
+            pending += decoder.decode(chunk)
+        except UnicodeDecodeError:
+            raise ImportFormatError("Input is not valid UTF-8")
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(pending) > max_line_chars:
+            raise ImportFormatError(f"Line longer than {max_line_chars} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def csv_payload(header: List[str], values: List[str]) -> Dict[str, Any]:
+    """Row dict with blanks dropped and list columns split on '|'"""
+    payload = {}
+    for name, value in zip(header, values):
+        value = value.strip()
+        if not value:
+            continue
+        if name in LIST_FIELDS:
+            payload[name] = [part.strip() for part in value.split(LIST_SEPARATOR) if part.strip()]
+        else:
+            payload[name] = value
+    return payload
+
+def _ends_in_quotes(line: str, delimiter: str, in_quotes: bool) -> bool:
+    """Whether a quoted field is still open after line, given the state at its start.
+
+    Like csv.reader, a quote only opens a field when it is the field's first
+    character, so an unquoted 17" is plain text; inside a field "" is an
+    escaped quote.
+    """
+    if not in_quotes and '"' not in line:
+        return False
+    field_start = not in_quotes
+    i = 0
+    while i < len(line):
+        ch = line[i]
+        if in_quotes:
+            if ch == '"':
+                if line[i + 1:i + 2] == '"':
+                    i += 2
+                    continue
+                in_quotes = False
+        elif ch == '"' and field_start:
+            in_quotes = True
+        field_start = not in_quotes and ch == delimiter
+        i += 1
+    return in_quotes
+
+async def iter_csv_records(lines: AsyncIterator[str], max_record_chars: int = MAX_LINE_CHARS) -> AsyncIterator[Record]:
+    """CSV with a header row; ',' or ';' (spreadsheet exports) as the delimiter"""
+    header = None
+    delimiter = None
+    record: List[str] = []
+    record_chars = 0
+    in_quotes = False
+    row = 0
+    async for line in lines:
+        if delimiter is None:
+            if not line.strip():
+                continue
+            delimiter = ";" if line.count(";") > line.count(",") else ","
+        record.append(line)
+        record_chars += len(line) + 1
+        in_quotes = _ends_in_quotes(line, delimiter, in_quotes)
+        if in_quotes:
+            if record_chars <= max_record_chars:
+                continue  # Inside a quoted field that spans lines
+            if header is None:
+                raise ImportFormatError(f"CSV header longer than {max_record_chars} characters")
+            # Drop the runaway record and resync on the next line
+            row += 1
+            yield row, None, f"Record longer than {max_record_chars} characters (unterminated quoted field?)"
+            record, record_chars, in_quotes = [], 0, False
+            continue
+        text = "\n".join(record)
+        record, record_chars = [], 0
+        if not text.strip():
+            continue
+
+        if header is None:
+            header = [name.strip() for name in next(csv.reader([text], delimiter=delimiter))]
+            if not all(header) or len(set(header)) != len(header):
+                raise ImportFormatError("CSV header must name every column once")
+            continue
+
+        row += 1
+        values = next(csv.reader([text], delimiter=delimiter))
+        if len(values) > len(header):
+            yield row, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row, csv_payload(header, values), None
+
+    if record:
+        yield row + 1, None, "Unterminated quoted field"
+
+async def iter_jsonl_records(lines: AsyncIterator[str]) -> AsyncIterator[Record]:
+    """One JSON object per line; blank lines are skipped"""
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            payload = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(payload, dict):
+            yield row, None, "Row must be a JSON object"
+            continue
+        yield row, payload, None
+
+def read_records(chunks: AsyncIterator[bytes], import_format: str) -> AsyncIterator[Record]:
+    lines = iter_lines(chunks)
+    return iter_csv_records(lines) if import_format == "csv" else iter_jsonl_records(lines)
+
+class UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse for a body generator that itself reads the request stream.
+
+    The stock class listens for a disconnect on receive() while streaming,
+    which would swallow upload chunks; here a dropped client surfaces as
+    ClientDisconnect from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def validation_messages(error: Exception) -> List[str]:
+    if isinstance(error, ValidationError):
+        return [
+            f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+            for detail in error.errors()
+        ]
+    return [str(error)]
+
+class CarImporter:
+    """Validates rows one at a time and writes them in batches through one bulk_write each.
+
+    Rows with a VIN are upserted on the dealer's listed car with that vin_key, so
+    re-importing a file updates listings instead of duplicating them, and a
+    sold car with the VIN is left alone (the row lists it again); an update only touches the
+    columns the row has. Rows without a VIN are inserted. run() yields NDJSON-ready events: an error per rejected row,
+    progress after every batch and a final summary.
+    """
+
+    def __init__(self, cars_collection, dealer_id: str,
+                 build_document: Callable[[Dict[str, Any]], Tuple[Dict[str, Any], Set[str]]],
+                 on_batch: Callable[[List[Tuple[Optional[Dict], Dict]], List[str]], Awaitable[None]],
+                 batch_size: int = 500):
+        self.cars = cars_collection
+        self.dealer_id = dealer_id
+        self.build_document = build_document  # payload -> (new car document, fields an upsert may overwrite)
+        self.on_batch = on_batch  # (stats changes, ids of updated cars) after each write
+        self.batch_size = batch_size
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+
+    def progress(self, event: str = "progress") -> Dict[str, Any]:
+        return {"event": event, "rows": self.rows, "inserted": self.inserted, "updated": self.updated, "failed": self.failed}
+
+    def error(self, row: int, errors: List[str]) -> Dict[str, Any]:
+        self.failed += 1
+        return {"event": "error", "row": row, "errors": errors}
+
+    async def run(self, records: AsyncIterator[Record]) -> AsyncIterator[Dict[str, Any]]:
+        batch: List[Tuple[int, Dict[str, Any], Set[str]]] = []
+        batch_vins = set()
+        try:
+            async for row, payload, problem in records:
+                self.rows += 1
+                if problem:
+                    yield self.error(row, [problem])
+                    continue
+                try:
+                    document, update_fields = self.build_document(payload)
+                except (ValidationError, ValueError) as e:
+                    yield self.error(row, validation_messages(e))
+                    continue
+
+                vin_key = document.get("vin_key")
+                if vin_key in batch_vins:
+                    # Two upserts of one VIN in an unordered batch could both insert
+                    for event in await self.flush(batch):
+                        yield event
+                    batch, batch_vins = [], set()
+                batch.append((row, document, update_fields))
+                if vin_key:
+                    batch_vins.add(vin_key)
+
+                if len(batch) >= self.batch_size:
+                    for event in await self.flush(batch):
+                        yield event
+                    batch, batch_vins = [], set()
+        except ImportFormatError as e:
+            for event in await self.flush(batch):
+                yield event
+            yield {**self.progress("summary"), "aborted": str(e)}
+            return
+
+        for event in await self.flush(batch):
+            yield event
+        yield self.progress("summary")
+
+    async def flush(self, batch: List[Tuple[int, Dict[str, Any], Set[str]]]) -> List[Dict[str, Any]]:
+        """Write one batch; returns per-row write errors followed by a progress event"""
+        if not batch:
+            return []
+
+        vin_keys = [document["vin_key"] for _, document, _ in batch if document.get("vin_key")]
+        existing = {}
+        if vin_keys:
+            async for car in self.cars.find({
+                "dealer_id": self.dealer_id,
+                "vin_key": {"$in": vin_keys},
+                "status": {"$in": list(LISTED_STATUSES)}
+            }, STATS_FIELDS):
+                existing[car["vin_key"]] = car
+
+        operations = []
+        for _, document, update_fields in batch:
+            if document.get("vin_key"):
+                fields = {name: document[name] for name in update_fields if name not in INSERT_ONLY_FIELDS}
+                fields["vin"] = document["vin"]
+                operations.append(UpdateOne(
+                    {"dealer_id": self.dealer_id, "vin_key": document["vin_key"], "status": {"$in": list(LISTED_STATUSES)}},
+                    {"$set": fields, "$setOnInsert": {name: value for name, value in document.items() if name not in fields}},
+                    upsert=True
+                ))
+            else:
+                operations.append(InsertOne(document))
+
+        write_errors = {}
+        try:
+            await self.cars.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            write_errors = {error["index"]: write_error_message(error) for error in e.details.get("writeErrors", [])}
+
+        events = []
+        changes = []
+        updated_ids = []
+        for index, (row, document, update_fields) in enumerate(batch):
+            if index in write_errors:
+                events.append(self.error(row, [write_errors[index]]))
+                continue
+            before = existing.get(document.get("vin_key"))
+            if before:
+                self.updated += 1
+                updated_ids.append(before["id"])
+                after = {**before, **{name: document[name] for name in ("vehicle_type", "price") if name in update_fields}}
+                changes.append((before, after))
+            else:
+                self.inserted += 1
+                changes.append((None, document))
+
+        await self.on_batch(changes, updated_ids)
+        events.append(self.progress())
+        return events
@@ -0,0 +1,115 @@
+import json
+import logging
+from typing import Any, Dict, List
+from cachetools import TTLCache
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+# Price bucket boundaries in RUB; the last bucket is open-ended
+PRICE_BUCKETS = [0, 500_000, 1_000_000, 2_000_000, 3_000_000, 5_000_000, 10_000_000, 20_000_000, 50_000_000]
+BRAND_FACET_LIMIT = 50
+
+def _counts(field: str, limit: int = None) -> List[Dict[str, Any]]:
+    stages = [
+        {"$match": {field: {"$nin": [None, ""]}}},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}}
+    ]
+    if limit:
+        stages.append({"$limit": limit})
+    return stages
+
+def facet_pipeline(filter_query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One $match (served by the catalog indexes) followed by a $facet with every breakdown"""
+    return [
+        {"$match": filter_query},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "vehicle_types": _counts("vehicle_type"),
+            "brands": [
+                {"$group": {"_id": "$brand_key", "brand": {"$first": "$brand"}, "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": BRAND_FACET_LIMIT}
+            ],
+            "fuel_types": _counts("fuel_type"),
+            "transmissions": _counts("transmission"),
+            "years": [
+                {"$group": {"_id": None, "min": {"$min": "$year"}, "max": {"$max": "$year"}}}
+            ],
+            "prices": [
+                # Legacy cars may have a missing or string price; keep them out of $bucket's default
+                {"$match": {"price": {"$type": "number"}}},
+                {"$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": PRICE_BUCKETS,
+                    "default": "other",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ]
+        }}
+    ]
+
+def shape_facets(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn the $facet output into the API response"""
+    years = raw["years"][0] if raw["years"] else {}
+
+    prices = []
+    for bucket in raw["prices"]:
+        if bucket["_id"] == "other":
+            # Prices are numeric (matched above) and never negative, so only values above the last boundary land here
+            prices.append({"min": PRICE_BUCKETS[-1], "max": None, "count": bucket["count"]})
+            continue
+        index = PRICE_BUCKETS.index(bucket["_id"])
+        upper = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+        prices.append({"min": bucket["_id"], "max": upper, "count": bucket["count"]})
+
+    def values(rows):
+        return [{"value": row["_id"], "count": row["count"]} for row in rows]
+
+    return {
+        "total": raw["total"][0]["count"] if raw["total"] else 0,
+        "vehicle_types": values(raw["vehicle_types"]),
+        "brands": [
+            {"value": row["brand"], "key": row["_id"], "count": row["count"]}
+            for row in raw["brands"] if row["_id"]
+        ],
+        "fuel_types": values(raw["fuel_types"]),
+        "transmissions": values(raw["transmissions"]),
+        "years": {"min": years.get("min"), "max": years.get("max")},
+        "prices": prices
+    }
+
+def empty_facets() -> Dict[str, Any]:
+    """Response for a filter that matches no cars"""
+    return shape_facets({name: [] for name in ("total", "vehicle_types", "brands", "fuel_types",
+                                               "transmissions", "years", "prices")})
+
+class CatalogFacets:
+    """Facet counts for a catalog filter, cached briefly per normalized filter"""
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 30):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cache_key(filter_query: Dict[str, Any]) -> str:
+        # Filters are built from normalized parameters, so equal filters serialize identically
+        return json.dumps(json.loads(json_util.dumps(filter_query)), sort_keys=True)
+
+    async def get(self, cars_collection, filter_query: Dict[str, Any]) -> Dict[str, Any]:
+        key = self.cache_key(filter_query)
+        facets = self._cache.get(key)
+        if facets is not None:
+            self.hits += 1
+            return facets
+
+        self.misses += 1
+        raw = await cars_collection.aggregate(facet_pipeline(filter_query)).to_list(length=1)
+        facets = shape_facets(raw[0])
+        self._cache[key] = facets
+        return facets
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"size": len(self._cache), "ttl_seconds": self._cache.ttl, "hits": self.hits, "misses": self.misses}
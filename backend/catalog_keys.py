@@ -0,0 +1,123 @@
+import os
+import re
+import asyncio
+import logging
+import unicodedata
+from typing import Any, Dict, Optional
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Cyrillic -> Latin, close to the passport transliteration used on Russian listings
+TRANSLITERATION = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya"
+}
+
+# Common Russian spellings of brands whose transliteration differs from the Latin name
+WORD_ALIASES = {
+    "мерседес": "mercedes", "бенц": "benz", "бмв": "bmw", "ауди": "audi", "тойота": "toyota",
+    "лексус": "lexus", "порше": "porsche", "фольксваген": "volkswagen", "шкода": "skoda",
+    "киа": "kia", "хендай": "hyundai", "хундай": "hyundai", "хёндай": "hyundai",
+    "ниссан": "nissan", "мазда": "mazda", "рено": "renault", "форд": "ford",
+    "шевроле": "chevrolet", "вольво": "volvo", "ягуар": "jaguar", "ленд": "land",
+    "рендж": "range", "ровер": "rover", "феррари": "ferrari", "ламборгини": "lamborghini",
+    "бентли": "bentley", "майбах": "maybach", "хонда": "honda", "мицубиси": "mitsubishi",
+    "субару": "subaru", "сузуки": "suzuki", "ямаха": "yamaha", "харлей": "harley",
+    "кавасаки": "kawasaki", "дукати": "ducati", "цессна": "cessna"
+}
+
+WORD_SPLIT = re.compile(r"[\W_]+")
+
+def normalize_key(text: Optional[str]) -> str:
+    """Lowercase, transliterated, diacritic-free form of a brand/model name.
+
+    Words are joined by single spaces, so "Mercedes-Benz", "mercedes benz"
+    and "Мерседес Бенц" share the key "mercedes benz".
+    """
+    if not text:
+        return ""
+
+    words = []
+    for word in WORD_SPLIT.split(text.lower()):
+        if not word:
+            continue
+        word = WORD_ALIASES.get(word) or "".join(TRANSLITERATION.get(ch, ch) for ch in word)
+        word = "".join(ch for ch in unicodedata.normalize("NFKD", word) if not unicodedata.combining(ch))
+        word = re.sub(r"[^a-z0-9]", "", word)
+        if word:
+            words.append(word)
+    return " ".join(words)
+
+def car_search_keys(brand: Optional[str], model: Optional[str]) -> Dict[str, str]:
+    """Fields stored alongside brand/model on every car write"""
+    return {"brand_key": normalize_key(brand), "model_key": normalize_key(model)}
+
+def key_condition(text: Optional[str], exact: bool = False) -> Optional[Any]:
+    """Equality or anchored prefix condition on a *_key field; None when input normalizes to nothing.
+
+    The prefix regex is case-sensitive, anchored and built from escaped input,
+    so MongoDB turns it into a bounded index range scan.
+    """
+    key = normalize_key(text)
+    if not key:
+        return None
+    if exact:
+        return key
+    return {"$regex": "^" + re.escape(key)}
+
+def apply_brand_model_filter(filter_query: Dict[str, Any], brand: Optional[str] = None,
+                             model: Optional[str] = None) -> Dict[str, Any]:
+    """Add brand_key/model_key prefix conditions to a catalog filter"""
+    brand_condition = key_condition(brand)
+    if brand_condition is not None:
+        filter_query["brand_key"] = brand_condition
+    model_condition = key_condition(model)
+    if model_condition is not None:
+        filter_query["model_key"] = model_condition
+    return filter_query
+
+async def backfill_search_keys(cars_collection, batch_size: int = 500) -> int:
+    """Set brand_key/model_key on cars written before the keys existed; safe to re-run"""
+    missing = {"$or": [{"brand_key": {"$exists": False}}, {"model_key": {"$exists": False}}]}
+    cursor = cars_collection.find(missing, {"_id": 1, "brand": 1, "model": 1})
+
+    updated = 0
+    batch = []
+    async for car in cursor:
+        batch.append(UpdateOne(
+            {"_id": car["_id"]},
+            {"$set": car_search_keys(car.get("brand"), car.get("model"))}
+        ))
+        if len(batch) >= batch_size:
+            result = await cars_collection.bulk_write(batch, ordered=False)
+            updated += result.modified_count
+            batch = []
+
+    if batch:
+        result = await cars_collection.bulk_write(batch, ordered=False)
+        updated += result.modified_count
+
+    if updated:
+        logger.info(f"Backfilled search keys on {updated} cars")
+    return updated
+
+async def _main():
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        updated = await backfill_search_keys(client[os.environ['DB_NAME']].cars)
+        print(f"Backfilled search keys on {updated} cars")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,62 @@
+import re
+import logging
+from typing import Any, Dict, List, Optional
+from pymongo import TEXT
+from catalog_keys import normalize_key
+
+logger = logging.getLogger(__name__)
+
+TEXT_INDEX_NAME = "catalog_text"
+
+# status is an equality prefix of the text index: every search must filter on it.
+# The index is built at startup by the index manager (indexes.py).
+TEXT_INDEX_KEYS = [
+    ("status", 1),
+    ("brand", TEXT), ("model", TEXT),
+    ("brand_key", TEXT), ("model_key", TEXT),
+    ("features", TEXT), ("location", TEXT), ("color", TEXT),
+    ("description", TEXT)
+]
+
+TEXT_INDEX_WEIGHTS = {
+    "brand": 10, "brand_key": 10,
+    "model": 8, "model_key": 8,
+    "features": 3,
+    "location": 2, "color": 2,
+    "description": 1
+}
+
+# Quotes and leading '-' change $text semantics (phrases, negation); user input is plain words
+SEARCH_TOKEN = re.compile(r"\w+(?:[-.]\w+)*")
+
+def build_search_string(query: str) -> str:
+    """$search string: user words plus their transliterated keys, so "мерседес" matches "Mercedes" """
+    words = SEARCH_TOKEN.findall(query.lower())
+    for word in normalize_key(query).split():
+        if word not in words:
+            words.append(word)
+    return " ".join(words)
+
+def text_filter(query: str) -> Optional[Dict[str, Any]]:
+    """{"$text": ...} condition, or None when the query has no searchable words"""
+    search = build_search_string(query)
+    if not search:
+        return None
+    return {"$text": {"$search": search}}
+
+async def search_cars(cars_collection, query: str, filter_query: Dict[str, Any], limit: int,
+                      projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Relevance-ranked cars matching query; filter_query must contain status equality"""
+    condition = text_filter(query)
+    if condition is None:
+        return []
+
+    score = {"$meta": "textScore"}
+    cars = await cars_collection.find(
+        {**filter_query, **condition},
+        {**(projection or {}), "score": score}
+    ).sort([("score", score), ("id", 1)]).limit(limit).to_list(length=None)
+
+    for car in cars:
+        car.pop("score", None)
+    return cars
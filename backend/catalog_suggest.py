@@ -0,0 +1,219 @@
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from catalog_keys import WORD_ALIASES, WORD_SPLIT, normalize_key
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_FIELDS = {"_id": 0, "id": 1, "status": 1, "brand": 1, "model": 1}
+# Sorts after every character normalize_key produces, so key + KEY_END bounds a prefix range
+KEY_END = "\U0010ffff"
+
+# (brand_key, model_key); model_key is "" for the brand itself
+EntryKey = Tuple[str, str]
+
+class CatalogSuggest:
+    """Brand and brand+model autocomplete over available cars, kept in process memory.
+
+    Every entry is reachable under normalized (transliterated) keys: the brand,
+    the model and "brand model". The keys live in one sorted list with a
+    parallel NumPy array of entry ids, so a prefix is two bisects and the
+    ranking an argpartition over listing counts held in another array.
+    Counts are patched on car writes; an entry that drops to zero stays,
+    hidden, until the next rebuild.
+    """
+
+    def __init__(self):
+        self.cars_collection = None
+        self.built_at: Optional[float] = None
+        self._dirty: Optional[Set[str]] = None
+        self._reset()
+
+    def _reset(self):
+        self.keys: List[str] = []
+        self.key_entries = np.zeros(0, dtype=np.int32)
+        self.entries: List[Dict[str, Any]] = []
+        self.entry_ids: Dict[EntryKey, int] = {}
+        self.brand_of: List[int] = []  # Entry id -> id of its brand entry
+        self.counts = np.zeros(1024, dtype=np.int64)
+        self.cars: Dict[str, int] = {}  # Available car id -> its model entry id
+        self._loading_keys: Optional[List[Tuple[str, int]]] = None
+
+    def bind(self, cars_collection):
+        self.cars_collection = cars_collection
+
+    def _add_key(self, key: str, entry_id: int):
+        if self._loading_keys is not None:
+            self._loading_keys.append((key, entry_id))
+            return
+        start = bisect_left(self.keys, key)
+        end = bisect_left(self.keys, key + "\0")
+        if entry_id in self.key_entries[start:end]:
+            return
+        self.keys.insert(end, key)
+        self.key_entries = np.insert(self.key_entries, end, entry_id)
+
+    def _entry(self, brand: str, model: str, brand_key: str, model_key: str) -> int:
+        entry_id = self.entry_ids.get((brand_key, model_key))
+        if entry_id is not None:
+            return entry_id
+
+        brand_id = self._entry(brand, "", brand_key, "") if model_key else len(self.entries)
+        entry_id = len(self.entries)
+        if model_key:
+            self.entries.append({"type": "model", "brand": brand, "model": model, "text": f"{brand} {model}"})
+        else:
+            self.entries.append({"type": "brand", "brand": brand, "text": brand})
+        self.entry_ids[(brand_key, model_key)] = entry_id
+        self.brand_of.append(brand_id)
+        if entry_id == len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(len(self.counts), dtype=np.int64)])
+
+        if model_key:
+            self._add_key(model_key, entry_id)
+            self._add_key(f"{brand_key} {model_key}", entry_id)
+            brand_words = brand_key.split()
+            if len(brand_words) > 1:
+                # "mercedes e class" as well as "mercedes benz e class"
+                self._add_key(f"{brand_words[0]} {model_key}", entry_id)
+        else:
+            self._add_key(brand_key, entry_id)
+        return entry_id
+
+    def _adjust(self, entry_id: int, delta: int):
+        """Change the listing count of a model entry and of its brand"""
+        self.counts[entry_id] += delta
+        if self.brand_of[entry_id] != entry_id:
+            self.counts[self.brand_of[entry_id]] += delta
+
+    def upsert(self, car: Dict[str, Any]):
+        """Count a car written as available; uncount one that no longer is"""
+        if car.get("status") != "available":
+            self.remove(car["id"])
+            return
+        if self._dirty is not None:
+            self._dirty.add(car["id"])
+        brand_key, model_key = normalize_key(car.get("brand")), normalize_key(car.get("model"))
+        if not brand_key:
+            return
+        entry_id = self._entry(car["brand"], car.get("model") or "", brand_key, model_key)
+        previous = self.cars.get(car["id"])
+        if previous == entry_id:
+            return
+        if previous is not None:
+            self._adjust(previous, -1)
+        self.cars[car["id"]] = entry_id
+        self._adjust(entry_id, 1)
+
+    def remove(self, car_id: str):
+        if self._dirty is not None:
+            self._dirty.add(car_id)
+        entry_id = self.cars.pop(car_id, None)
+        if entry_id is not None:
+            self._adjust(entry_id, -1)
+
+    async def refresh(self, car_ids: Iterable[str]):
+        """Re-read a few cars after a write that did not have their full documents at hand"""
+        car_ids = list(car_ids)
+        if self.cars_collection is None or not car_ids:
+            return
+        found = set()
+        async for car in self.cars_collection.find({"id": {"$in": car_ids}}, SUGGEST_FIELDS):
+            found.add(car["id"])
+            self.upsert(car)
+        for car_id in car_ids:
+            if car_id not in found:
+                self.remove(car_id)
+
+    async def rebuild(self):
+        """Reload from one $group over available cars (served by the status/brand_key/model_key index)"""
+        self._dirty = set()
+        try:
+            groups = await self.cars_collection.aggregate([
+                {"$match": {"status": "available"}},
+                {"$group": {
+                    "_id": {"brand_key": "$brand_key", "model_key": "$model_key"},
+                    "brand": {"$first": "$brand"},
+                    "model": {"$first": "$model"},
+                    "ids": {"$push": "$id"}
+                }}
+            ]).to_list(length=None)
+            dirty = self._dirty
+            self._dirty = None
+
+            self.load(groups)
+        finally:
+            self._dirty = None
+        # Writes that landed while the aggregation was running
+        await self.refresh(dirty)
+        self.built_at = time.time()
+        logger.info(f"Suggest index built with {len(self.entries)} entries")
+
+    def load(self, groups: List[Dict[str, Any]]):
+        """Replace the index with groups of {brand, model, ids}; keys are sorted once at the end"""
+        self._reset()
+        self._loading_keys = []
+        try:
+            for group in groups:
+                # Keys come from normalize_key like on writes, also for cars saved before brand_key existed
+                for car_id in group["ids"]:
+                    self.upsert({"id": car_id, "status": "available", "brand": group["brand"], "model": group["model"]})
+            loaded = sorted(set(self._loading_keys))
+        finally:
+            self._loading_keys = None
+        self.keys = [key for key, _ in loaded]
+        self.key_entries = np.array([entry_id for _, entry_id in loaded], dtype=np.int32)
+
+    async def run_rebuild_loop(self, interval_seconds: int):
+        """Periodic rebuild: drops zero-count entries and picks up writes handled by other workers"""
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Suggest index rebuild error: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    @staticmethod
+    def prefix_keys(prefix: str) -> Set[str]:
+        """Normalized forms of what the user typed so far.
+
+        A word still being typed in Cyrillic may not transliterate to the Latin
+        brand yet ("мерсе" -> "merse"), so the last word is also completed
+        against the Russian brand spellings in WORD_ALIASES.
+        """
+        keys = {normalize_key(prefix)}
+        words = [word for word in WORD_SPLIT.split(prefix.lower()) if word]
+        if words:
+            head = normalize_key(" ".join(words[:-1]))
+            for russian, latin in WORD_ALIASES.items():
+                if russian.startswith(words[-1]):
+                    keys.add(f"{head} {latin}".strip())
+        keys.discard("")
+        return keys
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """Entries with a key starting with prefix, most listings first"""
+        ranges = [
+            self.key_entries[bisect_left(self.keys, key):bisect_left(self.keys, key + KEY_END)]
+            for key in self.prefix_keys(prefix)
+        ]
+        # Several keys of one entry can share the prefix, so dedupe before ranking
+        candidates = np.unique(np.concatenate(ranges)) if ranges else self.key_entries[:0]
+        counts = self.counts[candidates]
+        if len(candidates) > limit:
+            # Keep everything tied with the limit-th count; the sort below breaks the ties
+            threshold = -np.partition(-counts, limit - 1)[limit - 1]
+            keep = counts >= threshold
+            candidates, counts = candidates[keep], counts[keep]
+
+        matches = {entry_id: count for entry_id, count in zip(candidates.tolist(), counts.tolist()) if count > 0}
+        ranked = sorted(matches.items(), key=lambda item: (
+            -item[1], self.entries[item[0]]["type"] != "brand", self.entries[item[0]]["text"]
+        ))
+        return [{**self.entries[entry_id], "count": count} for entry_id, count in ranked[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self.entries), "keys": len(self.keys), "cars": len(self.cars), "built_at": self.built_at}
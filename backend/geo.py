@@ -0,0 +1,173 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+from pymongo import UpdateOne
+from catalog_keys import normalize_key
+
+logger = logging.getLogger(__name__)
+
+GEO_FIELD = "geo"
+DISTANCE_FIELD = "distance_km"
+
+# City centres used to geocode free-text locations offline: (name, lat, lon, other spellings)
+CITY_COORDINATES = [
+    ("Москва", 55.7558, 37.6173, ("Moscow", "Мск")),
+    ("Санкт-Петербург", 59.9343, 30.3351, ("Петербург", "Питер", "СПб", "Saint Petersburg", "St Petersburg")),
+    ("Новосибирск", 55.0084, 82.9357, ("Novosibirsk",)),
+    ("Екатеринбург", 56.8389, 60.6057, ("Yekaterinburg",)),
+    ("Казань", 55.7961, 49.1064, ()),
+    ("Нижний Новгород", 56.2965, 43.9361, ("Nizhny Novgorod",)),
+    ("Челябинск", 55.1644, 61.4368, ("Chelyabinsk",)),
+    ("Красноярск", 56.0153, 92.8932, ("Krasnoyarsk",)),
+    ("Самара", 53.1959, 50.1002, ()),
+    ("Уфа", 54.7388, 55.9721, ()),
+    ("Ростов-на-Дону", 47.2357, 39.7015, ("Ростов", "Rostov-on-Don")),
+    ("Омск", 54.9885, 73.3242, ()),
+    ("Краснодар", 45.0355, 38.9753, ()),
+    ("Воронеж", 51.6720, 39.1843, ("Voronezh",)),
+    ("Пермь", 58.0105, 56.2502, ("Perm",)),
+    ("Волгоград", 48.7080, 44.5133, ()),
+    ("Саратов", 51.5336, 46.0343, ()),
+    ("Тюмень", 57.1530, 65.5343, ()),
+    ("Тольятти", 53.5078, 49.4204, ("Togliatti",)),
+    ("Ижевск", 56.8526, 53.2045, ("Izhevsk",)),
+    ("Барнаул", 53.3474, 83.7788, ()),
+    ("Ульяновск", 54.3142, 48.4031, ()),
+    ("Иркутск", 52.2870, 104.3050, ()),
+    ("Хабаровск", 48.4827, 135.0838, ("Khabarovsk",)),
+    ("Ярославль", 57.6261, 39.8845, ("Yaroslavl",)),
+    ("Владивосток", 43.1155, 131.8855, ()),
+    ("Махачкала", 42.9849, 47.5047, ("Makhachkala",)),
+    ("Томск", 56.4846, 84.9476, ()),
+    ("Оренбург", 51.7682, 55.0970, ()),
+    ("Кемерово", 55.3547, 86.0873, ()),
+    ("Новокузнецк", 53.7557, 87.1099, ()),
+    ("Рязань", 54.6269, 39.6916, ("Ryazan",)),
+    ("Набережные Челны", 55.7436, 52.3958, ("Naberezhnye Chelny",)),
+    ("Астрахань", 46.3479, 48.0336, ()),
+    ("Пенза", 53.1959, 45.0183, ()),
+    ("Киров", 58.6035, 49.6680, ()),
+    ("Липецк", 52.6088, 39.5992, ()),
+    ("Калининград", 54.7104, 20.4522, ()),
+    ("Тула", 54.1931, 37.6173, ()),
+    ("Сочи", 43.5855, 39.7231, ()),
+    ("Ставрополь", 45.0445, 41.9691, ()),
+    ("Курск", 51.7304, 36.1926, ()),
+    ("Тверь", 56.8587, 35.9176, ("Tver",)),
+    ("Белгород", 50.5997, 36.5983, ()),
+    ("Владимир", 56.1290, 40.4066, ()),
+    ("Смоленск", 54.7826, 32.0453, ()),
+    ("Калуга", 54.5293, 36.2754, ()),
+    ("Архангельск", 64.5399, 40.5158, ()),
+    ("Мурманск", 68.9585, 33.0827, ()),
+    ("Сургут", 61.2540, 73.3962, ()),
+    ("Якутск", 62.0355, 129.6755, ("Yakutsk",)),
+    ("Севастополь", 44.6167, 33.5254, ()),
+]
+
+def _build_city_index() -> Dict[str, Tuple[float, float]]:
+    index = {}
+    for name, lat, lon, aliases in CITY_COORDINATES:
+        for spelling in (name,) + aliases:
+            index[normalize_key(spelling)] = (lat, lon)
+    return index
+
+CITY_INDEX = _build_city_index()
+MAX_CITY_WORDS = max(len(key.split()) for key in CITY_INDEX)
+
+def point(lat: float, lon: float) -> Dict[str, Any]:
+    """GeoJSON point; GeoJSON puts longitude first"""
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError("Coordinates out of range")
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+def geocode_location(text: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Point for the first known city named in text ("г. Казань, ул. Баумана" -> Kazan), or None"""
+    words = normalize_key(text).split()
+    for start in range(len(words)):
+        # Longest match first, so "Нижний Новгород" is not read as another Novgorod
+        for length in range(min(MAX_CITY_WORDS, len(words) - start), 0, -1):
+            coordinates = CITY_INDEX.get(" ".join(words[start:start + length]))
+            if coordinates:
+                return point(*coordinates)
+    return None
+
+def resolve_geo(latitude: Optional[float], longitude: Optional[float], location: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Explicit coordinates when given, otherwise the geocoded location"""
+    if latitude is not None and longitude is not None:
+        return point(latitude, longitude)
+    return geocode_location(location)
+
+def parse_near(near: str) -> Tuple[float, float]:
+    """'lat,lon' -> (lat, lon); ValueError on malformed or out-of-range input"""
+    try:
+        lat, lon = (float(part) for part in near.split(","))
+    except ValueError:
+        raise ValueError("near must be 'lat,lon'")
+    point(lat, lon)
+    return lat, lon
+
+def geo_near_stage(lat: float, lon: float, filter_query: Dict[str, Any], radius_km: Optional[float] = None) -> Dict[str, Any]:
+    """$geoNear stage: matches of filter_query nearest first, with distance in km"""
+    stage = {
+        "near": point(lat, lon),
+        "key": GEO_FIELD,
+        "spherical": True,
+        "query": filter_query,
+        "distanceField": DISTANCE_FIELD,
+        "distanceMultiplier": 0.001
+    }
+    if radius_km is not None:
+        stage["maxDistance"] = radius_km * 1000
+    return {"$geoNear": stage}
+
+async def backfill_geo(collection, text_field: str, batch_size: int = 500, retry_unresolved: bool = False) -> Tuple[int, int]:
+    """Geocode text_field into geo on documents that have no point yet; safe to re-run.
+
+    Unresolved documents get geo: null so later runs skip them; retry_unresolved
+    revisits those (e.g. after adding cities to CITY_COORDINATES).
+    Returns (geocoded, unresolved).
+    """
+    missing = {GEO_FIELD: None} if retry_unresolved else {GEO_FIELD: {"$exists": False}}
+    cursor = collection.find({**missing, text_field: {"$nin": [None, ""]}}, {"_id": 1, text_field: 1})
+
+    geocoded = unresolved = 0
+    batch = []
+    async for document in cursor:
+        geo = geocode_location(document.get(text_field))
+        if geo:
+            geocoded += 1
+        else:
+            unresolved += 1
+        batch.append(UpdateOne({"_id": document["_id"]}, {"$set": {GEO_FIELD: geo}}))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            batch = []
+
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+
+    if geocoded or unresolved:
+        logger.info(f"Geocoded {geocoded} {collection.name} documents, {unresolved} locations not recognized")
+    return geocoded, unresolved
+
+async def _main(retry_unresolved: bool):
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        db = client[os.environ['DB_NAME']]
+        for collection, text_field in ((db.cars, "location"), (db.dealers, "address")):
+            geocoded, unresolved = await backfill_geo(collection, text_field, retry_unresolved=retry_unresolved)
+            print(f"{collection.name}: geocoded {geocoded}, not recognized {unresolved}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main("--retry-unresolved" in sys.argv[1:]))
@@ -0,0 +1,260 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, Dict, List
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+from catalog_search import TEXT_INDEX_NAME, TEXT_INDEX_KEYS, TEXT_INDEX_WEIGHTS
+from car_duplicates import VIN_INDEX_FILTER
+
+logger = logging.getLogger(__name__)
+
+# Options that change what an index enforces or matches; a difference is reported as a conflict
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression", "weights", "default_language")
+TEXT_KEY_FIELDS = ("_fts", "_ftsx")
+
+def _catalog_indexes() -> List[IndexModel]:
+    indexes = [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("brand", ASCENDING)]),
+        IndexModel([("price", ASCENDING)]),
+        IndexModel([("dealer_id", ASCENDING)]),
+        IndexModel([("dealer_id", ASCENDING), ("status", ASCENDING)]),
+        # Bulk import upserts on (dealer_id, vin_key)
+        IndexModel([("dealer_id", ASCENDING), ("vin_key", ASCENDING)]),
+        # One listed car per normalized VIN; cars without a VIN or off the market are not indexed
+        IndexModel([("vin_key", ASCENDING)], unique=True, partialFilterExpression=VIN_INDEX_FILTER),
+    ]
+    # Keyset pagination: (status[, vehicle_type], sort key, id) for every sortable field
+    for field in ("created_at", "price", "year", "mileage"):
+        indexes.append(IndexModel([("status", ASCENDING), (field, ASCENDING), ("id", ASCENDING)]))
+        indexes.append(IndexModel([("status", ASCENDING), ("vehicle_type", ASCENDING), (field, ASCENDING), ("id", ASCENDING)]))
+    # Brand/model filtering on normalized keys
+    indexes += [
+        IndexModel([("status", ASCENDING), ("brand_key", ASCENDING), ("model_key", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("model_key", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("vehicle_type", ASCENDING), ("brand_key", ASCENDING), ("model_key", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("vehicle_type", ASCENDING), ("model_key", ASCENDING)]),
+        IndexModel(TEXT_INDEX_KEYS, name=TEXT_INDEX_NAME, weights=TEXT_INDEX_WEIGHTS, default_language="russian"),
+        # "Near me": $geoNear with status/vehicle_type filtered inside the index
+        IndexModel([("geo", GEOSPHERE), ("status", ASCENDING), ("vehicle_type", ASCENDING)]),
+    ]
+    return indexes
+
+# Indexes the backend relies on, per collection. Names are MongoDB's defaults
+# ("field_1_other_-1"), so indexes created by init-mongo.js match by name.
+INDEX_PLAN: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("role", ASCENDING)]),
+        IndexModel([("telegram_chat_id", ASCENDING)], sparse=True),
+    ],
+    "cars": _catalog_indexes(),
+    "dealers": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("geo", GEOSPHERE)]),
+    ],
+    "favorites": [
+        IndexModel([("user_id", ASCENDING), ("car_id", ASCENDING)]),
+    ],
+    "view_history": [
+        IndexModel([("user_id", ASCENDING), ("viewed_at", DESCENDING)]),
+    ],
+    "comparisons": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "reviews": [
+        IndexModel([("dealer_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("dealer_id", ASCENDING)]),
+        # Top reviews on the car detail page
+        IndexModel([("dealer_id", ASCENDING), ("rating", DESCENDING), ("created_at", DESCENDING)]),
+    ],
+    "auctions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("end_time", ASCENDING)]),
+        IndexModel([("car_id", ASCENDING), ("status", ASCENDING)]),
+    ],
+    "bids": [
+        IndexModel([("auction_id", ASCENDING), ("amount", DESCENDING)]),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "customers": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("dealer_id", ASCENDING), ("email", ASCENDING)]),
+    ],
+    "sales": [
+        IndexModel([("dealer_id", ASCENDING), ("customer_id", ASCENDING), ("sale_date", DESCENDING)]),
+    ],
+    "telegram_connections": [
+        IndexModel([("connection_code", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)]),
+    ],
+    "refresh_tokens": [
+        IndexModel([("token_hash", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "audit_log": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)]),
+        IndexModel([("timestamp", DESCENDING)]),
+    ],
+}
+
+def _normalize_value(value: Any) -> Any:
+    # The mongo shell stores 1 as a double; compare 1.0 and 1 as equal
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _normalize_value(v) for k, v in value.items()}
+    return value
+
+def _shape(key: List, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Comparable form of an index: key fields plus the options that matter"""
+    fields = [(name, _normalize_value(direction)) for name, direction in key if name not in TEXT_KEY_FIELDS]
+    text_fields = [name for name, direction in fields if direction == TEXT]
+    shape = {"key": [[name, direction] for name, direction in fields if direction != TEXT]}
+    if text_fields or "weights" in options:
+        # The server stores a text index as _fts/_ftsx plus weights; compare the non-text prefix and weights
+        shape["weights"] = _normalize_value(dict(options.get("weights") or {name: 1 for name in text_fields}))
+        shape["default_language"] = options.get("default_language", "english")
+    for option in COMPARED_OPTIONS:
+        if option not in shape and options.get(option) not in (None, False):
+            shape[option] = _normalize_value(options[option])
+    return shape
+
+def declared_shape(model: IndexModel) -> Dict[str, Any]:
+    document = model.document
+    return _shape(list(document["key"].items()), document)
+
+def compare_indexes(declared: List[IndexModel], actual: Dict[str, Dict[str, Any]]) -> Dict[str, List]:
+    """Drift between declared indexes and index_information() output.
+
+    missing: declared but absent. conflicting: present under the declared name
+    with different keys or options. undeclared: present but not declared;
+    redundant when a declared index has its key as a prefix.
+    """
+    declared_names = {model.document["name"]: model for model in declared}
+    report = {"missing": [], "conflicting": [], "undeclared": [], "redundant": []}
+
+    for name, model in declared_names.items():
+        info = actual.get(name)
+        if info is None:
+            report["missing"].append(name)
+            continue
+        want, have = declared_shape(model), _shape(info["key"], info)
+        if want != have:
+            report["conflicting"].append({"name": name, "declared": want, "actual": have})
+
+    declared_keys = [declared_shape(model)["key"] for model in declared]
+    for name, info in actual.items():
+        if name == "_id_" or name in declared_names:
+            continue
+        shape = _shape(info["key"], info)
+        key = shape["key"]
+        if "weights" not in shape and any(len(other) > len(key) and other[:len(key)] == key for other in declared_keys):
+            report["redundant"].append(name)
+        else:
+            report["undeclared"].append(name)
+    return report
+
+async def drift_report(db) -> Dict[str, Dict[str, List]]:
+    """Per-collection drift for every collection in INDEX_PLAN"""
+    report = {}
+    for collection_name, declared in INDEX_PLAN.items():
+        actual = await db[collection_name].index_information()
+        report[collection_name] = compare_indexes(declared, actual)
+    return report
+
+async def ensure_indexes(db) -> int:
+    """Build declared indexes that do not exist yet, one at a time; never drops anything.
+
+    Meant to run as a startup background task: the server answers requests
+    while MongoDB builds, and a failed build (e.g. duplicates under a unique
+    index) is logged without stopping the others.
+    """
+    created = 0
+    for collection_name, declared in INDEX_PLAN.items():
+        collection = db[collection_name]
+        try:
+            drift = compare_indexes(declared, await collection.index_information())
+        except PyMongoError as e:
+            logger.error(f"Index check failed for {collection_name}: {e}")
+            continue
+
+        for conflict in drift["conflicting"]:
+            logger.warning(f"Index {collection_name}.{conflict['name']} differs from the plan: {conflict['actual']}")
+        if drift["undeclared"]:
+            logger.info(f"Undeclared indexes on {collection_name}: {', '.join(drift['undeclared'])}")
+        if drift["redundant"]:
+            logger.info(f"Redundant indexes on {collection_name}: {', '.join(drift['redundant'])}")
+
+        for model in declared:
+            name = model.document["name"]
+            if name not in drift["missing"]:
+                continue
+            try:
+                await collection.create_indexes([model])
+                created += 1
+                logger.info(f"Built index {collection_name}.{name}")
+            except PyMongoError as e:
+                logger.error(f"Index {collection_name}.{name} not built: {e}")
+
+    if created:
+        logger.info(f"Built {created} missing indexes")
+    return created
+
+def format_plan() -> str:
+    lines = []
+    for collection_name, declared in INDEX_PLAN.items():
+        lines.append(collection_name)
+        for model in declared:
+            document = model.document
+            options = {k: v for k, v in document.items() if k not in ("key", "name")}
+            key = ", ".join(f"{field}: {direction}" for field, direction in document["key"].items())
+            suffix = f"  {json.dumps(options, ensure_ascii=False)}" if options else ""
+            lines.append(f"  {document['name']}  {{{key}}}{suffix}")
+    return "\n".join(lines)
+
+async def _main(argv: List[str]):
+    import argparse
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Print, check or apply the MongoDB index plan")
+    parser.add_argument("--check", action="store_true", help="report drift against the database")
+    parser.add_argument("--apply", action="store_true", help="build missing indexes")
+    args = parser.parse_args(argv)
+
+    if not (args.check or args.apply):
+        print(format_plan())
+        return
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        db = client[os.environ['DB_NAME']]
+        if args.apply:
+            created = await ensure_indexes(db)
+            print(f"Built {created} missing indexes")
+        if args.check:
+            report = await drift_report(db)
+            print(json.dumps(
+                {name: drift for name, drift in report.items() if any(drift.values())},
+                indent=2, ensure_ascii=False, default=str
+            ))
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,93 @@
+import base64
+import binascii
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+# Sortable catalog fields; each has (status, field, id) and (status, vehicle_type, field, id) indexes
+SORT_FIELDS = ("created_at", "price", "year", "mileage")
+SORT_PATTERN = "^(" + "|".join(SORT_FIELDS) + ")$"
+ORDER_PATTERN = "^(asc|desc)$"
+
+class InvalidCursor(ValueError):
+    """Cursor is malformed or was issued for a different sort"""
+
+class KeysetPage:
+    """Keyset (seek) pagination over (sort_field, id).
+
+    Every page is an index range scan that starts right after the last row
+    of the previous page, so deep pages cost the same as the first one.
+    Documents where the sort field is null or missing sort before all values
+    in ascending order and after them in descending order, as in MongoDB.
+    """
+
+    def __init__(self, sort_field: str = "created_at", order: str = "desc", cursor: Optional[str] = None):
+        if sort_field not in SORT_FIELDS:
+            raise InvalidCursor(f"Unsupported sort field: {sort_field}")
+        self.sort_field = sort_field
+        self.direction = 1 if order == "asc" else -1
+        self.after = self.decode_cursor(cursor) if cursor else None
+
+    @property
+    def sort(self) -> List[Tuple[str, int]]:
+        # id breaks ties so the order is total and stable between requests
+        return [(self.sort_field, self.direction), ("id", self.direction)]
+
+    def apply(self, filter_query: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter restricted to rows after the cursor"""
+        if self.after is None:
+            return filter_query
+        return {"$and": [filter_query, self.seek_condition(*self.after)]}
+
+    def seek_condition(self, value: Any, last_id: str) -> Dict[str, Any]:
+        field = self.sort_field
+        if self.direction == 1:
+            if value is None:
+                return {"$or": [{field: None, "id": {"$gt": last_id}}, {field: {"$ne": None}}]}
+            return {"$or": [{field: {"$gt": value}}, {field: value, "id": {"$gt": last_id}}]}
+
+        if value is None:
+            return {field: None, "id": {"$lt": last_id}}
+        return {"$or": [
+            {field: {"$lt": value}},
+            {field: value, "id": {"$lt": last_id}},
+            {field: None}
+        ]}
+
+    def encode_cursor(self, document: Dict[str, Any]) -> str:
+        payload = json_util.dumps({
+            "s": self.sort_field,
+            "d": self.direction,
+            "v": document.get(self.sort_field),
+            "id": document["id"]
+        })
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> Tuple[Any, str]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            value, last_id = payload["v"], payload["id"]
+            matches_sort = payload["s"] == self.sort_field and payload["d"] == self.direction
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+            raise InvalidCursor(f"Malformed cursor: {e}")
+
+        if not matches_sort:
+            raise InvalidCursor("Cursor was issued for a different sort order")
+        if not isinstance(last_id, str):
+            raise InvalidCursor("Malformed cursor: id")
+        return value, last_id
+
+    async def fetch(self, collection, filter_query: Dict[str, Any], limit: int,
+                    projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of documents plus the cursor for the next page (None on the last page).
+
+        An inclusion projection must keep id and the sort field for the cursor.
+        """
+        documents = await collection.find(self.apply(filter_query), projection).sort(self.sort).limit(limit + 1).to_list(length=None)
+        if len(documents) <= limit:
+            return documents, None
+        documents = documents[:limit]
+        return documents, self.encode_cursor(documents[-1])
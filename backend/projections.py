@@ -0,0 +1,61 @@
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+class InvalidFields(ValueError):
+    """fields= names something the endpoint does not expose"""
+
+class FieldSet:
+    """Fields a list endpoint may return and its default (card) projection.
+
+    fields=None gives the default projection, fields=all gives every allowed
+    field, and fields=a,b,c gives that subset. id is always included. The
+    result is a MongoDB projection, so unrequested fields are never read off
+    the wire or decoded.
+    """
+
+    def __init__(self, allowed: Iterable[str], default: Iterable[str], default_slices: Dict[str, int] = None):
+        self.allowed = frozenset(allowed)
+        self.default = tuple(default)
+        # Array fields trimmed in the default projection, e.g. only the cover image on cards
+        self.default_slices = default_slices or {}
+
+        unknown = set(self.default) - self.allowed
+        if unknown:
+            raise ValueError(f"Default fields not allowed: {sorted(unknown)}")
+
+    def projection(self, fields: Optional[str] = None) -> Dict[str, Any]:
+        if not fields:
+            names, slices = self.default, self.default_slices
+        elif fields == "all":
+            names, slices = self.allowed, {}
+        else:
+            names = [name.strip() for name in fields.split(",") if name.strip()]
+            unknown = sorted(set(names) - self.allowed)
+            if unknown:
+                raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+            slices = {}
+
+        projection: Dict[str, Any] = {"_id": 0, "id": 1}
+        for name in names:
+            projection[name] = {"$slice": slices[name]} if name in slices else 1
+        return projection
+
+    @staticmethod
+    def for_aggregation(projection: Dict[str, Any]) -> Dict[str, Any]:
+        """The same projection as a $project stage ($slice takes the array expression there)"""
+        stage = {}
+        for name, value in projection.items():
+            if isinstance(value, dict) and "$slice" in value:
+                value = {"$slice": [f"${name}", value["$slice"]]}
+            stage[name] = value
+        return stage
+
+    @staticmethod
+    def include(projection: Dict[str, Any], *names: str) -> Dict[str, Any]:
+        """Projection that also returns names (e.g. the keyset sort field)"""
+        extended = dict(projection)
+        for name in names:
+            extended.setdefault(name, 1)
+        return extended
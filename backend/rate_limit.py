@@ -0,0 +1,203 @@
+import re
+import json
+import math
+import time
+import hashlib
+import logging
+import ipaddress
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+def parse_networks(value: str) -> List[Any]:
+    """Comma-separated addresses/CIDRs, e.g. the TRUSTED_PROXIES setting"""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip()]
+
+def _in_networks(address: Optional[str], networks: Iterable[Any]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+def resolve_client_ip(peer: Optional[str], headers, trusted_proxies: List[Any]) -> Optional[str]:
+    """Client address, read from X-Real-IP / X-Forwarded-For only when the peer is a trusted proxy.
+
+    nginx sets X-Real-IP to its own $remote_addr, so behind it that header
+    is authoritative; otherwise the rightmost X-Forwarded-For hop that is
+    not one of our proxies is the client.
+    """
+    if not peer or not _in_networks(peer, trusted_proxies):
+        return peer
+    real_ip = (headers.get("x-real-ip") or "").strip()
+    if real_ip:
+        return real_ip
+    hops = [hop.strip() for hop in (headers.get("x-forwarded-for") or "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _in_networks(hop, trusted_proxies):
+            return hop
+    return hops[0] if hops else peer
+
+class RateLimitRule:
+    """Token bucket applied to requests whose path matches pattern"""
+
+    def __init__(self, name: str, pattern: str, rate_per_minute: float, burst: int,
+                 key_by: Tuple[str, ...] = ("ip", "user", "api_key"), methods: Optional[Tuple[str, ...]] = None):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.burst = burst
+        self.key_by = key_by
+        self.methods = methods
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods and method not in self.methods:
+            return False
+        return self.pattern.match(path) is not None
+
+# Expensive endpoints: LLM calls, file processing, auction bidding
+DEFAULT_RATE_LIMIT_RULES = [
+    RateLimitRule("ai", r"^/api/ai/", rate_per_minute=20, burst=10),
+    RateLimitRule("upload", r"^/api/upload/", rate_per_minute=30, burst=10, methods=("POST",)),
+    RateLimitRule("auction_bid", r"^/api/auctions/[^/]+/bid$", rate_per_minute=30, burst=5, methods=("POST",)),
+]
+
+class RateLimiter:
+    """Per-route, per-principal token buckets.
+
+    Buckets live in store when one is given (an in-process store keeps the
+    check free of database round trips, at the cost of per-worker limits),
+    otherwise in the SecurityService store.
+    """
+
+    def __init__(self, security_service, rules: List[RateLimitRule] = None,
+                 user_id_resolver: Callable[[str], Optional[str]] = None, store=None,
+                 trusted_proxies: Optional[List[Any]] = None):
+        self.security_service = security_service
+        self.rules = rules if rules is not None else DEFAULT_RATE_LIMIT_RULES
+        self.user_id_resolver = user_id_resolver
+        self.store = store
+        self.trusted_proxies = trusted_proxies or []
+        self.allowed = {rule.name: 0 for rule in self.rules}
+        self.rejected = {rule.name: 0 for rule in self.rules}
+
+    def match_rule(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule
+        return None
+
+    @property
+    def bucket_store(self):
+        return self.store or self.security_service.store
+
+    def principals(self, rule: RateLimitRule, client_ip: Optional[str], headers: Dict[str, str]) -> List[str]:
+        """Bucket keys for the request's principals.
+
+        An API key or authenticated user is limited on its own bucket; the IP
+        bucket only applies to anonymous requests, so users behind one NAT or
+        proxy address do not share a quota.
+        """
+        keys = []
+        if "api_key" in rule.key_by and headers.get("x-api-key"):
+            api_key_hash = hashlib.sha256(headers["x-api-key"].encode()).hexdigest()[:32]
+            keys.append(f"{rule.name}:key:{api_key_hash}")
+
+        authorization = headers.get("authorization", "")
+        if "user" in rule.key_by and self.user_id_resolver and authorization.lower().startswith("bearer "):
+            user_id = self.user_id_resolver(authorization[7:])
+            if user_id:
+                keys.append(f"{rule.name}:user:{user_id}")
+
+        if not keys and "ip" in rule.key_by and client_ip:
+            keys.append(f"{rule.name}:ip:{client_ip}")
+        return keys
+
+    async def check(self, rule: RateLimitRule, keys: List[str]) -> Tuple[bool, float]:
+        """Take one token from each bucket; reject if any bucket is empty.
+
+        On a reject the tokens taken from the other buckets are given back,
+        so requests that are never served do not drain e.g. the user bucket
+        of a client whose shared IP is over its limit.
+        """
+        store = self.bucket_store
+        now_ts = time.time()
+        retry_after = 0.0
+        taken = []
+
+        for key in keys:
+            allowed, wait = await store.take_token(key, rule.rate, rule.burst, now_ts)
+            if allowed:
+                taken.append(key)
+            else:
+                retry_after = max(retry_after, wait)
+
+        if retry_after:
+            for key in taken:
+                await store.refund_token(key, rule.burst)
+            self.rejected[rule.name] += 1
+            return False, retry_after
+
+        self.allowed[rule.name] += 1
+        return True, 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "store": type(self.bucket_store).__name__,
+            "rules": [
+                {
+                    "name": rule.name,
+                    "pattern": rule.pattern.pattern,
+                    "rate_per_minute": rule.rate * 60,
+                    "burst": rule.burst,
+                    "key_by": list(rule.key_by),
+                    "allowed": self.allowed[rule.name],
+                    "rejected": self.rejected[rule.name]
+                }
+                for rule in self.rules
+            ]
+        }
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing RateLimiter buckets; rejects with 429 and Retry-After"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = self.limiter.match_rule(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        peer = scope["client"][0] if scope.get("client") else None
+        client_ip = resolve_client_ip(peer, headers, self.limiter.trusted_proxies)
+
+        try:
+            allowed, retry_after = await self.limiter.check(rule, self.limiter.principals(rule, client_ip, headers))
+        except Exception as e:
+            # Fail open: a store outage must not take the API down
+            logger.error(f"Rate limit check error: {e}")
+            allowed, retry_after = True, 0.0
+
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Слишком много запросов. Повторите попытку позже."}, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -7,8 +7,16 @@ import pyotp
 import qrcode
 from io import BytesIO
 import base64
+from urllib.parse import quote
+import asyncio
+import heapq
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, Any, List
+from cachetools import LRUCache, TTLCache
+from passlib.context import CryptContext
+from pymongo import ReturnDocument
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
@@ -18,14 +26,23 @@ logger = logging.getLogger(__name__)
 class TwoFactorAuth:
     """Two-factor authentication service for VELES DRIVE"""
     
+    QR_FORMATS = ("png", "svg")
+    
+    def __init__(self, qr_workers: int = 2, qr_cache_size: int = 1024, qr_cache_ttl: int = 600):
+        self.executor = ThreadPoolExecutor(max_workers=qr_workers, thread_name_prefix="qr-code")
+        # Rendered images keyed by (email, secret, format); a pending secret is reused until verified
+        self.qr_cache = TTLCache(maxsize=qr_cache_size, ttl=qr_cache_ttl)
+        self.qr_cache_hits = 0
+        self.qr_cache_misses = 0
+    
     @staticmethod
     def generate_secret() -> str:
         """Generate a new 2FA secret key"""
         return pyotp.random_base32()
     
     @staticmethod
-    def generate_qr_code(email: str, secret: str, issuer: str = "VELES DRIVE") -> str:
-        """Generate QR code for 2FA setup"""
+    def generate_qr_code(email: str, secret: str, issuer: str = "VELES DRIVE", format: str = "png") -> str:
+        """Generate QR code for 2FA setup as a PNG or SVG data URI (CPU-bound, run off the event loop)"""
         try:
             totp = pyotp.TOTP(secret)
             provisioning_uri = totp.provisioning_uri(
@@ -37,6 +54,11 @@ class TwoFactorAuth:
             qr.add_data(provisioning_uri)
             qr.make(fit=True)
             
+            if format == "svg":
+                # Plain-text data URI: no raster encoding and no base64 overhead
+                svg = TwoFactorAuth.render_svg(qr.get_matrix())
+                return "data:image/svg+xml;charset=utf-8," + quote(svg, safe=" '=:/.-")
+            
             img = qr.make_image(fill_color="black", back_color="white")
             
             # Convert to base64
@@ -50,6 +72,54 @@ class TwoFactorAuth:
             logger.error(f"QR code generation error: {e}")
             return ""
     
+    @staticmethod
+    def render_svg(matrix: List[List[bool]]) -> str:
+        """Compact SVG: one stroked path of horizontal module runs in a module-unit viewBox"""
+        segments = []
+        for y, row in enumerate(matrix):
+            x = 0
+            cursor = None  # Pen position after the previous run in this row
+            while x < len(row):
+                if not row[x]:
+                    x += 1
+                    continue
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                if cursor is None:
+                    segments.append(f"M{start} {y}.5h{x - start}")
+                else:
+                    segments.append(f"m{start - cursor} 0h{x - start}")
+                cursor = x
+        
+        size = len(matrix)
+        return (
+            f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {size} {size}' shape-rendering='crispEdges'>"
+            f"<rect width='{size}' height='{size}' fill='#fff'/><path stroke='#000' d='{''.join(segments)}'/></svg>"
+        )
+    
+    async def get_qr_code(self, email: str, secret: str, format: str = "png") -> str:
+        """Cached QR code rendered on the worker pool"""
+        key = (email, secret, format)
+        qr_code = self.qr_cache.get(key)
+        if qr_code is not None:
+            self.qr_cache_hits += 1
+            return qr_code
+        
+        self.qr_cache_misses += 1
+        loop = asyncio.get_running_loop()
+        qr_code = await loop.run_in_executor(
+            self.executor, self.generate_qr_code, email, secret, "VELES DRIVE", format
+        )
+        if qr_code:
+            self.qr_cache[key] = qr_code
+        return qr_code
+    
+    def forget_qr_codes(self, email: str, secret: str):
+        """Drop cached images once the secret is enabled or discarded"""
+        for format in self.QR_FORMATS:
+            self.qr_cache.pop((email, secret, format), None)
+    
     @staticmethod
     def verify_token(secret: str, token: str, window: int = 1) -> bool:
         """Verify 2FA token"""
@@ -71,16 +141,321 @@ class TwoFactorAuth:
             codes.append(formatted_code)
         return codes
 
-class SecurityService:
-    """Advanced security service for VELES DRIVE"""
+class PasswordHasher:
+    """Async password hashing facade backed by a bounded thread pool"""
+    
+    def __init__(self, max_workers: int = 4):
+        self.context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self.queue_depth = 0      # Calls waiting for a free worker
+        self.peak_queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+    
+    async def _run(self, func, *args):
+        """Run CPU-heavy hashing off the event loop, at most max_workers at a time"""
+        self.queue_depth += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+        
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+    
+    async def hash(self, password: str) -> str:
+        """Hash password"""
+        return await self._run(self.context.hash, password)
+    
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify password against stored hash"""
+        return await self._run(self.context.verify, password, hashed_password)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Executor load metrics"""
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "completed": self.completed
+        }
+
+class InMemorySecurityStore:
+    """Per-process store for failed attempts and IP blocks (single worker / development)"""
     
     def __init__(self):
-        self.failed_attempts = {}  # IP -> attempts count
+        self.failed_attempts = {}  # IP -> attempts record
         self.blocked_ips = {}      # IP -> block_until timestamp
-        self.suspicious_activities = []
+        self.rate_buckets = {}     # bucket key -> [tokens, updated_ts]
+    
+    async def record_failed_attempt(self, ip_address: str, now: datetime, window: timedelta) -> Dict[str, Any]:
+        """Increment attempts for IP, restarting the window when it has passed"""
+        attempts = self.failed_attempts.get(ip_address)
+        if not attempts or now - attempts['first_attempt'] > window:
+            attempts = {'count': 0, 'first_attempt': now}
+            self.failed_attempts[ip_address] = attempts
+        
+        attempts['count'] += 1
+        attempts['last_attempt'] = now
+        return attempts
+    
+    async def clear_failed_attempts(self, ip_address: str):
+        self.failed_attempts.pop(ip_address, None)
+    
+    async def block_ip(self, ip_address: str, block_until: datetime):
+        current = self.blocked_ips.get(ip_address)
+        self.blocked_ips[ip_address] = max(current, block_until) if current else block_until
+    
+    async def get_blocked_ips(self, now: datetime) -> Dict[str, datetime]:
+        return {ip: until for ip, until in self.blocked_ips.items() if until > now}
+    
+    async def sweep(self, now: datetime, window: timedelta) -> int:
+        """Drop expired attempt windows and blocks"""
+        stale_attempts = [
+            ip for ip, attempts in self.failed_attempts.items()
+            if now - attempts['first_attempt'] > window
+        ]
+        for ip in stale_attempts:
+            del self.failed_attempts[ip]
+        
+        expired_blocks = [ip for ip, until in self.blocked_ips.items() if until <= now]
+        for ip in expired_blocks:
+            del self.blocked_ips[ip]
+        
+        # Buckets idle for a window are full again, dropping them changes nothing
+        idle_before = now.timestamp() - window.total_seconds()
+        idle_buckets = [key for key, bucket in self.rate_buckets.items() if bucket[1] < idle_before]
+        for key in idle_buckets:
+            del self.rate_buckets[key]
+        
+        return len(stale_attempts) + len(expired_blocks) + len(idle_buckets)
+    
+    async def take_token(self, key: str, rate: float, capacity: float, now_ts: float):
+        """Token bucket: returns (allowed, retry_after_seconds)"""
+        bucket = self.rate_buckets.get(key)
+        if bucket is None:
+            bucket = self.rate_buckets[key] = [capacity, now_ts]
+        
+        tokens = min(capacity, bucket[0] + max(0.0, now_ts - bucket[1]) * rate)
+        bucket[1] = now_ts
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True, 0.0
+        
+        bucket[0] = tokens
+        return False, (1 - tokens) / rate
+    
+    async def refund_token(self, key: str, capacity: float):
+        """Give back a token taken for a request that was rejected by another bucket"""
+        bucket = self.rate_buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(capacity, bucket[0] + 1)
+
+class MongoSecurityStore:
+    """Shared store so every uvicorn worker sees the same attempt counters and IP blocks"""
+    
+    def __init__(self, db):
+        self.failed_attempts = db.security_failed_attempts
+        self.blocked_ips = db.security_blocked_ips
+        self.rate_buckets = db.security_rate_buckets
+    
+    async def ensure_indexes(self):
+        """Unique key per IP plus TTL indexes so MongoDB expires stale entries itself"""
+        await self.failed_attempts.create_index("ip_address", unique=True)
+        await self.failed_attempts.create_index("expires_at", expireAfterSeconds=0)
+        await self.blocked_ips.create_index("ip_address", unique=True)
+        await self.blocked_ips.create_index("block_until", expireAfterSeconds=0)
+        await self.rate_buckets.create_index("key", unique=True)
+        await self.rate_buckets.create_index("expires_at", expireAfterSeconds=0)
+    
+    async def record_failed_attempt(self, ip_address: str, now: datetime, window: timedelta) -> Dict[str, Any]:
+        """Atomic $inc-style upsert that restarts the window when it has passed"""
+        window_expired = {"$lt": [{"$ifNull": ["$first_attempt", None]}, now - window]}
+        
+        attempts = await self.failed_attempts.find_one_and_update(
+            {"ip_address": ip_address},
+            [
+                {"$set": {
+                    "count": {"$cond": [window_expired, 1, {"$add": [{"$ifNull": ["$count", 0]}, 1]}]},
+                    "first_attempt": {"$cond": [window_expired, now, "$first_attempt"]},
+                    "expires_at": {"$cond": [window_expired, now + window, "$expires_at"]},
+                    "last_attempt": now
+                }}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return attempts
+    
+    async def clear_failed_attempts(self, ip_address: str):
+        await self.failed_attempts.delete_one({"ip_address": ip_address})
+    
+    async def block_ip(self, ip_address: str, block_until: datetime):
+        await self.blocked_ips.update_one(
+            {"ip_address": ip_address},
+            {"$max": {"block_until": block_until}},
+            upsert=True
+        )
+    
+    async def get_blocked_ips(self, now: datetime) -> Dict[str, datetime]:
+        blocked = {}
+        async for entry in self.blocked_ips.find({"block_until": {"$gt": now}}):
+            block_until = entry["block_until"]
+            if block_until.tzinfo is None:
+                block_until = block_until.replace(tzinfo=timezone.utc)
+            blocked[entry["ip_address"]] = block_until
+        return blocked
+    
+    async def sweep(self, now: datetime, window: timedelta) -> int:
+        """TTL monitor runs once a minute; delete expired entries eagerly as well"""
+        attempts = await self.failed_attempts.delete_many({"expires_at": {"$lte": now}})
+        blocks = await self.blocked_ips.delete_many({"block_until": {"$lte": now}})
+        return attempts.deleted_count + blocks.deleted_count
+    
+    async def take_token(self, key: str, rate: float, capacity: float, now_ts: float):
+        """Token bucket shared by all workers: refill and take in one atomic upsert"""
+        refilled = {"$min": [
+            capacity,
+            {"$add": [
+                {"$ifNull": ["$tokens", capacity]},
+                {"$multiply": [{"$max": [0, {"$subtract": [now_ts, {"$ifNull": ["$updated_ts", now_ts]}]}]}, rate]}
+            ]}
+        ]}
+        has_token = {"$gte": ["$tokens", 1]}
+        
+        bucket = await self.rate_buckets.find_one_and_update(
+            {"key": key},
+            [
+                {"$set": {"tokens": refilled}},
+                {"$set": {
+                    "allowed": has_token,
+                    "tokens": {"$cond": [has_token, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "updated_ts": now_ts,
+                    # A bucket idle long enough to refill completely can be dropped
+                    "expires_at": datetime.fromtimestamp(now_ts + capacity / rate, timezone.utc)
+                }}
+            ],
+            projection={"allowed": 1, "tokens": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return True, 0.0
+        return False, (1 - bucket["tokens"]) / rate
+    
+    async def refund_token(self, key: str, capacity: float):
+        """Give back a token taken for a request that was rejected by another bucket"""
+        await self.rate_buckets.update_one(
+            {"key": key},
+            [{"$set": {"tokens": {"$min": [capacity, {"$add": ["$tokens", 1]}]}}}]
+        )
+
+class RollingBuckets:
+    """Minute and hour buckets of event counts, updated on write and summed for reports.
+    
+    Each bucket keeps a total, counts per dimension value and the first time each
+    value was seen. Reports cost O(buckets): minute resolution for the last
+    minute_buckets minutes, hour resolution further back.
+    """
+    
+    MINUTE = 60
+    HOUR = 3600
+    
+    def __init__(self, minute_buckets: int = 120, hour_buckets: int = 7 * 24 + 1):
+        self.minutes = deque(maxlen=minute_buckets)  # (bucket_start_ts, bucket)
+        self.hours = deque(maxlen=hour_buckets)
+    
+    @staticmethod
+    def _new_bucket() -> Dict[str, Any]:
+        return {"total": 0, "counts": {}, "first_seen": {}}
+    
+    def _current(self, buckets: deque, start_ts: float) -> Dict[str, Any]:
+        # Timestamps arrive in order; a late event (clock skew) lands in the newest bucket
+        if not buckets or buckets[-1][0] < start_ts:
+            buckets.append((start_ts, self._new_bucket()))
+        return buckets[-1][1]
+    
+    def add(self, timestamp: datetime, dimensions: Dict[str, Any]):
+        ts = timestamp.timestamp()
+        for buckets, size in ((self.minutes, self.MINUTE), (self.hours, self.HOUR)):
+            bucket = self._current(buckets, ts - ts % size)
+            bucket["total"] += 1
+            for dimension, value in dimensions.items():
+                counts = bucket["counts"].setdefault(dimension, {})
+                counts[value] = counts.get(value, 0) + 1
+                bucket["first_seen"].setdefault(dimension, {}).setdefault(value, ts)
+    
+    @staticmethod
+    def _merge(summary: Dict[str, Any], bucket: Dict[str, Any]):
+        summary["total"] += bucket["total"]
+        for dimension, counts in bucket["counts"].items():
+            merged = summary["counts"].setdefault(dimension, {})
+            for value, count in counts.items():
+                merged[value] = merged.get(value, 0) + count
+        for dimension, first_seen in bucket["first_seen"].items():
+            merged = summary["first_seen"].setdefault(dimension, {})
+            for value, ts in first_seen.items():
+                if value not in merged or ts < merged[value]:
+                    merged[value] = ts
+    
+    def summarize(self, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Sum buckets overlapping [start, end]"""
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        # Hours from this point on are also covered by minute buckets
+        minute_floor = self.minutes[0][0] if self.minutes else float("inf")
+        summary = self._new_bucket()
+        
+        def hour_fully_inside(hour_start: float) -> bool:
+            return start_ts <= hour_start and hour_start + self.HOUR <= end_ts
+        
+        for hour_start, bucket in self.hours:
+            if hour_start + self.HOUR <= start_ts or hour_start > end_ts:
+                continue
+            if hour_fully_inside(hour_start) or hour_start < minute_floor:
+                self._merge(summary, bucket)
         
+        for minute_start, bucket in self.minutes:
+            if minute_start + self.MINUTE <= start_ts or minute_start > end_ts:
+                continue
+            hour_start = minute_start - minute_start % self.HOUR
+            if hour_fully_inside(hour_start) or hour_start < minute_floor:
+                continue
+            self._merge(summary, bucket)
+        
+        return summary
+
+class SecurityService:
+    """Advanced security service for VELES DRIVE"""
+    
+    ATTEMPTS_WINDOW = timedelta(hours=1)
+    BLOCK_DURATION = timedelta(hours=24)
+    
+    def __init__(self, store=None, block_cache_seconds: int = 5, sweep_interval_seconds: int = 60):
+        self.store = store or InMemorySecurityStore()
+        self.blocked_ips = {}  # Local snapshot of store blocks: IP -> block_until timestamp
+        self.block_cache_seconds = block_cache_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.suspicious_activities = deque(maxlen=1000)
+        self.active_threats = deque(maxlen=1000)  # High/critical incidents, time-ordered
+        self.incident_buckets = RollingBuckets()
+    
+    def use_store(self, store):
+        """Switch backing store (e.g. to MongoSecurityStore at startup)"""
+        self.store = store
+        self.blocked_ips = {}
+    
     def is_ip_blocked(self, ip_address: str) -> bool:
-        """Check if IP is currently blocked"""
+        """Check if IP is currently blocked (O(1), served from the local snapshot)"""
         if ip_address in self.blocked_ips:
             block_until = self.blocked_ips[ip_address]
             if datetime.now(timezone.utc) < block_until:
@@ -90,34 +465,40 @@ class SecurityService:
                 del self.blocked_ips[ip_address]
         return False
     
-    def record_failed_attempt(self, ip_address: str, user_id: str = None) -> Dict[str, Any]:
+    async def refresh_blocked_ips(self):
+        """Reload the local block snapshot from the store"""
+        self.blocked_ips = await self.store.get_blocked_ips(datetime.now(timezone.utc))
+    
+    async def run_maintenance_loop(self):
+        """Background task: refresh the block snapshot and sweep expired entries"""
+        last_sweep = None
+        while True:
+            try:
+                now = datetime.now(timezone.utc)
+                if not last_sweep or (now - last_sweep).total_seconds() >= self.sweep_interval_seconds:
+                    removed = await self.store.sweep(now, self.ATTEMPTS_WINDOW)
+                    if removed:
+                        logger.info(f"Security store sweep removed {removed} expired entries")
+                    last_sweep = now
+                await self.refresh_blocked_ips()
+            except Exception as e:
+                logger.error(f"Security store maintenance error: {e}")
+            await asyncio.sleep(self.block_cache_seconds)
+    
+    async def record_failed_attempt(self, ip_address: str, user_id: str = None) -> Dict[str, Any]:
         """Record failed login attempt and apply rate limiting"""
         current_time = datetime.now(timezone.utc)
         
-        # Initialize or increment failed attempts
-        if ip_address not in self.failed_attempts:
-            self.failed_attempts[ip_address] = {
-                'count': 0,
-                'first_attempt': current_time,
-                'last_attempt': current_time
-            }
-        
-        attempts = self.failed_attempts[ip_address]
-        attempts['count'] += 1
-        attempts['last_attempt'] = current_time
-        
-        # Calculate time window (reset after 1 hour)
-        time_window = timedelta(hours=1)
-        if current_time - attempts['first_attempt'] > time_window:
-            # Reset counter
-            attempts['count'] = 1
-            attempts['first_attempt'] = current_time
+        # Increment failed attempts (counter resets after 1 hour)
+        attempts = await self.store.record_failed_attempt(ip_address, current_time, self.ATTEMPTS_WINDOW)
         
         # Determine action based on attempt count
         if attempts['count'] >= 10:
             # Block for 24 hours
-            block_duration = timedelta(hours=24)
-            self.blocked_ips[ip_address] = current_time + block_duration
+            block_duration = self.BLOCK_DURATION
+            block_until = current_time + block_duration
+            await self.store.block_ip(ip_address, block_until)
+            self.blocked_ips[ip_address] = block_until
             
             # Log security incident
             self.log_security_incident(
@@ -146,10 +527,9 @@ class SecurityService:
             "attempts_remaining": 10 - attempts['count']
         }
     
-    def clear_failed_attempts(self, ip_address: str):
+    async def clear_failed_attempts(self, ip_address: str):
         """Clear failed attempts for IP (after successful login)"""
-        if ip_address in self.failed_attempts:
-            del self.failed_attempts[ip_address]
+        await self.store.clear_failed_attempts(ip_address)
     
     def log_security_incident(self, type: str, ip_address: str, user_id: str = None, details: str = ""):
         """Log security incidents for monitoring"""
@@ -164,10 +544,12 @@ class SecurityService:
         }
         
         self.suspicious_activities.append(incident)
-        
-        # Keep only last 1000 incidents
-        if len(self.suspicious_activities) > 1000:
-            self.suspicious_activities = self.suspicious_activities[-1000:]
+        if incident["severity"] in ("high", "critical"):
+            self.active_threats.append(incident)
+        self.incident_buckets.add(incident["timestamp"], {
+            "type": incident["type"],
+            "severity": incident["severity"]
+        })
         
         logger.warning(f"Security incident: {type} from {ip_address} - {details}")
     
@@ -184,43 +566,39 @@ class SecurityService:
     
     def get_security_report(self, hours: int = 24) -> Dict[str, Any]:
         """Generate security report for admins"""
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-        recent_incidents = [
-            incident for incident in self.suspicious_activities
-            if incident["timestamp"] > cutoff_time
-        ]
+        now = datetime.now(timezone.utc)
+        cutoff_time = now - timedelta(hours=hours)
+        summary = self.incident_buckets.summarize(cutoff_time, now)
         
-        # Analyze incidents
-        incident_types = {}
         severity_counts = {"low": 0, "medium": 0, "high": 0, "critical": 0}
+        severity_counts.update(summary["counts"].get("severity", {}))
         
-        for incident in recent_incidents:
-            incident_type = incident["type"]
-            incident_types[incident_type] = incident_types.get(incident_type, 0) + 1
-            severity_counts[incident["severity"]] += 1
+        # Newest first until the cutoff, returned in chronological order
+        active_threats = []
+        for incident in reversed(self.active_threats):
+            if incident["timestamp"] <= cutoff_time:
+                break
+            active_threats.append(incident)
+        active_threats.reverse()
         
         return {
             "period_hours": hours,
-            "total_incidents": len(recent_incidents),
-            "incident_types": incident_types,
+            "total_incidents": summary["total"],
+            "incident_types": summary["counts"].get("type", {}),
             "severity_breakdown": severity_counts,
             "blocked_ips": len(self.blocked_ips),
-            "active_threats": [
-                incident for incident in recent_incidents
-                if incident["severity"] in ["high", "critical"]
-            ],
-            "recommendations": self.generate_security_recommendations(recent_incidents)
+            "active_threats": active_threats,
+            "recommendations": self.generate_security_recommendations(summary["total"], severity_counts)
         }
     
-    def generate_security_recommendations(self, incidents: List[Dict]) -> List[str]:
-        """Generate security recommendations based on incidents"""
+    def generate_security_recommendations(self, total_incidents: int, severity_counts: Dict[str, int]) -> List[str]:
+        """Generate security recommendations based on incident counts"""
         recommendations = []
         
-        if len(incidents) > 50:
+        if total_incidents > 50:
             recommendations.append("Высокая активность подозрительных действий. Рассмотрите усиление мониторинга.")
         
-        critical_incidents = [i for i in incidents if i["severity"] == "critical"]
-        if critical_incidents:
+        if severity_counts.get("critical"):
             recommendations.append("Обнаружены критические инциденты безопасности. Требуется немедленное расследование.")
         
         blocked_ips = len(self.blocked_ips)
@@ -229,6 +607,40 @@ class SecurityService:
         
         return recommendations
 
+class TokenRevocationList:
+    """Compact in-memory set of user ids whose access tokens are rejected, synced from MongoDB"""
+    
+    def __init__(self):
+        self.revoked_user_ids = set()
+        self.last_synced: Optional[datetime] = None
+    
+    def is_revoked(self, user_id: str) -> bool:
+        """O(1) check used on every authenticated request"""
+        return user_id in self.revoked_user_ids
+    
+    def revoke(self, user_id: str):
+        """Revoke locally right away; other workers pick it up on next sync"""
+        self.revoked_user_ids.add(user_id)
+    
+    def restore(self, user_id: str):
+        """Lift revocation locally"""
+        self.revoked_user_ids.discard(user_id)
+    
+    async def sync(self, users_collection):
+        """Reload blocked user ids from the users collection"""
+        blocked_ids = await users_collection.distinct("id", {"status": "blocked"})
+        self.revoked_user_ids = set(blocked_ids)
+        self.last_synced = datetime.now(timezone.utc)
+    
+    async def run_sync_loop(self, users_collection, interval_seconds: int = 30):
+        """Background task keeping the set in sync across workers"""
+        while True:
+            try:
+                await self.sync(users_collection)
+            except Exception as e:
+                logger.error(f"Revocation list sync error: {e}")
+            await asyncio.sleep(interval_seconds)
+
 class DataEncryption:
     """Data encryption service for sensitive information"""
     
@@ -288,8 +700,70 @@ class DataEncryption:
 class AuditLog:
     """Audit logging service for compliance and security monitoring"""
     
-    def __init__(self):
-        self.logs = []
+    def __init__(self, history_size: int = 10000, buffer_size: int = 50000,
+                 flush_batch_size: int = 500, flush_interval_seconds: float = 2.0,
+                 per_user_history: int = 1000, max_tracked_users: int = 50000):
+        self.logs = deque(maxlen=history_size)      # Recent entries for in-process reads
+        self.per_user_history = per_user_history
+        self._by_user = LRUCache(maxsize=max_tracked_users)  # user_id -> time-ordered deque
+        self.activity_buckets = RollingBuckets()
+        self._buffer = deque(maxlen=buffer_size)    # Ring buffer of entries pending persistence
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._collection = None
+        self._flush_event: Optional[asyncio.Event] = None
+        self.flushed = 0
+        self.dropped = 0        # Pending entries overwritten because the buffer was full
+        self.flush_errors = 0
+    
+    async def run_flusher(self, collection):
+        """Background task: write buffered entries in batches, by size or every flush interval"""
+        self._collection = collection
+        self._flush_event = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+    
+    async def flush(self) -> int:
+        """Drain the buffer with insert_many batches; returns number of entries written"""
+        if self._collection is None:
+            return 0
+        
+        written = 0
+        while self._buffer:
+            batch = []
+            while self._buffer and len(batch) < self.flush_batch_size:
+                batch.append(self._buffer.popleft())
+            
+            try:
+                # Copies: insert_many adds _id and the originals are also served from self.logs
+                await self._collection.insert_many([dict(entry) for entry in batch], ordered=False)
+            except Exception as e:
+                self.flush_errors += 1
+                logger.error(f"Audit log flush error: {e}")
+                # Put the batch back for the next attempt, keeping newest entries if full
+                free_slots = self._buffer.maxlen - len(self._buffer)
+                self.dropped += max(0, len(batch) - free_slots)
+                self._buffer.extendleft(reversed(batch[-free_slots:] if free_slots else []))
+                break
+            
+            written += len(batch)
+            self.flushed += len(batch)
+        
+        return written
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "buffer_size": self._buffer.maxlen,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flush_errors": self.flush_errors
+        }
     
     def log_user_action(self, user_id: str, action: str, resource: str = None, 
                        ip_address: str = None, details: Dict = None):
@@ -305,61 +779,78 @@ class AuditLog:
             "session_id": details.get("session_id") if details else None
         }
         
+        # Both deques are bounded, so appends stay O(1) and never copy
         self.logs.append(log_entry)
         
-        # Keep only last 10000 logs
-        if len(self.logs) > 10000:
-            self.logs = self.logs[-10000:]
+        user_logs = self._by_user.get(user_id)
+        if user_logs is None:
+            user_logs = self._by_user[user_id] = deque(maxlen=self.per_user_history)
+        user_logs.append(log_entry)
+        self.activity_buckets.add(log_entry["timestamp"], {"action": action, "user_id": user_id})
+        
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(log_entry)
+        if self._flush_event is not None and len(self._buffer) >= self.flush_batch_size:
+            self._flush_event.set()
         
         logger.info(f"Audit log: {user_id} - {action} - {resource}")
     
     def get_user_activity(self, user_id: str, days: int = 30) -> List[Dict]:
         """Get user activity history"""
         cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+        user_logs = self._by_user.get(user_id) or ()
         
-        return [
-            log for log in self.logs
-            if log["user_id"] == user_id and log["timestamp"] > cutoff_date
-        ]
+        # Per-user entries are time-ordered: walk back from the newest until the cutoff
+        activity = []
+        for log in reversed(user_logs):
+            if log["timestamp"] <= cutoff_date:
+                break
+            activity.append(log)
+        activity.reverse()
+        return activity
     
     def get_audit_report(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-        """Generate audit report for date range"""
-        relevant_logs = [
-            log for log in self.logs
-            if start_date <= log["timestamp"] <= end_date
-        ]
-        
-        # Analyze logs
-        action_counts = {}
-        user_activity = {}
+        """Generate audit report for date range from rolling buckets"""
+        summary = self.activity_buckets.summarize(start_date, end_date)
+        user_counts = summary["counts"].get("user_id", {})
+        first_seen = summary["first_seen"].get("user_id", {})
         
-        for log in relevant_logs:
-            action = log["action"]
-            user_id = log["user_id"]
-            
-            action_counts[action] = action_counts.get(action, 0) + 1
-            
-            if user_id not in user_activity:
-                user_activity[user_id] = {"actions": 0, "first_activity": log["timestamp"]}
-            user_activity[user_id]["actions"] += 1
+        most_active_users = [
+            (user_id, {
+                "actions": actions,
+                "first_activity": datetime.fromtimestamp(first_seen[user_id], timezone.utc)
+            })
+            for user_id, actions in heapq.nlargest(10, user_counts.items(), key=lambda x: x[1])
+        ]
         
         return {
             "period": {
                 "start": start_date.isoformat(),
                 "end": end_date.isoformat()
             },
-            "total_actions": len(relevant_logs),
-            "unique_users": len(user_activity),
-            "action_breakdown": action_counts,
-            "most_active_users": sorted(
-                user_activity.items(),
-                key=lambda x: x[1]["actions"],
-                reverse=True
-            )[:10]
+            "total_actions": summary["total"],
+            "unique_users": len(user_counts),
+            "action_breakdown": summary["counts"].get("action", {}),
+            "most_active_users": most_active_users
         }
 
 # Global instances
-two_factor_auth = TwoFactorAuth()
-security_service = SecurityService()
+two_factor_auth = TwoFactorAuth(
+    qr_workers=int(os.environ.get('QR_CODE_WORKERS', 2)),
+    qr_cache_ttl=int(os.environ.get('QR_CODE_CACHE_TTL_SECONDS', 600))
+)
+password_hasher = PasswordHasher(
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+)
+security_service = SecurityService(
+    block_cache_seconds=int(os.environ.get('SECURITY_BLOCK_CACHE_SECONDS', 5)),
+    sweep_interval_seconds=int(os.environ.get('SECURITY_SWEEP_SECONDS', 60))
+)
 data_encryption = DataEncryption()
-audit_log = AuditLog()
\ No newline at end of file
+revocation_list = TokenRevocationList()
+audit_log = AuditLog(
+    buffer_size=int(os.environ.get('AUDIT_LOG_BUFFER_SIZE', 50000)),
+    flush_batch_size=int(os.environ.get('AUDIT_LOG_FLUSH_BATCH', 500)),
+    flush_interval_seconds=float(os.environ.get('AUDIT_LOG_FLUSH_SECONDS', 2))
+)
\ No newline at end of file
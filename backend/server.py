@@ -1,23 +1,46 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, File, UploadFile, Form, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, File, UploadFile, Form, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
+import re
+import json
 import logging
 from pathlib import Path
 from payments import router as payments_router
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any
 import uuid
+import asyncio
+import hashlib
+import secrets
 from datetime import datetime, timezone, timedelta
 from enum import Enum
 import jwt
-from passlib.context import CryptContext
 from integrations import notification_service
 from file_upload import file_upload_service
 from ai_services import ai_recommendation_service, ai_virtual_assistant, ai_analytics_service, process_natural_language_search, ChatMessage
-from security import two_factor_auth, security_service, data_encryption, audit_log
+from security import (two_factor_auth, security_service, data_encryption, audit_log, password_hasher, revocation_list,
+                      MongoSecurityStore, InMemorySecurityStore)
+from cache import user_cache, response_cache
+from catalog_keys import car_search_keys, apply_brand_model_filter, backfill_search_keys
+from catalog_facets import CatalogFacets, empty_facets
+from catalog_search import search_cars, text_filter
+from pagination import KeysetPage, InvalidCursor, SORT_PATTERN, ORDER_PATTERN
+from vehicle_stats import VehicleStats
+from projections import FieldSet, InvalidFields
+from indexes import ensure_indexes, drift_report
+from geo import resolve_geo, parse_near, geo_near_stage, backfill_geo, DISTANCE_FIELD
+from car_import import CarImporter, UploadStreamingResponse, detect_format, read_records
+from car_duplicates import (duplicate_keys, write_error_message, refresh_duplicate_keys, backfill_duplicate_keys,
+                            find_duplicate_clusters, DUPLICATE_VIN_MESSAGE)
+from car_detail import parse_include, car_detail_pipeline, shape_car_detail, InvalidInclude
+from catalog_suggest import CatalogSuggest
+from similar_cars import SimilarCars, FEATURE_FIELDS as SIMILAR_CARS_FEATURE_FIELDS
+from rate_limit import RateLimiter, RateLimitMiddleware, parse_networks, resolve_client_ip
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -28,9 +51,20 @@ client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Security
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 security = HTTPBearer()
 SECRET_KEY = os.environ.get('SECRET_KEY', 'veles-drive-secret-key-2024')
+ACCESS_TOKEN_TTL_MINUTES = int(os.environ.get('ACCESS_TOKEN_TTL_MINUTES', 15))
+REFRESH_TOKEN_TTL_DAYS = int(os.environ.get('REFRESH_TOKEN_TTL_DAYS', 30))
+REVOCATION_SYNC_SECONDS = int(os.environ.get('REVOCATION_SYNC_SECONDS', 30))
+SECURITY_STORE = os.environ.get('SECURITY_STORE', 'mongo')  # mongo (shared by workers) or memory
+RATE_LIMITS_ENABLED = os.environ.get('RATE_LIMITS_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')  # memory (per worker, no round trips) or security (SECURITY_STORE)
+# Peers whose X-Real-IP / X-Forwarded-For are trusted (the nginx container on the compose network)
+TRUSTED_PROXIES = parse_networks(os.environ.get('TRUSTED_PROXIES', '127.0.0.1,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'))
+BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 500))
+BULK_UPDATE_MAX_CARS = int(os.environ.get('BULK_UPDATE_MAX_CARS', 5000))
+MAX_LOGIN_ATTEMPTS = 10
+ACCOUNT_LOCK_DURATION = timedelta(hours=1)
 
 # Create the main app
 app = FastAPI(title="VELES DRIVE API", description="Premium Automotive Business Platform")
@@ -87,6 +121,13 @@ class User(BaseModel):
     account_locked_until: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class TokenPrincipal(BaseModel):
+    """Identity and role taken from access token claims, without a DB lookup"""
+    id: str
+    email: str
+    role: UserRole
+    status: str = "active"
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
@@ -120,6 +161,7 @@ class Car(BaseModel):
     status: CarStatus = CarStatus.AVAILABLE
     is_premium: bool = False
     location: Optional[str] = None
+    geo: Optional[Dict[str, Any]] = None  # GeoJSON point from coordinates or the geocoded location
     # Vehicle type specific fields
     engine_power: Optional[int] = None  # HP for cars, motorcycles
     boat_length: Optional[float] = None  # For boats
@@ -145,11 +187,39 @@ class CarCreate(BaseModel):
     features: List[str] = []
     is_premium: bool = False
     location: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     engine_power: Optional[int] = None
     boat_length: Optional[float] = None
     plane_seats: Optional[int] = None
     hours_operated: Optional[int] = None
 
+class CarPatch(BaseModel):
+    price: Optional[float] = Field(None, gt=0)
+    price_change_percent: Optional[float] = Field(None, gt=-100, le=1000)  # Reprice relative to the current price
+    status: Optional[CarStatus] = None
+    is_premium: Optional[bool] = None
+
+class CarBulkItem(BaseModel):
+    car_id: str
+    update: CarPatch
+
+class CarBulkFilter(BaseModel):
+    vehicle_type: Optional[VehicleType] = None
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    status: Optional[CarStatus] = None  # Any status when omitted
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_year: Optional[int] = None
+    max_year: Optional[int] = None
+    is_premium: Optional[bool] = None
+
+class CarBulkUpdate(BaseModel):
+    items: Optional[List[CarBulkItem]] = None
+    filter: Optional[CarBulkFilter] = None
+    update: Optional[CarPatch] = None
+
 class Dealer(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -165,6 +235,7 @@ class Dealer(BaseModel):
     rating: float = 0.0
     reviews_count: int = 0
     is_verified: bool = False
+    geo: Optional[Dict[str, Any]] = None  # GeoJSON point from coordinates or the geocoded address
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class DealerCreate(BaseModel):
@@ -175,6 +246,8 @@ class DealerCreate(BaseModel):
     email: EmailStr
     website: Optional[str] = None
     working_hours: Dict[str, str] = {}
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class Favorite(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -416,30 +489,177 @@ class LeaseApplication(BaseModel):
     approved_at: Optional[datetime] = None
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict) -> str:
-    return jwt.encode(data, SECRET_KEY, algorithm="HS256")
+    now = datetime.now(timezone.utc)
+    payload = {
+        **data,
+        "type": "access",
+        "iat": now,
+        "exp": now + timedelta(minutes=ACCESS_TOKEN_TTL_MINUTES)
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+async def issue_tokens(user: User, status: str = "active") -> Dict[str, Any]:
+    """Create a short-lived access token with role/status claims and a stored refresh token"""
+    access_token = create_access_token({
+        "user_id": user.id,
+        "email": user.email,
+        "role": user.role.value,
+        "status": status
+    })
+    
+    refresh_token = secrets.token_urlsafe(48)
+    now = datetime.now(timezone.utc)
+    await db.refresh_tokens.insert_one({
+        "id": str(uuid.uuid4()),
+        "user_id": user.id,
+        "token_hash": hash_refresh_token(refresh_token),
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_TTL_DAYS),
+        "revoked": False
+    })
+    
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_MINUTES * 60
+    }
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Validate access token signature, expiry and revocation"""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"], options={"require": ["exp"]})
+    user_id = payload.get("user_id")
+    if not user_id or payload.get("type") != "access":
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    if payload.get("status") == "blocked" or revocation_list.is_revoked(user_id):
+        raise HTTPException(status_code=401, detail="Account blocked")
+    
+    return payload
+
+def user_id_from_token(token: str) -> Optional[str]:
+    """Resolve principal for rate limiting; invalid tokens are limited by IP only"""
+    try:
+        return decode_access_token(token)["user_id"]
+    except Exception:
+        return None
+
+rate_limiter = RateLimiter(
+    security_service,
+    user_id_resolver=user_id_from_token,
+    store=InMemorySecurityStore() if RATE_LIMIT_STORE == "memory" else None,
+    trusted_proxies=TRUSTED_PROXIES
+)
+
+async def get_token_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenPrincipal:
+    """Authorize from token claims only, for read-mostly routes that need just id and role"""
+    try:
+        payload = decode_access_token(credentials.credentials)
+        return TokenPrincipal(
+            id=payload["user_id"],
+            email=payload.get("email", ""),
+            role=payload["role"],
+            status=payload.get("status", "active")
+        )
+    except (jwt.PyJWTError, KeyError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid token")
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
+        payload = decode_access_token(credentials.credentials)
+        user_id = payload["user_id"]
         
+        user = user_cache.get(user_id)
+        if user:
+            return user
+        
+        cache_version = user_cache.version
         user_data = await db.users.find_one({"id": user_id})
         if not user_data:
             raise HTTPException(status_code=401, detail="User not found")
         
-        return User(**user_data)
+        user = User(**user_data)
+        user_cache.set(user_id, user, cache_version)
+        return user
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """MongoDB returns naive UTC datetimes; make them comparable with aware ones"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+async def record_failed_login(user_id: str) -> Optional[Dict[str, Any]]:
+    """Count a bad password and lock the account in one atomic round trip"""
+    now = datetime.now(timezone.utc)
+    locked_until = {"$ifNull": ["$account_locked_until", None]}
+    lock_active = {"$gt": [locked_until, now]}
+    lock_expired = {"$and": [{"$ne": [locked_until, None]}, {"$lte": [locked_until, now]}]}
+    
+    return await db.users.find_one_and_update(
+        {"id": user_id},
+        [
+            # An expired lock starts a fresh counting window
+            {"$set": {"login_attempts": {"$cond": [
+                lock_expired,
+                1,
+                {"$add": [{"$ifNull": ["$login_attempts", 0]}, 1]}
+            ]}}},
+            # Lock once the counter reaches the limit; never shorten an active lock
+            {"$set": {"account_locked_until": {"$cond": [
+                lock_active,
+                "$account_locked_until",
+                {"$cond": [
+                    {"$gte": ["$login_attempts", MAX_LOGIN_ATTEMPTS]},
+                    now + ACCOUNT_LOCK_DURATION,
+                    None
+                ]}
+            ]}}}
+        ],
+        projection={"login_attempts": 1, "account_locked_until": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def complete_login(user_id: str, backup_code: Optional[str] = None) -> bool:
+    """Reset counters and consume a backup code in one atomic round trip.
+    
+    Returns False if the account got locked concurrently or the backup code was already used.
+    """
+    now = datetime.now(timezone.utc)
+    query = {
+        "id": user_id,
+        "$or": [
+            {"account_locked_until": None},
+            {"account_locked_until": {"$lte": now}}
+        ]
+    }
+    update = {
+        "last_login": now,
+        "login_attempts": 0,
+        "account_locked_until": None
+    }
+    
+    if backup_code:
+        query["backup_codes"] = backup_code
+        update["backup_codes"] = {"$filter": {
+            "input": "$backup_codes",
+            "cond": {"$ne": ["$$this", {"$literal": backup_code}]}
+        }}
+    
+    result = await db.users.find_one_and_update(query, [{"$set": update}], projection={"_id": 1})
+    return result is not None
+
 # Routes
 @api_router.get("/")
 async def root():
@@ -452,7 +672,7 @@ async def register(user_data: UserCreate):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     user = User(**user_data.dict(exclude={"password"}))
     
     user_dict = user.dict()
@@ -460,11 +680,10 @@ async def register(user_data: UserCreate):
     
     await db.users.insert_one(user_dict)
     
-    token = create_access_token({"user_id": user.id, "email": user.email})
+    tokens = await issue_tokens(user)
     
     return {
-        "access_token": token,
-        "token_type": "bearer",
+        **tokens,
         "user": user.dict()
     }
 
@@ -479,7 +698,7 @@ async def login(credentials: Dict[str, str], request: Request):
         raise HTTPException(status_code=400, detail="Email and password are required")
     
     # Get client IP for security monitoring
-    client_ip = request.client.host
+    client_ip = resolve_client_ip(request.client.host if request.client else None, request.headers, TRUSTED_PROXIES)
     
     # Check if IP is blocked
     if security_service.is_ip_blocked(client_ip):
@@ -489,37 +708,29 @@ async def login(credentials: Dict[str, str], request: Request):
     user_data = await db.users.find_one({"email": email})
     if not user_data:
         # Record failed attempt
-        security_service.record_failed_attempt(client_ip)
+        await security_service.record_failed_attempt(client_ip)
         raise HTTPException(status_code=400, detail="Invalid email or password")
     
     user = User(**user_data)
     
     # Check if account is locked
-    if user.account_locked_until and datetime.now(timezone.utc) < user.account_locked_until:
+    locked_until = as_utc(user.account_locked_until)
+    if locked_until and datetime.now(timezone.utc) < locked_until:
         raise HTTPException(status_code=423, detail="Account temporarily locked")
     
     # Verify password
-    if not pwd_context.verify(password, user_data["password"]):
+    if not await verify_password(password, user_data["password"]):
         # Record failed attempt
-        security_service.record_failed_attempt(client_ip, user.id)
+        await security_service.record_failed_attempt(client_ip, user.id)
         
-        # Update user login attempts
-        await db.users.update_one(
-            {"id": user.id},
-            {"$inc": {"login_attempts": 1}}
-        )
+        # Increment login attempts and lock after MAX_LOGIN_ATTEMPTS atomically
+        await record_failed_login(user.id)
+        user_cache.invalidate(user.id)
         
-        # Lock account after 10 failed attempts
-        if user.login_attempts >= 9:  # Will be 10 after increment
-            lock_until = datetime.now(timezone.utc) + timedelta(hours=1)
-            await db.users.update_one(
-                {"id": user.id},
-                {"$set": {"account_locked_until": lock_until}}
-            )
-            
         raise HTTPException(status_code=400, detail="Invalid email or password")
     
     # Check 2FA if enabled
+    used_backup_code = None
     if user.two_fa_enabled:
         if not two_fa_token and not backup_code:
             return {
@@ -529,7 +740,6 @@ async def login(credentials: Dict[str, str], request: Request):
         
         # Verify 2FA token or backup code
         is_2fa_valid = False
-        used_backup_code = None
         
         if backup_code:
             if backup_code in user.backup_codes:
@@ -539,27 +749,18 @@ async def login(credentials: Dict[str, str], request: Request):
             is_2fa_valid = two_factor_auth.verify_token(user.two_fa_secret, two_fa_token, window=2)
         
         if not is_2fa_valid:
-            security_service.record_failed_attempt(client_ip, user.id)
+            await security_service.record_failed_attempt(client_ip, user.id)
             raise HTTPException(status_code=400, detail="Invalid 2FA code")
-        
-        # Remove used backup code
+    
+    # Successful login - reset attempts, update last login and consume backup code in one write
+    completed = await complete_login(user.id, used_backup_code)
+    user_cache.invalidate(user.id)
+    if not completed:
         if used_backup_code:
-            remaining_codes = [code for code in user.backup_codes if code != used_backup_code]
-            await db.users.update_one(
-                {"id": user.id},
-                {"$set": {"backup_codes": remaining_codes}}
-            )
+            raise HTTPException(status_code=400, detail="Invalid 2FA code")
+        raise HTTPException(status_code=423, detail="Account temporarily locked")
     
-    # Successful login - clear failed attempts and update last login
-    security_service.clear_failed_attempts(client_ip)
-    await db.users.update_one(
-        {"id": user.id},
-        {"$set": {
-            "last_login": datetime.now(timezone.utc),
-            "login_attempts": 0,
-            "account_locked_until": None
-        }}
-    )
+    await security_service.clear_failed_attempts(client_ip)
     
     # Log successful login
     audit_log.log_user_action(
@@ -572,8 +773,8 @@ async def login(credentials: Dict[str, str], request: Request):
         }
     )
     
-    # Create token
-    token = create_access_token({"user_id": user.id, "email": user.email})
+    # Create tokens
+    tokens = await issue_tokens(user, user_data.get("status", "active"))
     
     # Remove sensitive data from response
     user_dict = user.dict()
@@ -582,7 +783,49 @@ async def login(credentials: Dict[str, str], request: Request):
     if "backup_codes" in user_dict:
         del user_dict["backup_codes"]
     
-    return {"access_token": token, "token_type": "bearer", "user": user_dict}
+    return {**tokens, "user": user_dict}
+
+@api_router.post("/auth/refresh", response_model=Dict[str, Any])
+async def refresh_tokens(credentials: Dict[str, str]):
+    """Exchange a refresh token for a new access/refresh token pair"""
+    refresh_token = credentials.get("refresh_token")
+    if not refresh_token:
+        raise HTTPException(status_code=400, detail="Refresh token is required")
+    
+    # Rotate: the presented token is consumed atomically so it can be used only once
+    now = datetime.now(timezone.utc)
+    token_data = await db.refresh_tokens.find_one_and_update(
+        {
+            "token_hash": hash_refresh_token(refresh_token),
+            "revoked": False,
+            "expires_at": {"$gt": now}
+        },
+        {"$set": {"revoked": True, "rotated_at": now}}
+    )
+    if not token_data:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    user_data = await db.users.find_one({"id": token_data["user_id"]})
+    if not user_data:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    status = user_data.get("status", "active")
+    if status == "blocked":
+        revocation_list.revoke(user_data["id"])
+        raise HTTPException(status_code=401, detail="Account blocked")
+    
+    return await issue_tokens(User(**user_data), status)
+
+@api_router.post("/auth/logout")
+async def logout(credentials: Dict[str, str]):
+    """Revoke a refresh token"""
+    refresh_token = credentials.get("refresh_token")
+    if refresh_token:
+        await db.refresh_tokens.update_one(
+            {"token_hash": hash_refresh_token(refresh_token)},
+            {"$set": {"revoked": True}}
+        )
+    return {"message": "Logged out"}
 
 @api_router.get("/auth/me", response_model=User)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
@@ -593,24 +836,69 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
         del user_dict["password_hash"]
     return user_dict
 
+# List projections: list routes return trusted DB documents trimmed by a Mongo projection
+CAR_FIELDS = FieldSet(
+    allowed=Car.model_fields,
+    default=(
+        "dealer_id", "vehicle_type", "brand", "model", "year", "price", "currency", "mileage",
+        "hours_operated", "engine_type", "engine_power", "transmission", "fuel_type", "color",
+        "boat_length", "plane_seats", "features", "images", "status", "is_premium", "location",
+        "created_at"
+    ),
+    default_slices={"images": 1}
+)
+USER_LIST_FIELDS = FieldSet(
+    # Never password hashes, 2FA secrets or backup codes
+    allowed=(
+        "email", "full_name", "phone", "role", "company_name", "avatar_url", "is_active", "status",
+        "two_fa_enabled", "last_login", "login_attempts", "account_locked_until", "created_at",
+        "block_reason", "blocked_at", "blocked_by"
+    ),
+    default=(
+        "email", "full_name", "phone", "role", "company_name", "avatar_url", "is_active", "status",
+        "two_fa_enabled", "last_login", "created_at"
+    )
+)
+CUSTOMER_FIELDS = FieldSet(allowed=Customer.model_fields, default=Customer.model_fields)
+
+def list_projection(field_set: FieldSet, fields: Optional[str]) -> Dict[str, Any]:
+    try:
+        return field_set.projection(fields)
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+FIELDS_QUERY_DESCRIPTION = "Comma-separated fields to return, or 'all'; defaults to a compact card"
+
 # Cars routes
-@api_router.get("/cars", response_model=List[Car])
-async def get_cars(
+catalog_facets = CatalogFacets(ttl=int(os.environ.get('FACETS_CACHE_TTL_SECONDS', 30)))
+VEHICLE_STATS_FIELDS = {"_id": 0, "status": 1, "vehicle_type": 1, "price": 1}
+vehicle_stats = VehicleStats(
+    [vehicle_type.value for vehicle_type in VehicleType],
+    cache_seconds=float(os.environ.get('VEHICLE_STATS_CACHE_SECONDS', 5))
+)
+VEHICLE_STATS_REBUILD_SECONDS = int(os.environ.get('VEHICLE_STATS_REBUILD_SECONDS', 600))
+similar_cars = SimilarCars()
+SIMILAR_CARS_REBUILD_SECONDS = int(os.environ.get('SIMILAR_CARS_REBUILD_SECONDS', 600))
+catalog_suggest = CatalogSuggest()
+SUGGEST_REBUILD_SECONDS = int(os.environ.get('SUGGEST_REBUILD_SECONDS', 600))
+
+def build_catalog_filter(
+    vehicle_type: Optional[VehicleType] = None,
     brand: Optional[str] = None,
     model: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     min_year: Optional[int] = None,
     max_year: Optional[int] = None,
-    is_premium: Optional[bool] = None,
-    limit: int = Query(20, le=100)
-):
+    is_premium: Optional[bool] = None
+) -> Dict[str, Any]:
+    """Filter for available cars shared by listing and facets"""
     filter_query = {"status": "available"}
     
-    if brand:
-        filter_query["brand"] = {"$regex": brand, "$options": "i"}
-    if model:
-        filter_query["model"] = {"$regex": model, "$options": "i"}
+    if vehicle_type:
+        filter_query["vehicle_type"] = vehicle_type.value
+    
+    apply_brand_model_filter(filter_query, brand, model)
     if min_price is not None:
         filter_query.setdefault("price", {})["$gte"] = min_price
     if max_price is not None:
@@ -622,45 +910,419 @@ async def get_cars(
     if is_premium is not None:
         filter_query["is_premium"] = is_premium
     
-    cars = await db.cars.find(filter_query).limit(limit).to_list(length=None)
-    return [Car(**car) for car in cars]
+    return filter_query
+
+async def fetch_catalog_page(response: Response, filter_query: Dict[str, Any], sort: str, order: str,
+                             cursor: Optional[str], limit: int, projection: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Keyset-paginated catalog query; next page cursor goes to the X-Next-Cursor header"""
+    try:
+        page = KeysetPage(sort, order, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    documents, next_cursor = await page.fetch(db.cars, filter_query, limit, FieldSet.include(projection, sort))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return documents
+
+async def fetch_nearby_cars(filter_query: Dict[str, Any], near: str, radius_km: Optional[float],
+                            limit: int, projection: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Cars nearest to near='lat,lon' first, each with distance_km; a single page, no cursor"""
+    try:
+        lat, lon = parse_near(near)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    pipeline = [
+        geo_near_stage(lat, lon, filter_query, radius_km),
+        {"$limit": limit},
+        {"$project": FieldSet.for_aggregation(FieldSet.include(projection, DISTANCE_FIELD))}
+    ]
+    return await db.cars.aggregate(pipeline).to_list(length=None)
+
+NEAR_QUERY_DESCRIPTION = "'lat,lon': return the nearest cars first with distance_km (no cursor)"
+
+@api_router.get("/cars")
+async def get_cars(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=200),
+    vehicle_type: Optional[VehicleType] = None,
+    brand: Optional[str] = None,
+    model: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    is_premium: Optional[bool] = None,
+    sort: Optional[str] = Query(None, pattern=SORT_PATTERN),
+    order: str = Query("desc", pattern=ORDER_PATTERN),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    near: Optional[str] = Query(None, description=NEAR_QUERY_DESCRIPTION),
+    radius_km: Optional[float] = Query(None, gt=0, le=20000)
+):
+    """Catalog listing; with q and no explicit sort, returns the top matches by text relevance"""
+    filter_query = build_catalog_filter(
+        vehicle_type, brand, model, min_price, max_price, min_year, max_year, is_premium
+    )
+    projection = list_projection(CAR_FIELDS, fields)
+    
+    async def build():
+        if radius_km is not None and not near:
+            raise HTTPException(status_code=400, detail="radius_km requires near")
+        if near:
+            if q or sort or cursor:
+                raise HTTPException(status_code=400, detail="near cannot be combined with q, sort or cursor")
+            return await fetch_nearby_cars(filter_query, near, radius_km, limit, projection)
+        
+        if q:
+            if sort is None:
+                if cursor:
+                    raise HTTPException(status_code=400, detail="Cursor requires an explicit sort when searching")
+                return await search_cars(db.cars, q, filter_query, limit, projection)
+            
+            condition = text_filter(q)
+            if condition is None:
+                return []
+            filter_query.update(condition)
+        
+        return await fetch_catalog_page(response, filter_query, sort or "created_at", order, cursor, limit, projection)
+    
+    return await response_cache.respond(request, ["cars"], build, response)
+
+@api_router.get("/cars/facets")
+async def get_car_facets(
+    q: Optional[str] = Query(None, max_length=200),
+    vehicle_type: Optional[VehicleType] = None,
+    brand: Optional[str] = None,
+    model: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    is_premium: Optional[bool] = None
+):
+    """Brand, type, fuel, transmission, year and price breakdowns for the current catalog filter"""
+    filter_query = build_catalog_filter(
+        vehicle_type, brand, model, min_price, max_price, min_year, max_year, is_premium
+    )
+    if q:
+        condition = text_filter(q)
+        if condition is None:
+            # Same as /cars, which returns no cars for a query with nothing searchable
+            return empty_facets()
+        filter_query.update(condition)
+    
+    return await catalog_facets.get(db.cars, filter_query)
+
+@api_router.get("/cars/suggest")
+async def suggest_cars(prefix: str = Query(..., min_length=1, max_length=100), limit: int = Query(8, ge=1, le=20)):
+    """Brand and model autocomplete with listing counts; Cyrillic and Latin input match the same cars"""
+    return catalog_suggest.suggest(prefix, limit)
+
+@api_router.get("/cars/history")
+async def get_view_history(
+    current_user: TokenPrincipal = Depends(get_token_principal),
+    limit: int = Query(20, le=100),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION)
+):
+    """Get user's car viewing history"""
+    projection = list_projection(CAR_FIELDS, fields)
+    
+    # Get recent views
+    views = await db.view_history.find({"user_id": current_user.id}, {"car_id": 1}).sort("viewed_at", -1).limit(limit).to_list(length=None)
+    car_ids = [view["car_id"] for view in views]
+    
+    # Get cars
+    cars = await db.cars.find({"id": {"$in": car_ids}}, projection).to_list(length=None)
+    
+    # Sort cars by view order
+    cars_dict = {car["id"]: car for car in cars}
+    return [cars_dict[car_id] for car_id in car_ids if car_id in cars_dict]
 
 @api_router.get("/cars/{car_id}", response_model=Car)
-async def get_car(car_id: str):
-    car_data = await db.cars.find_one({"id": car_id})
-    if not car_data:
-        raise HTTPException(status_code=404, detail="Car not found")
-    return Car(**car_data)
+async def get_car(request: Request, car_id: str):
+    async def build():
+        car_data = await db.cars.find_one({"id": car_id})
+        if not car_data:
+            raise HTTPException(status_code=404, detail="Car not found")
+        return Car(**car_data)
+    
+    return await response_cache.respond(request, [f"car:{car_id}"], build)
+
+@api_router.get("/cars/{car_id}/similar")
+async def get_similar_cars(
+    request: Request,
+    car_id: str,
+    limit: int = Query(6, ge=1, le=20),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION)
+):
+    """Available cars closest in price, year, mileage, power, type and brand"""
+    projection = list_projection(CAR_FIELDS, fields)
+    
+    async def build():
+        car = await db.cars.find_one({"id": car_id}, SIMILAR_CARS_FEATURE_FIELDS)
+        if not car:
+            raise HTTPException(status_code=404, detail="Car not found")
+        similar_ids = similar_cars.nearest(car, limit)
+        documents = await db.cars.find({"id": {"$in": similar_ids}}, FieldSet.include(projection, "id")).to_list(length=None)
+        by_id = {document["id"]: document for document in documents}
+        return [by_id[similar_id] for similar_id in similar_ids if similar_id in by_id]
+    
+    return await response_cache.respond(request, ["cars", f"car:{car_id}"], build)
+
+@api_router.get("/cars/{car_id}/full")
+async def get_car_full(
+    request: Request,
+    car_id: str,
+    include: Optional[str] = Query(None, description="Comma-separated parts: dealer, rating, reviews, auction; defaults to all")
+):
+    """Car detail page in one round trip: the car plus dealer summary, rating histogram, top reviews and live auction"""
+    try:
+        parts = parse_include(include)
+    except InvalidInclude as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def build():
+        pipeline = car_detail_pipeline(car_id, parts, datetime.now(timezone.utc))
+        documents = await db.cars.aggregate(pipeline).to_list(length=1)
+        if not documents:
+            raise HTTPException(status_code=404, detail="Car not found")
+        detail = shape_car_detail(documents[0], parts)
+        detail["car"] = Car(**detail["car"])
+        return detail
+    
+    return await response_cache.respond(request, [f"car:{car_id}", "dealers", "auctions"], build)
+
+def build_car_document(car_data: CarCreate, dealer_id: str):
+    """New Car plus the document stored for it (search and duplicate-detection keys included)"""
+    car = Car(
+        **car_data.dict(exclude={"latitude", "longitude"}),
+        dealer_id=dealer_id,
+        geo=resolve_geo(car_data.latitude, car_data.longitude, car_data.location)
+    )
+    car_doc = {**car.dict(), **car_search_keys(car.brand, car.model)}
+    return car, {**car_doc, **duplicate_keys(car_doc)}
 
 @api_router.post("/cars", response_model=Car)
 async def create_car(car_data: CarCreate, current_user: User = Depends(get_current_user)):
     if current_user.role not in [UserRole.DEALER, UserRole.ADMIN]:
         raise HTTPException(status_code=403, detail="Only dealers can add cars")
     
-    car = Car(**car_data.dict(), dealer_id=current_user.id)
-    await db.cars.insert_one(car.dict())
+    car, car_doc = build_car_document(car_data, current_user.id)
+    try:
+        await db.cars.insert_one(car_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=DUPLICATE_VIN_MESSAGE)
+    await vehicle_stats.apply_change(None, car_doc)
+    similar_cars.upsert(car_doc)
+    catalog_suggest.upsert(car_doc)
+    response_cache.invalidate("cars", "vehicle_stats")
     return car
 
+@api_router.post("/cars/bulk")
+async def bulk_import_cars(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$", description="Defaults to the Content-Type"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream a CSV or JSONL file of listings; rows with a VIN upsert the dealer's existing car.
+
+    The response is NDJSON: an error event per rejected row, progress after
+    every batch and a final summary.
+    """
+    if current_user.role not in [UserRole.DEALER, UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Only dealers can add cars")
+    import_format = detect_format(request.headers.get("content-type"), format)
+    if import_format is None:
+        raise HTTPException(status_code=400, detail="Send text/csv or application/x-ndjson, or pass format=csv|jsonl")
+
+    def build_document(payload: Dict[str, Any]):
+        car_data = CarCreate(**payload)
+        car_doc = build_car_document(car_data, current_user.id)[1]
+        # An upsert only overwrites columns the row actually has, plus what derives from them
+        provided = set(car_data.dict(exclude_unset=True))
+        update_fields = (provided - {"latitude", "longitude"}) | {"brand_key", "model_key", "updated_at"}
+        if provided & {"location", "latitude", "longitude"}:
+            update_fields.add("geo")
+        return car_doc, update_fields
+
+    async def on_batch(changes, updated_car_ids):
+        await vehicle_stats.apply_changes(changes)
+        for before, after in changes:
+            if before is None:
+                similar_cars.upsert(after)
+                catalog_suggest.upsert(after)
+        await refresh_duplicate_keys(db.cars, updated_car_ids)
+        await similar_cars.refresh(updated_car_ids)
+        await catalog_suggest.refresh(updated_car_ids)
+        response_cache.invalidate("cars", "vehicle_stats", *(f"car:{car_id}" for car_id in updated_car_ids))
+
+    importer = CarImporter(db.cars, current_user.id, build_document, on_batch, batch_size=BULK_IMPORT_BATCH_SIZE)
+
+    async def events():
+        async for event in importer.run(read_records(request.stream(), import_format)):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+        logger.info(f"Bulk import by {current_user.id}: {importer.progress('summary')}")
+
+    return UploadStreamingResponse(events(), media_type="application/x-ndjson")
+
+def car_patch_fields(car: Dict[str, Any], patch: CarPatch) -> Dict[str, Any]:
+    """$set for one car; ValueError when the patch cannot apply to it"""
+    if patch.price is not None and patch.price_change_percent is not None:
+        raise ValueError("Set either price or price_change_percent")
+    fields = {}
+    if patch.price is not None:
+        fields["price"] = patch.price
+    if patch.price_change_percent is not None:
+        price = car.get("price")
+        if not isinstance(price, (int, float)) or isinstance(price, bool):
+            raise ValueError("Car has no numeric price")
+        fields["price"] = round(price * (1 + patch.price_change_percent / 100), 2)
+    if patch.status is not None:
+        if car.get("status") not in CarStatus._value2member_map_:
+            # approved/rejected belong to the moderation workflow
+            raise ValueError(f"Status '{car.get('status')}' can only be changed by moderation")
+        fields["status"] = patch.status.value
+    if patch.is_premium is not None:
+        fields["is_premium"] = patch.is_premium
+    if not fields:
+        raise ValueError("Nothing to update")
+    return fields
+
+@api_router.patch("/cars/bulk")
+async def bulk_update_cars(body: CarBulkUpdate, current_user: User = Depends(get_current_user)):
+    """Update price, status or premium flag of many cars in one bulk_write.
+
+    Takes either items (car_id + update each) or a filter plus one update.
+    Ownership is checked with a single query; every item gets a result.
+    """
+    if current_user.role not in [UserRole.DEALER, UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Only dealers can update cars")
+    if (body.items is None) == (body.filter is None) or (body.filter is not None) != (body.update is not None):
+        raise HTTPException(status_code=400, detail="Send either items, or filter together with update")
+
+    owner = {} if current_user.role == UserRole.ADMIN else {"dealer_id": current_user.id}
+    projection = {**VEHICLE_STATS_FIELDS, "id": 1, "dealer_id": 1}
+    results: Dict[str, Dict[str, Any]] = {}
+
+    if body.items is not None:
+        if len(body.items) > BULK_UPDATE_MAX_CARS:
+            raise HTTPException(status_code=400, detail=f"At most {BULK_UPDATE_MAX_CARS} items per request")
+        patches = {}
+        for item in body.items:
+            if item.car_id in patches:
+                results.setdefault(item.car_id, {"car_id": item.car_id, "error": "Duplicate car_id"})
+            patches[item.car_id] = item.update
+        cars = await db.cars.find({**owner, "id": {"$in": list(patches)}}, projection).to_list(length=None)
+        found = {car["id"] for car in cars}
+        for car_id in patches:
+            if car_id not in found:
+                results[car_id] = {"car_id": car_id, "error": "Car not found"}
+    else:
+        filter_query = build_catalog_filter(**body.filter.dict(exclude={"status"}))
+        if body.filter.status:
+            filter_query["status"] = body.filter.status.value
+        else:
+            del filter_query["status"]
+        cars = await db.cars.find({**filter_query, **owner}, projection).to_list(length=BULK_UPDATE_MAX_CARS + 1)
+        if len(cars) > BULK_UPDATE_MAX_CARS:
+            raise HTTPException(status_code=400, detail=f"Filter matches more than {BULK_UPDATE_MAX_CARS} cars")
+        patches = {car["id"]: body.update for car in cars}
+
+    operations, pending = [], []
+    now = datetime.now(timezone.utc)
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)  # MongoDB keeps milliseconds
+    for car in cars:
+        if car["id"] in results:
+            continue
+        try:
+            fields = car_patch_fields(car, patches[car["id"]])
+        except ValueError as e:
+            results[car["id"]] = {"car_id": car["id"], "error": str(e)}
+            continue
+        # Only write over the values read above: a relative reprice and the stats snapshot depend on them
+        guard = {name: car.get(name) for name in VEHICLE_STATS_FIELDS if name != "_id"}
+        operations.append(UpdateOne(
+            {"id": car["id"], "dealer_id": car["dealer_id"], **guard},
+            {"$set": {**fields, "updated_at": now}}
+        ))
+        pending.append((car, fields))
+
+    write_errors = {}
+    if operations:
+        try:
+            result = await db.cars.bulk_write(operations, ordered=False)
+            matched = result.matched_count
+        except BulkWriteError as e:
+            write_errors = {error["index"]: write_error_message(error) for error in e.details.get("writeErrors", [])}
+            matched = e.details.get("nMatched", 0)
+        if matched < len(operations) - len(write_errors):
+            # Some guards missed: those cars changed since they were read and were left alone
+            written = {
+                car["id"] async for car in db.cars.find(
+                    {"id": {"$in": [car["id"] for car, _ in pending]}, "updated_at": now}, {"_id": 0, "id": 1}
+                )
+            }
+            for index, (car, _) in enumerate(pending):
+                if index not in write_errors and car["id"] not in written:
+                    write_errors[index] = "Car was changed by another request, retry"
+
+    changes = []
+    for index, (car, fields) in enumerate(pending):
+        if index in write_errors:
+            results[car["id"]] = {"car_id": car["id"], "error": write_errors[index]}
+            continue
+        results[car["id"]] = {"car_id": car["id"], "updated": fields}
+        changes.append((car, {**car, **fields}))
+
+    if changes:
+        await vehicle_stats.apply_changes(changes)
+        await similar_cars.refresh(car["id"] for car, _ in changes)
+        await catalog_suggest.refresh(car["id"] for car, _ in changes)
+        response_cache.invalidate("cars", "vehicle_stats", *(f"car:{car['id']}" for car, _ in changes))
+
+    ordered_ids = [item.car_id for item in body.items] if body.items is not None else [car["id"] for car in cars]
+    return {
+        "matched": len(cars),
+        "updated": len(changes),
+        "failed": sum(1 for result in results.values() if "error" in result),
+        "results": [results[car_id] for car_id in dict.fromkeys(ordered_ids)]
+    }
+
 # Dealers routes
 @api_router.get("/dealers", response_model=List[Dealer])
-async def get_dealers(limit: int = Query(20, le=100)):
-    dealers = await db.dealers.find().limit(limit).to_list(length=None)
-    return [Dealer(**dealer) for dealer in dealers]
+async def get_dealers(request: Request, limit: int = Query(20, le=100)):
+    async def build():
+        dealers = await db.dealers.find().limit(limit).to_list(length=None)
+        return [Dealer(**dealer) for dealer in dealers]
+    
+    return await response_cache.respond(request, ["dealers"], build)
 
 @api_router.get("/dealers/{dealer_id}", response_model=Dealer)
-async def get_dealer(dealer_id: str):
-    dealer_data = await db.dealers.find_one({"id": dealer_id})
-    if not dealer_data:
-        raise HTTPException(status_code=404, detail="Dealer not found")
-    return Dealer(**dealer_data)
+async def get_dealer(request: Request, dealer_id: str):
+    async def build():
+        dealer_data = await db.dealers.find_one({"id": dealer_id})
+        if not dealer_data:
+            raise HTTPException(status_code=404, detail="Dealer not found")
+        return Dealer(**dealer_data)
+    
+    return await response_cache.respond(request, [f"dealer:{dealer_id}"], build)
 
 @api_router.post("/dealers", response_model=Dealer)
 async def create_dealer(dealer_data: DealerCreate, current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.DEALER:
         raise HTTPException(status_code=403, detail="Only dealer accounts can create dealer profiles")
     
-    dealer = Dealer(**dealer_data.dict(), user_id=current_user.id)
+    dealer = Dealer(
+        **dealer_data.dict(exclude={"latitude", "longitude"}),
+        user_id=current_user.id,
+        geo=resolve_geo(dealer_data.latitude, dealer_data.longitude, dealer_data.address)
+    )
     await db.dealers.insert_one(dealer.dict())
+    response_cache.invalidate("dealers")
     return dealer
 
 # Favorites routes
@@ -681,17 +1343,20 @@ async def remove_from_favorites(car_id: str, current_user: User = Depends(get_cu
         raise HTTPException(status_code=404, detail="Favorite not found")
     return {"message": "Removed from favorites"}
 
-@api_router.get("/favorites", response_model=List[Car])
-async def get_favorites(current_user: User = Depends(get_current_user)):
-    favorites = await db.favorites.find({"user_id": current_user.id}).to_list(length=None)
+@api_router.get("/favorites")
+async def get_favorites(
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    current_user: TokenPrincipal = Depends(get_token_principal)
+):
+    projection = list_projection(CAR_FIELDS, fields)
+    favorites = await db.favorites.find({"user_id": current_user.id}, {"car_id": 1}).to_list(length=None)
     car_ids = [fav["car_id"] for fav in favorites]
     
-    cars = await db.cars.find({"id": {"$in": car_ids}}).to_list(length=None)
-    return [Car(**car) for car in cars]
+    return await db.cars.find({"id": {"$in": car_ids}}, projection).to_list(length=None)
 
 # ERP routes for dealers
 @api_router.get("/erp/dashboard")
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
+async def get_dashboard_stats(current_user: TokenPrincipal = Depends(get_token_principal)):
     if current_user.role != UserRole.DEALER:
         raise HTTPException(status_code=403, detail="Only dealers can access ERP")
     
@@ -743,6 +1408,7 @@ async def create_review(review_data: ReviewCreate, current_user: User = Depends(
         {"id": review_data.dealer_id},
         {"$set": {"rating": avg_rating, "reviews_count": len(reviews)}}
     )
+    response_cache.invalidate("dealers", f"dealer:{review_data.dealer_id}")
     
     # Send notification to dealer
     try:
@@ -760,13 +1426,13 @@ async def create_review(review_data: ReviewCreate, current_user: User = Depends(
     return review
 
 @api_router.get("/reviews/my", response_model=List[Review])
-async def get_my_reviews(current_user: User = Depends(get_current_user)):
+async def get_my_reviews(current_user: TokenPrincipal = Depends(get_token_principal)):
     reviews = await db.reviews.find({"user_id": current_user.id}).sort("created_at", -1).to_list(length=None)
     return [Review(**review) for review in reviews]
 
 # Notifications routes
 @api_router.get("/notifications", response_model=List[Notification])
-async def get_notifications(current_user: User = Depends(get_current_user)):
+async def get_notifications(current_user: TokenPrincipal = Depends(get_token_principal)):
     notifications = await db.notifications.find({"user_id": current_user.id}).sort("created_at", -1).to_list(length=None)
     return [Notification(**notif) for notif in notifications]
 
@@ -791,13 +1457,16 @@ async def create_notification(notification_data: NotificationCreate, target_user
 
 # Auctions routes
 @api_router.get("/auctions", response_model=List[Auction])
-async def get_auctions(status: Optional[AuctionStatus] = None, limit: int = Query(20, le=100)):
+async def get_auctions(request: Request, status: Optional[AuctionStatus] = None, limit: int = Query(20, le=100)):
     filter_query = {}
     if status:
         filter_query["status"] = status
     
-    auctions = await db.auctions.find(filter_query).sort("created_at", -1).limit(limit).to_list(length=None)
-    return [Auction(**auction) for auction in auctions]
+    async def build():
+        auctions = await db.auctions.find(filter_query).sort("created_at", -1).limit(limit).to_list(length=None)
+        return [Auction(**auction) for auction in auctions]
+    
+    return await response_cache.respond(request, ["auctions"], build)
 
 @api_router.get("/auctions/{auction_id}", response_model=Auction)
 async def get_auction(auction_id: str):
@@ -829,6 +1498,7 @@ async def create_auction(auction_data: AuctionCreate, current_user: User = Depen
         end_time=end_time
     )
     await db.auctions.insert_one(auction.dict())
+    response_cache.invalidate("auctions")
     return auction
 
 @api_router.get("/auctions/{auction_id}/bids", response_model=List[Bid])
@@ -869,6 +1539,7 @@ async def place_bid(auction_id: str, bid_data: BidCreate, current_user: User = D
         {"id": auction_id},
         {"$set": {"current_price": bid_data.amount}}
     )
+    response_cache.invalidate("auctions")
     
     # Notify other bidders about new bid
     try:
@@ -907,7 +1578,7 @@ async def place_bid(auction_id: str, bid_data: BidCreate, current_user: User = D
 
 # Projects (Trello-style) routes
 @api_router.get("/projects", response_model=List[Project])
-async def get_projects(current_user: User = Depends(get_current_user)):
+async def get_projects(current_user: TokenPrincipal = Depends(get_token_principal)):
     if current_user.role != UserRole.DEALER:
         raise HTTPException(status_code=403, detail="Only dealers can access projects")
     
@@ -977,6 +1648,7 @@ async def upload_car_image(
         images = car_data.get("images", [])
         images.append(result["file_path"])
         await db.cars.update_one({"id": car_id}, {"$set": {"images": images}})
+        response_cache.invalidate("cars", f"car:{car_id}")
         
         return result
         
@@ -997,6 +1669,7 @@ async def upload_avatar(
             {"id": current_user.id}, 
             {"$set": {"avatar_url": result["file_path"]}}
         )
+        user_cache.invalidate(current_user.id)
         
         return result
         
@@ -1025,6 +1698,7 @@ async def upload_dealer_logo(
             {"id": dealer_data["id"]}, 
             {"$set": {"logo_url": result["file_path"]}}
         )
+        response_cache.invalidate("dealers", f"dealer:{dealer_data['id']}")
         
         return result
         
@@ -1081,23 +1755,6 @@ async def record_car_view(car_id: str, current_user: User = Depends(get_current_
     
     return {"message": "View recorded"}
 
-@api_router.get("/cars/history", response_model=List[Car])
-async def get_view_history(current_user: User = Depends(get_current_user), limit: int = Query(20, le=100)):
-    """Get user's car viewing history"""
-    
-    # Get recent views
-    views = await db.view_history.find({"user_id": current_user.id}).sort("viewed_at", -1).limit(limit).to_list(length=None)
-    car_ids = [view["car_id"] for view in views]
-    
-    # Get cars
-    cars = await db.cars.find({"id": {"$in": car_ids}}).to_list(length=None)
-    
-    # Sort cars by view order
-    cars_dict = {car["id"]: car for car in cars}
-    sorted_cars = [cars_dict[car_id] for car_id in car_ids if car_id in cars_dict]
-    
-    return [Car(**car) for car in sorted_cars]
-
 @api_router.post("/comparisons", response_model=CarComparison)
 async def create_comparison(
     car_ids: List[str] = Form(...),
@@ -1120,22 +1777,26 @@ async def create_comparison(
     return comparison
 
 @api_router.get("/comparisons", response_model=List[CarComparison])
-async def get_comparisons(current_user: User = Depends(get_current_user)):
+async def get_comparisons(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get user's car comparisons"""
     
     comparisons = await db.comparisons.find({"user_id": current_user.id}).sort("created_at", -1).to_list(length=None)
     return [CarComparison(**comp) for comp in comparisons]
 
-@api_router.get("/comparisons/{comparison_id}/cars", response_model=List[Car])
-async def get_comparison_cars(comparison_id: str, current_user: User = Depends(get_current_user)):
+@api_router.get("/comparisons/{comparison_id}/cars")
+async def get_comparison_cars(
+    comparison_id: str,
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    current_user: TokenPrincipal = Depends(get_token_principal)
+):
     """Get cars in a comparison"""
+    projection = list_projection(CAR_FIELDS, fields)
     
-    comparison = await db.comparisons.find_one({"id": comparison_id, "user_id": current_user.id})
+    comparison = await db.comparisons.find_one({"id": comparison_id, "user_id": current_user.id}, {"car_ids": 1})
     if not comparison:
         raise HTTPException(status_code=404, detail="Comparison not found")
     
-    cars = await db.cars.find({"id": {"$in": comparison["car_ids"]}}).to_list(length=None)
-    return [Car(**car) for car in cars]
+    return await db.cars.find({"id": {"$in": comparison["car_ids"]}}, projection).to_list(length=None)
 
 @api_router.delete("/comparisons/{comparison_id}")
 async def delete_comparison(comparison_id: str, current_user: User = Depends(get_current_user)):
@@ -1148,15 +1809,19 @@ async def delete_comparison(comparison_id: str, current_user: User = Depends(get
     return {"message": "Comparison deleted"}
 
 # CRM routes for dealers
-@api_router.get("/crm/customers", response_model=List[Customer])
-async def get_customers(current_user: User = Depends(get_current_user), limit: int = Query(50, le=200)):
+@api_router.get("/crm/customers")
+async def get_customers(
+    current_user: TokenPrincipal = Depends(get_token_principal),
+    limit: int = Query(50, le=200),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION)
+):
     """Get dealer's customers"""
     
     if current_user.role != UserRole.DEALER:
         raise HTTPException(status_code=403, detail="Only dealers can access CRM")
     
-    customers = await db.customers.find({"dealer_id": current_user.id}).sort("created_at", -1).limit(limit).to_list(length=None)
-    return [Customer(**customer) for customer in customers]
+    projection = list_projection(CUSTOMER_FIELDS, fields)
+    return await db.customers.find({"dealer_id": current_user.id}, projection).sort("created_at", -1).limit(limit).to_list(length=None)
 
 @api_router.post("/crm/customers", response_model=Customer)
 async def create_customer(customer_data: CustomerCreate, current_user: User = Depends(get_current_user)):
@@ -1176,7 +1841,7 @@ async def create_customer(customer_data: CustomerCreate, current_user: User = De
     return customer
 
 @api_router.get("/crm/customers/{customer_id}", response_model=Customer)
-async def get_customer(customer_id: str, current_user: User = Depends(get_current_user)):
+async def get_customer(customer_id: str, current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get customer details"""
     
     if current_user.role != UserRole.DEALER:
@@ -1209,7 +1874,7 @@ async def update_customer(customer_id: str, customer_data: CustomerCreate, curre
     return Customer(**updated_customer)
 
 @api_router.get("/crm/customers/{customer_id}/sales", response_model=List[Sale])
-async def get_customer_sales(customer_id: str, current_user: User = Depends(get_current_user)):
+async def get_customer_sales(customer_id: str, current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get customer's purchase history"""
     
     if current_user.role != UserRole.DEALER:
@@ -1238,7 +1903,15 @@ async def record_sale(sale_data: Dict[str, Any], current_user: User = Depends(ge
     await db.sales.insert_one(sale.dict())
     
     # Update car status to sold
-    await db.cars.update_one({"id": sale_data["car_id"]}, {"$set": {"status": "sold"}})
+    previous = await db.cars.find_one_and_update(
+        {"id": sale_data["car_id"]},
+        {"$set": {"status": "sold"}},
+        projection=VEHICLE_STATS_FIELDS
+    )
+    await vehicle_stats.apply_change(previous, previous and {**previous, "status": "sold"})
+    similar_cars.remove(sale_data["car_id"])
+    catalog_suggest.remove(sale_data["car_id"])
+    response_cache.invalidate("cars", f"car:{sale_data['car_id']}", "vehicle_stats")
     
     return sale
 
@@ -1284,7 +1957,7 @@ async def create_personal_offer(offer_data: Dict[str, Any], current_user: User =
     return offer
 
 @api_router.get("/crm/offers", response_model=List[PersonalOffer])
-async def get_personal_offers(current_user: User = Depends(get_current_user)):
+async def get_personal_offers(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get dealer's personal offers"""
     
     if current_user.role != UserRole.DEALER:
@@ -1338,7 +2011,7 @@ async def get_insurance_quote(
     return quote
 
 @api_router.get("/services/insurance/quotes", response_model=List[InsuranceQuote])
-async def get_user_insurance_quotes(current_user: User = Depends(get_current_user)):
+async def get_user_insurance_quotes(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get user's insurance quotes"""
     
     quotes = await db.insurance_quotes.find({"user_id": current_user.id}).sort("created_at", -1).to_list(length=None)
@@ -1386,7 +2059,7 @@ async def apply_for_loan(loan_data: Dict[str, Any], current_user: User = Depends
     return application
 
 @api_router.get("/services/loans/applications", response_model=List[LoanApplication])
-async def get_loan_applications(current_user: User = Depends(get_current_user)):
+async def get_loan_applications(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get user's loan applications"""
     
     applications = await db.loan_applications.find({"user_id": current_user.id}).sort("created_at", -1).to_list(length=None)
@@ -1424,7 +2097,7 @@ async def apply_for_lease(lease_data: Dict[str, Any], current_user: User = Depen
     return application
 
 @api_router.get("/services/leasing/applications", response_model=List[LeaseApplication])
-async def get_lease_applications(current_user: User = Depends(get_current_user)):
+async def get_lease_applications(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get user's lease applications"""
     
     applications = await db.lease_applications.find({"user_id": current_user.id}).sort("created_at", -1).to_list(length=None)
@@ -1494,14 +2167,8 @@ async def ai_powered_search(
         
     except Exception as e:
         logger.error(f"AI search error: {e}")
-        # Fallback to regular search
-        cars = await db.cars.find({
-            "$or": [
-                {"brand": {"$regex": query, "$options": "i"}},
-                {"model": {"$regex": query, "$options": "i"}},
-                {"description": {"$regex": query, "$options": "i"}}
-            ]
-        }).limit(limit).to_list(length=None)
+        # Fallback to catalog text search, ranked by relevance
+        cars = await search_cars(db.cars, query, {"status": "available"}, limit)
         
         return {
             "query": query,
@@ -1597,6 +2264,7 @@ async def enhance_car_description(
             {"id": car_id},
             {"$set": {"ai_enhanced_description": enhanced_description}}
         )
+        response_cache.invalidate("cars", f"car:{car_id}")
         
         return {
             "car_id": car_id,
@@ -1642,24 +2310,34 @@ async def get_market_insights(current_user: User = Depends(get_current_user)):
 
 # Security and 2FA endpoints
 @api_router.get("/security/2fa/setup")
-async def setup_2fa(current_user: User = Depends(get_current_user)):
+async def setup_2fa(
+    format: str = Query("png", pattern="^(png|svg)$"),
+    regenerate: bool = Query(False),
+    current_user: User = Depends(get_current_user)
+):
     """Setup 2FA for user account"""
     
     if current_user.two_fa_enabled:
         raise HTTPException(status_code=400, detail="2FA already enabled")
     
     try:
-        # Generate secret
-        secret = two_factor_auth.generate_secret()
-        
-        # Generate QR code
-        qr_code = two_factor_auth.generate_qr_code(current_user.email, secret)
+        secret = current_user.two_fa_secret
+        if not secret or regenerate:
+            if secret:
+                two_factor_auth.forget_qr_codes(current_user.email, secret)
+            
+            # Generate secret
+            secret = two_factor_auth.generate_secret()
+            
+            # Store secret temporarily (not enabled yet)
+            await db.users.update_one(
+                {"id": current_user.id},
+                {"$set": {"two_fa_secret": secret}}
+            )
+            user_cache.invalidate(current_user.id)
         
-        # Store secret temporarily (not enabled yet)
-        await db.users.update_one(
-            {"id": current_user.id},
-            {"$set": {"two_fa_secret": secret}}
-        )
+        # Generate QR code (cached for a pending secret)
+        qr_code = await two_factor_auth.get_qr_code(current_user.email, secret, format)
         
         return {
             "secret": secret,
@@ -1702,6 +2380,8 @@ async def verify_2fa_setup(
                 "last_backup_codes_generated": datetime.now(timezone.utc)
             }}
         )
+        user_cache.invalidate(current_user.id)
+        two_factor_auth.forget_qr_codes(current_user.email, current_user.two_fa_secret)
         
         # Log security event
         audit_log.log_user_action(
@@ -1740,7 +2420,7 @@ async def disable_2fa(
             raise HTTPException(status_code=404, detail="User not found")
         
         # Verify password
-        if not pwd_context.verify(password, user_data["password"]):
+        if not await verify_password(password, user_data["password"]):
             raise HTTPException(status_code=400, detail="Invalid password")
         
         # Verify token or backup code
@@ -1772,6 +2452,7 @@ async def disable_2fa(
             update_data["backup_codes"] = remaining_codes
         
         await db.users.update_one({"id": current_user.id}, {"$set": update_data})
+        user_cache.invalidate(current_user.id)
         
         # Log security event
         audit_log.log_user_action(
@@ -1805,7 +2486,7 @@ async def regenerate_backup_codes(
             raise HTTPException(status_code=404, detail="User not found")
         
         # Verify password
-        if not pwd_context.verify(password, user_data["password"]):
+        if not await verify_password(password, user_data["password"]):
             raise HTTPException(status_code=400, detail="Invalid password")
         
         # Generate new backup codes
@@ -1818,6 +2499,7 @@ async def regenerate_backup_codes(
                 "last_backup_codes_generated": datetime.now(timezone.utc)
             }}
         )
+        user_cache.invalidate(current_user.id)
         
         # Log security event
         audit_log.log_user_action(
@@ -1839,7 +2521,7 @@ async def regenerate_backup_codes(
 @api_router.get("/security/audit-log")
 async def get_user_audit_log(
     days: int = Query(30, le=90),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPrincipal = Depends(get_token_principal)
 ):
     """Get user's audit log"""
     
@@ -1859,7 +2541,7 @@ async def get_user_audit_log(
 @api_router.get("/security/admin/report")
 async def get_security_report(
     hours: int = Query(24, le=168),  # Max 1 week
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPrincipal = Depends(get_token_principal)
 ):
     """Get security report for admins"""
     
@@ -1883,9 +2565,44 @@ async def get_security_report(
         logger.error(f"Security report error: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate security report")
 
+@api_router.get("/security/admin/hasher-stats")
+async def get_password_hasher_stats(current_user: TokenPrincipal = Depends(get_token_principal)):
+    """Get password hashing executor load for admins"""
+    
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can access security reports")
+    
+    return password_hasher.get_stats()
+
+@api_router.get("/security/admin/rate-limits")
+async def get_rate_limit_stats(current_user: TokenPrincipal = Depends(get_token_principal)):
+    """Get rate limit rules and allow/reject counters for admins"""
+    
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can access security reports")
+    
+    return rate_limiter.get_stats()
+
+@api_router.get("/security/admin/audit-log-stats")
+async def get_audit_log_stats(current_user: TokenPrincipal = Depends(get_token_principal)):
+    """Get audit log writer buffer and flush counters for admins"""
+    
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can access security reports")
+    
+    return audit_log.get_stats()
+
 # Vehicle type specific routes
-@api_router.get("/vehicles/{vehicle_type}", response_model=List[Car])
+@api_router.get("/vehicles/stats")
+async def get_vehicles_stats(request: Request):
+    """Get statistics by vehicle type"""
+    
+    return await response_cache.respond(request, ["vehicle_stats"], vehicle_stats.get)
+
+@api_router.get("/vehicles/{vehicle_type}")
 async def get_vehicles_by_type(
+    request: Request,
+    response: Response,
     vehicle_type: VehicleType,
     brand: Optional[str] = None,
     model: Optional[str] = None,
@@ -1894,66 +2611,32 @@ async def get_vehicles_by_type(
     min_year: Optional[int] = None,
     max_year: Optional[int] = None,
     is_premium: Optional[bool] = None,
-    limit: int = Query(20, le=100)
+    sort: Optional[str] = Query(None, pattern=SORT_PATTERN, description="Defaults to created_at"),
+    order: str = Query("desc", pattern=ORDER_PATTERN),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    near: Optional[str] = Query(None, description=NEAR_QUERY_DESCRIPTION),
+    radius_km: Optional[float] = Query(None, gt=0, le=20000)
 ):
     """Get vehicles by type (cars, motorcycles, boats, planes)"""
     
-    filter_query = {"status": "available", "vehicle_type": vehicle_type.value}
-    
-    if brand:
-        filter_query["brand"] = {"$regex": brand, "$options": "i"}
-    if model:
-        filter_query["model"] = {"$regex": model, "$options": "i"}
-    if min_price is not None:
-        filter_query.setdefault("price", {})["$gte"] = min_price
-    if max_price is not None:
-        filter_query.setdefault("price", {})["$lte"] = max_price
-    if min_year is not None:
-        filter_query.setdefault("year", {})["$gte"] = min_year
-    if max_year is not None:
-        filter_query.setdefault("year", {})["$lte"] = max_year
-    if is_premium is not None:
-        filter_query["is_premium"] = is_premium
-    
-    vehicles = await db.cars.find(filter_query).limit(limit).to_list(length=None)
-    return [Car(**vehicle) for vehicle in vehicles]
-
-@api_router.get("/vehicles/stats")
-async def get_vehicles_stats():
-    """Get statistics by vehicle type"""
+    filter_query = build_catalog_filter(
+        vehicle_type, brand, model, min_price, max_price, min_year, max_year, is_premium
+    )
     
-    stats = {}
+    projection = list_projection(CAR_FIELDS, fields)
     
-    for vehicle_type in VehicleType:
-        count = await db.cars.count_documents({
-            "vehicle_type": vehicle_type.value,
-            "status": "available"
-        })
-        
-        # Get price range
-        vehicles = await db.cars.find({
-            "vehicle_type": vehicle_type.value,
-            "status": "available"
-        }).to_list(length=None)
-        
-        if vehicles:
-            prices = [v["price"] for v in vehicles]
-            min_price = min(prices)
-            max_price = max(prices)
-            avg_price = sum(prices) / len(prices)
-        else:
-            min_price = max_price = avg_price = 0
-        
-        stats[vehicle_type.value] = {
-            "count": count,
-            "price_range": {
-                "min": min_price,
-                "max": max_price,
-                "average": avg_price
-            }
-        }
+    async def build():
+        if radius_km is not None and not near:
+            raise HTTPException(status_code=400, detail="radius_km requires near")
+        if near:
+            if sort or cursor:
+                raise HTTPException(status_code=400, detail="near cannot be combined with sort or cursor")
+            return await fetch_nearby_cars(filter_query, near, radius_km, limit, projection)
+        return await fetch_catalog_page(response, filter_query, sort or "created_at", order, cursor, limit, projection)
     
-    return stats
+    return await response_cache.respond(request, ["cars"], build, response)
 
 # Additional Services Endpoints
 @api_router.post("/services/insurance/quote")
@@ -2139,7 +2822,7 @@ async def apply_for_lease(
 
 # Admin Management Endpoints
 @api_router.get("/admin/stats")
-async def get_admin_stats(current_user: User = Depends(get_current_user)):
+async def get_admin_stats(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get admin dashboard statistics"""
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can access statistics")
@@ -2184,6 +2867,44 @@ async def get_admin_stats(current_user: User = Depends(get_current_user)):
         logger.error(f"Admin stats error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get admin statistics")
 
+@api_router.get("/admin/indexes")
+async def get_index_drift(current_user: TokenPrincipal = Depends(get_token_principal)):
+    """Compare declared MongoDB indexes with the ones that exist"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can access index reports")
+    
+    return await drift_report(db)
+
+@api_router.get("/admin/cars/duplicates")
+async def get_duplicate_cars(
+    min_size: int = Query(2, ge=2),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: TokenPrincipal = Depends(get_token_principal)
+):
+    """Clusters of listings that look like the same vehicle (one pass over the listed catalog)"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can access duplicate reports")
+    
+    result = await find_duplicate_clusters(db.cars, min_size)
+    return {
+        "scanned": result["scanned"],
+        "total_clusters": len(result["clusters"]),
+        "clusters": result["clusters"][:limit]
+    }
+
+@api_router.get("/admin/cache/stats")
+async def get_cache_stats(current_user: TokenPrincipal = Depends(get_token_principal)):
+    """Get in-process cache hit/miss counters"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can access cache statistics")
+    
+    return {
+        "user_cache": user_cache.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "catalog_facets": catalog_facets.get_stats(),
+        "catalog_suggest": catalog_suggest.get_stats()
+    }
+
 @api_router.get("/admin/users")
 async def get_all_users(
     skip: int = Query(0, ge=0),
@@ -2191,20 +2912,23 @@ async def get_all_users(
     search: str = Query(None),
     role_filter: str = Query(None),
     status_filter: str = Query(None),
-    current_user: User = Depends(get_current_user)
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    current_user: TokenPrincipal = Depends(get_token_principal)
 ):
     """Get all users for admin management"""
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can access user list")
     
+    projection = list_projection(USER_LIST_FIELDS, fields)
+    
     try:
         # Build filter
         filter_query = {}
         
         if search:
             filter_query["$or"] = [
-                {"full_name": {"$regex": search, "$options": "i"}},
-                {"email": {"$regex": search, "$options": "i"}}
+                {"full_name": {"$regex": re.escape(search), "$options": "i"}},
+                {"email": {"$regex": re.escape(search), "$options": "i"}}
             ]
         
         if role_filter and role_filter != "all":
@@ -2214,14 +2938,14 @@ async def get_all_users(
             filter_query["status"] = status_filter
         
         # Get users
-        users_cursor = db.users.find(filter_query).skip(skip).limit(limit)
+        users_cursor = db.users.find(filter_query, projection).skip(skip).limit(limit)
         users = await users_cursor.to_list(length=None)
         
         # Count total
         total = await db.users.count_documents(filter_query)
         
         return {
-            "users": [User(**user) for user in users],
+            "users": users,
             "total": total,
             "skip": skip,
             "limit": limit
@@ -2254,6 +2978,14 @@ async def block_user(
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="User not found or cannot be blocked")
+        user_cache.invalidate(user_id)
+        
+        # Cut off existing sessions without waiting for access tokens to expire
+        revocation_list.revoke(user_id)
+        await db.refresh_tokens.update_many(
+            {"user_id": user_id, "revoked": False},
+            {"$set": {"revoked": True}}
+        )
         
         return {"message": "User blocked successfully"}
         
@@ -2287,6 +3019,8 @@ async def unblock_user(
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
+        user_cache.invalidate(user_id)
+        revocation_list.restore(user_id)
         
         return {"message": "User unblocked successfully"}
         
@@ -2315,6 +3049,7 @@ async def approve_user(
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Pending user not found")
+        user_cache.invalidate(user_id)
         
         return {"message": "User approved successfully"}
         
@@ -2323,7 +3058,7 @@ async def approve_user(
         raise HTTPException(status_code=500, detail="Failed to approve user")
 
 @api_router.get("/admin/reports")
-async def get_admin_reports(current_user: User = Depends(get_current_user)):
+async def get_admin_reports(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get admin reports"""
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admins can access reports")
@@ -2418,15 +3153,24 @@ async def approve_moderation_item(
         
         # Update the item status based on type
         if item_type == "car":
-            result = await db.cars.update_one(
+            previous = await db.cars.find_one_and_update(
                 {"id": item_id},
-                {"$set": {"status": "approved", "approved_at": datetime.now(timezone.utc)}}
+                {"$set": {"status": "approved", "approved_at": datetime.now(timezone.utc)}},
+                projection=VEHICLE_STATS_FIELDS
             )
+            if previous is None:
+                raise HTTPException(status_code=404, detail="Item not found")
+            await vehicle_stats.apply_change(previous, {**previous, "status": "approved"})
+            similar_cars.remove(item_id)
+            catalog_suggest.remove(item_id)
+            response_cache.invalidate("cars", f"car:{item_id}", "vehicle_stats")
+            result = None
         elif item_type == "dealer":
             result = await db.users.update_one(
                 {"id": item_id, "role": "dealer"},
                 {"$set": {"status": "active", "approved_at": datetime.now(timezone.utc)}}
             )
+            user_cache.invalidate(item_id)
         elif item_type == "review":
             result = await db.reviews.update_one(
                 {"id": item_id},
@@ -2435,7 +3179,7 @@ async def approve_moderation_item(
         else:
             raise HTTPException(status_code=400, detail="Invalid item_type")
         
-        if result.matched_count == 0:
+        if result is not None and result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Item not found")
         
         return {"message": f"{item_type.capitalize()} approved successfully"}
@@ -2462,15 +3206,24 @@ async def reject_moderation_item(
         
         # Update the item status based on type
         if item_type == "car":
-            result = await db.cars.update_one(
+            previous = await db.cars.find_one_and_update(
                 {"id": item_id},
-                {"$set": {"status": "rejected", "rejected_at": datetime.now(timezone.utc)}}
+                {"$set": {"status": "rejected", "rejected_at": datetime.now(timezone.utc)}},
+                projection=VEHICLE_STATS_FIELDS
             )
+            if previous is None:
+                raise HTTPException(status_code=404, detail="Item not found")
+            await vehicle_stats.apply_change(previous, {**previous, "status": "rejected"})
+            similar_cars.remove(item_id)
+            catalog_suggest.remove(item_id)
+            response_cache.invalidate("cars", f"car:{item_id}", "vehicle_stats")
+            result = None
         elif item_type == "dealer":
             result = await db.users.update_one(
                 {"id": item_id, "role": "dealer"},
                 {"$set": {"status": "rejected", "rejected_at": datetime.now(timezone.utc)}}
             )
+            user_cache.invalidate(item_id)
         elif item_type == "review":
             result = await db.reviews.update_one(
                 {"id": item_id},
@@ -2479,7 +3232,7 @@ async def reject_moderation_item(
         else:
             raise HTTPException(status_code=400, detail="Invalid item_type")
         
-        if result.matched_count == 0:
+        if result is not None and result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Item not found")
         
         return {"message": f"{item_type.capitalize()} rejected successfully"}
@@ -2519,6 +3272,7 @@ async def connect_telegram_account(
                 "telegram_notifications_enabled": True
             }}
         )
+        user_cache.invalidate(current_user.id)
         
         # Mark connection as completed
         await db.telegram_connections.update_one(
@@ -2545,6 +3299,7 @@ async def disconnect_telegram_account(current_user: User = Depends(get_current_u
                 "telegram_notifications_enabled": ""
             }}
         )
+        user_cache.invalidate(current_user.id)
         
         return {"message": "Telegram account disconnected successfully"}
         
@@ -2553,7 +3308,7 @@ async def disconnect_telegram_account(current_user: User = Depends(get_current_u
         raise HTTPException(status_code=500, detail="Failed to disconnect Telegram account")
 
 @api_router.get("/telegram/status")
-async def get_telegram_status(current_user: User = Depends(get_current_user)):
+async def get_telegram_status(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get Telegram connection status"""
     try:
         user_data = await db.users.find_one({"id": current_user.id})
@@ -2671,7 +3426,7 @@ async def send_telegram_notification(
 
 @api_router.get("/telegram/users")
 async def get_telegram_users(
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPrincipal = Depends(get_token_principal)
 ):
     """Get users with Telegram integration (admin only)"""
     if current_user.role != UserRole.ADMIN:
@@ -2703,6 +3458,10 @@ async def get_telegram_users(
         logger.error(f"Get Telegram users error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get Telegram users")
 
+# Rate limiting (added before CORS so 429 responses still carry CORS headers)
+if RATE_LIMITS_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # CORS middleware (must be added before routers)
 app.add_middleware(
     CORSMiddleware,
@@ -2710,6 +3469,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Include routers after CORS middleware
@@ -2723,6 +3483,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks = []
+
+async def prepare_indexes():
+    """Backfill vin_key before the unique VIN index is built, so the build sees one holder per VIN"""
+    try:
+        await backfill_duplicate_keys(db.cars)
+    except Exception as e:
+        logger.error(f"Duplicate keys backfill error: {e}")
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if SECURITY_STORE == "mongo":
+        security_store = MongoSecurityStore(db)
+        await security_store.ensure_indexes()
+        security_service.use_store(security_store)
+    
+    background_tasks.append(asyncio.create_task(
+        revocation_list.run_sync_loop(db.users, REVOCATION_SYNC_SECONDS)
+    ))
+    background_tasks.append(asyncio.create_task(security_service.run_maintenance_loop()))
+    background_tasks.append(asyncio.create_task(backfill_search_keys(db.cars)))
+    background_tasks.append(asyncio.create_task(backfill_geo(db.cars, "location")))
+    background_tasks.append(asyncio.create_task(backfill_geo(db.dealers, "address")))
+    background_tasks.append(asyncio.create_task(prepare_indexes()))
+    
+    vehicle_stats.bind(db.cars, db.vehicle_stats)
+    background_tasks.append(asyncio.create_task(vehicle_stats.run_rebuild_loop(VEHICLE_STATS_REBUILD_SECONDS)))
+    similar_cars.bind(db.cars)
+    background_tasks.append(asyncio.create_task(similar_cars.run_rebuild_loop(SIMILAR_CARS_REBUILD_SECONDS)))
+    catalog_suggest.bind(db.cars)
+    background_tasks.append(asyncio.create_task(catalog_suggest.run_rebuild_loop(SUGGEST_REBUILD_SECONDS)))
+    
+    background_tasks.append(asyncio.create_task(audit_log.run_flusher(db.audit_log)))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await audit_log.flush()
     client.close()
\ No newline at end of file
@@ -0,0 +1,188 @@
+import math
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+import numpy as np
+from catalog_keys import normalize_key
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_FEATURES = ("price", "year", "mileage", "engine_power")
+FEATURE_FIELDS = {"_id": 0, "id": 1, "status": 1, "vehicle_type": 1, "brand": 1, "brand_key": 1,
+                  **{name: 1 for name in NUMERIC_FEATURES}}
+# Squared-distance weight per standardized feature; a one-hot mismatch costs its weight
+DEFAULT_WEIGHTS = {"price": 2.0, "year": 1.0, "mileage": 1.0, "engine_power": 0.5, "vehicle_type": 4.0, "brand": 1.0}
+
+def _transform(name: str, value: Any) -> float:
+    """Raw feature value -> the scale it is standardized on; NaN when missing"""
+    if value is None:
+        return math.nan
+    value = float(value)
+    if name == "price":
+        return math.log(value) if value > 0 else math.nan
+    if name == "mileage":
+        return math.log1p(max(value, 0.0))
+    return value
+
+class SimilarCars:
+    """Nearest-neighbour index over available cars, kept in process memory.
+
+    Numeric features live in a column-oriented float32 matrix (one contiguous
+    row per feature), standardized with the mean and spread of the last full
+    build; a missing value sits at the mean. vehicle_type and brand are
+    one-hot features stored as integer codes, so their distance is a single
+    comparison per car instead of a column per brand. Writes patch single
+    rows in O(1); a removal swaps the last row into the hole.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, capacity: int = 1024):
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.numeric_weights = np.array([weights[name] for name in NUMERIC_FEATURES], dtype=np.float32)
+        self.type_weight = weights["vehicle_type"]
+        self.brand_weight = weights["brand"]
+        self.cars = None
+        self._dirty: Optional[Set[str]] = None
+        self._reset(capacity)
+        self.mean = np.zeros(len(NUMERIC_FEATURES), dtype=np.float32)
+        self.scale = np.ones(len(NUMERIC_FEATURES), dtype=np.float32)
+
+    def _reset(self, capacity: int):
+        self.size = 0
+        self.numeric = np.zeros((len(NUMERIC_FEATURES), capacity), dtype=np.float32)
+        self.type_codes = np.zeros(capacity, dtype=np.int32)
+        self.brand_codes = np.zeros(capacity, dtype=np.int32)
+        self.ids: List[Optional[str]] = [None] * capacity
+        self.rows: Dict[str, int] = {}
+        self.codes: Dict[str, Dict[str, int]] = {"vehicle_type": {}, "brand": {}}
+
+    def bind(self, cars_collection):
+        self.cars = cars_collection
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _code(self, kind: str, value: Optional[str]) -> int:
+        codes = self.codes[kind]
+        return codes.setdefault(value or "", len(codes))
+
+    def _vector(self, car: Dict[str, Any]):
+        raw = np.array([_transform(name, car.get(name)) for name in NUMERIC_FEATURES], dtype=np.float32)
+        numeric = np.where(np.isnan(raw), 0.0, (raw - self.mean) / self.scale).astype(np.float32)
+        vehicle_type = getattr(car.get("vehicle_type"), "value", car.get("vehicle_type"))  # Enum from a fresh Car
+        brand = car.get("brand_key") or normalize_key(car.get("brand"))
+        return numeric, self._code("vehicle_type", vehicle_type), self._code("brand", brand)
+
+    def _grow(self):
+        capacity = self.numeric.shape[1] * 2
+        numeric = np.zeros((len(NUMERIC_FEATURES), capacity), dtype=np.float32)
+        numeric[:, :self.size] = self.numeric[:, :self.size]
+        self.numeric = numeric
+        self.type_codes = np.resize(self.type_codes, capacity)
+        self.brand_codes = np.resize(self.brand_codes, capacity)
+        self.ids.extend([None] * (capacity - len(self.ids)))
+
+    def upsert(self, car: Dict[str, Any]):
+        """Add or refresh a car; a car that is no longer available is dropped"""
+        if car.get("status") != "available":
+            self.remove(car["id"])
+            return
+        if self._dirty is not None:
+            self._dirty.add(car["id"])
+        row = self.rows.get(car["id"])
+        if row is None:
+            if self.size == self.numeric.shape[1]:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.rows[car["id"]] = row
+            self.ids[row] = car["id"]
+        self.numeric[:, row], self.type_codes[row], self.brand_codes[row] = self._vector(car)
+
+    def remove(self, car_id: str):
+        if self._dirty is not None:
+            self._dirty.add(car_id)
+        row = self.rows.pop(car_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            moved_id = self.ids[last]
+            self.numeric[:, row] = self.numeric[:, last]
+            self.type_codes[row] = self.type_codes[last]
+            self.brand_codes[row] = self.brand_codes[last]
+            self.ids[row] = moved_id
+            self.rows[moved_id] = row
+        self.ids[last] = None
+        self.size = last
+
+    async def refresh(self, car_ids: Iterable[str]):
+        """Re-read a few cars after a write that did not have their full documents at hand"""
+        car_ids = list(car_ids)
+        if self.cars is None or not car_ids:
+            return
+        found = set()
+        async for car in self.cars.find({"id": {"$in": car_ids}}, FEATURE_FIELDS):
+            found.add(car["id"])
+            self.upsert(car)
+        for car_id in car_ids:
+            if car_id not in found:
+                self.remove(car_id)
+
+    async def rebuild(self):
+        """Load every available car and recompute the standardization"""
+        self._dirty = set()
+        try:
+            docs = await self.cars.find({"status": "available"}, FEATURE_FIELDS).to_list(length=None)
+            raw = np.array(
+                [[_transform(name, car.get(name)) for name in NUMERIC_FEATURES] for car in docs],
+                dtype=np.float64
+            ).reshape(len(docs), len(NUMERIC_FEATURES))
+            counts = np.sum(~np.isnan(raw), axis=0)
+            mean = np.where(counts > 0, np.nansum(raw, axis=0) / np.maximum(counts, 1), 0.0)
+            spread = np.sqrt(np.where(counts > 0, np.nansum((raw - mean) ** 2, axis=0) / np.maximum(counts, 1), 1.0))
+
+            dirty = self._dirty
+            self._dirty = None
+            self.mean = mean.astype(np.float32)
+            self.scale = np.where(spread > 0, spread, 1.0).astype(np.float32)
+            self._reset(max(1024, 1 << max(len(docs), 1).bit_length()))
+            for car in docs:
+                self.upsert(car)
+        finally:
+            self._dirty = None
+        # Writes that landed while the snapshot was loading
+        await self.refresh(dirty)
+        logger.info(f"Similar cars index built with {self.size} cars")
+
+    async def run_rebuild_loop(self, interval_seconds: int):
+        """Periodic rebuild: picks up writes handled by other workers and refreshes scaling"""
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Similar cars rebuild error: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    def nearest(self, car: Dict[str, Any], k: int = 6) -> List[str]:
+        """Ids of the k cars closest to car (itself excluded), closest first"""
+        if self.size == 0:
+            return []
+        row = self.rows.get(car["id"])
+        if row is not None:
+            numeric, type_code, brand_code = self.numeric[:, row], self.type_codes[row], self.brand_codes[row]
+        else:
+            numeric, type_code, brand_code = self._vector(car)
+
+        n = self.size
+        diff = self.numeric[:, :n] - numeric[:, None]
+        distances = self.numeric_weights @ (diff * diff)
+        distances += self.type_weight * (self.type_codes[:n] != type_code)
+        distances += self.brand_weight * (self.brand_codes[:n] != brand_code)
+        if row is not None:
+            distances[row] = np.inf
+
+        k = min(k, n - (row is not None))
+        if k <= 0:
+            return []
+        candidates = np.argpartition(distances, k - 1)[:k]
+        return [self.ids[i] for i in candidates[np.argsort(distances[candidates])]]
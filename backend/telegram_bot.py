@@ -7,6 +7,7 @@ from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQu
 from motor.motor_asyncio import AsyncIOMotorClient
 import uuid
 from typing import Optional, Dict, Any
+from catalog_search import search_cars
 
 # Configure logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
@@ -102,7 +103,7 @@ class VelesDriveTelegramBot:
             "*Основные команды:*\n"
             "/start - начать работу с ботом\n"
             "/help - показать это сообщение\n"
-            "/search [тип] [марка] - поиск транспорта\n"
+            "/search [тип] [запрос] - поиск транспорта по марке, модели и описанию\n"
             "/favorites - показать избранные объявления\n"
             "/profile - информация о вашем профиле\n"
             "/notifications - настройки уведомлений\n"
@@ -110,6 +111,7 @@ class VelesDriveTelegramBot:
             "/disconnect - отвязать аккаунт\n\n"
             "*Примеры поиска:*\n"
             "`/search BMW` - поиск BMW\n"
+            "`/search мерседес белый Москва` - поиск по нескольким словам\n"
             "`/search motorcycle Harley` - поиск мотоциклов Harley\n"
             "`/search boat Azimut` - поиск лодок Azimut\n"
             "`/search plane Cessna` - поиск самолетов Cessna\n\n"
@@ -143,10 +145,9 @@ class VelesDriveTelegramBot:
                 # Check if first arg is vehicle type
                 if search_args[0].lower() in ['car', 'motorcycle', 'boat', 'plane']:
                     vehicle_type = search_args[0].lower()
-                    if len(search_args) > 1:
-                        brand = search_args[1]
+                    brand = " ".join(search_args[1:])
                 else:
-                    brand = search_args[0]
+                    brand = " ".join(search_args)
             
             # Search in database
             search_results = await self.search_vehicles(vehicle_type, brand)
@@ -455,11 +456,11 @@ class VelesDriveTelegramBot:
     async def search_vehicles(self, vehicle_type: str, brand: str = "") -> list:
         """Search vehicles in database"""
         try:
-            query = {"vehicle_type": vehicle_type}
-            if brand:
-                query["brand"] = {"$regex": brand, "$options": "i"}
+            query = {"status": "available", "vehicle_type": vehicle_type}
             
             # Limit to 10 results
+            if brand:
+                return await search_cars(self.db.cars, brand, query, 10)
             vehicles = await self.db.cars.find(query).limit(10).to_list(length=None)
             return vehicles
             
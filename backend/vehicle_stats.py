@@ -0,0 +1,191 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+class VehicleStats:
+    """Materialized per-vehicle-type count and price stats of available cars.
+
+    One document per vehicle type holds count, price sum, min and max. Writes
+    that move a car in or out of the available catalog adjust it with $inc,
+    $min and $max. Min and max cannot be decremented, so removing the car that
+    held one of them recomputes just that type with an index-covered $group.
+    Every write bumps a version, and a rebuild only replaces a document whose
+    version did not move while it aggregated, so concurrent writes are not lost.
+    """
+
+    def __init__(self, vehicle_types: List[str], cache_seconds: float = 5.0):
+        self.vehicle_types = vehicle_types
+        self.cache_seconds = cache_seconds
+        self.cars = None
+        self.stats = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_at = 0.0
+
+    def bind(self, cars_collection, stats_collection):
+        self.cars = cars_collection
+        self.stats = stats_collection
+
+    @staticmethod
+    def _group_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": "$vehicle_type",
+                "count": {"$sum": 1},
+                "price_sum": {"$sum": "$price"},
+                "price_min": {"$min": "$price"},
+                "price_max": {"$max": "$price"}
+            }}
+        ]
+
+    async def rebuild(self, vehicle_type: Optional[str] = None, attempts: int = 3):
+        """Recompute from the cars collection (all types, or one type).
+
+        A type written to during the aggregation is recomputed again, up to
+        attempts times; after that it is left to the next periodic rebuild.
+        """
+        pending = [vehicle_type] if vehicle_type else list(self.vehicle_types)
+        for _ in range(attempts):
+            versions = {
+                doc["_id"]: doc.get("version")
+                async for doc in self.stats.find({"_id": {"$in": pending}}, {"version": 1})
+            }
+            match = {"status": "available", "vehicle_type": {"$in": pending}}
+            groups = {
+                row["_id"]: row
+                for row in await self.cars.aggregate(self._group_pipeline(match)).to_list(length=None)
+            }
+
+            raced = []
+            for type_value in pending:
+                row = groups.get(type_value)
+                doc = {"count": 0, "price_sum": 0, "updated_at": datetime.now(timezone.utc)}
+                if row:
+                    # Empty types leave min/max unset: null sorts below numbers and would stick under $min
+                    doc.update({
+                        "count": row["count"],
+                        "price_sum": row["price_sum"],
+                        "price_min": row["price_min"],
+                        "price_max": row["price_max"]
+                    })
+                if not await self._replace(type_value, doc, type_value in versions, versions.get(type_value)):
+                    raced.append(type_value)
+            self._snapshot = None
+            if not raced:
+                return
+            pending = raced
+        logger.warning(f"Vehicle stats rebuild kept racing with writes for {pending}; retrying on the next rebuild")
+
+    async def _replace(self, vehicle_type: str, doc: Dict[str, Any], existed: bool, version: Optional[int]) -> bool:
+        """Replace the type's document unless it changed since version was read"""
+        doc["version"] = (version or 0) + 1
+        if not existed:
+            try:
+                await self.stats.insert_one({"_id": vehicle_type, **doc})
+                return True
+            except DuplicateKeyError:
+                return False
+        # version None also matches documents written before versions existed
+        result = await self.stats.replace_one({"_id": vehicle_type, "version": version}, doc)
+        return result.matched_count == 1
+
+    async def run_rebuild_loop(self, interval_seconds: int):
+        """Periodic rebuild: corrects drift from failed incremental updates"""
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Vehicle stats rebuild error: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    async def _add(self, vehicle_type: str, prices: List[float]):
+        await self.stats.update_one(
+            {"_id": vehicle_type},
+            {
+                "$inc": {"count": len(prices), "price_sum": sum(prices), "version": 1},
+                "$min": {"price_min": min(prices)},
+                "$max": {"price_max": max(prices)},
+                "$set": {"updated_at": datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
+
+    async def _remove(self, vehicle_type: str, prices: List[float]) -> bool:
+        """Returns True when the type had to be rebuilt"""
+        doc = await self.stats.find_one_and_update(
+            {"_id": vehicle_type},
+            {"$inc": {"count": -len(prices), "price_sum": -sum(prices), "version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            return_document=ReturnDocument.AFTER
+        )
+        if (doc is None or doc["count"] <= 0 or "price_min" not in doc
+                or min(prices) <= doc["price_min"] or max(prices) >= doc["price_max"]):
+            await self.rebuild(vehicle_type)
+            return True
+        return False
+
+    async def apply_change(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Update stats for a car write; before/after need status, vehicle_type and price"""
+        await self.apply_changes([(before, after)])
+
+    async def apply_changes(self, changes: List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]):
+        """Update stats for a batch of car writes with one update per affected vehicle type"""
+        if self.stats is None:
+            return
+
+        removed: Dict[str, List[float]] = {}
+        added: Dict[str, List[float]] = {}
+        for before, after in changes:
+            was = before if before and before.get("status") == "available" else None
+            now = after if after and after.get("status") == "available" else None
+            if was and now and was["vehicle_type"] == now["vehicle_type"] and was["price"] == now["price"]:
+                continue
+            if was:
+                removed.setdefault(was["vehicle_type"], []).append(was["price"])
+            if now:
+                added.setdefault(now["vehicle_type"], []).append(now["price"])
+        if not removed and not added:
+            return
+
+        try:
+            rebuilt = set()
+            for vehicle_type, prices in removed.items():
+                if await self._remove(vehicle_type, prices):
+                    rebuilt.add(vehicle_type)
+            for vehicle_type, prices in added.items():
+                # Changes are applied after the car write, so a rebuild already counted these
+                if vehicle_type not in rebuilt:
+                    await self._add(vehicle_type, prices)
+        except Exception as e:
+            # The snapshot heals on the next rebuild; the car write itself already succeeded
+            logger.error(f"Vehicle stats update error: {e}")
+        self._snapshot = None
+
+    async def get(self) -> Dict[str, Any]:
+        """Stats by vehicle type, served from a short-lived in-process snapshot"""
+        if self._snapshot is not None and time.monotonic() - self._snapshot_at < self.cache_seconds:
+            return self._snapshot
+
+        docs = {doc["_id"]: doc for doc in await self.stats.find({}).to_list(length=None)}
+        snapshot = {}
+        for type_value in self.vehicle_types:
+            doc = docs.get(type_value) or {}
+            count = doc.get("count", 0)
+            if count > 0:
+                price_range = {
+                    "min": doc["price_min"],
+                    "max": doc["price_max"],
+                    "average": doc["price_sum"] / count
+                }
+            else:
+                price_range = {"min": 0, "max": 0, "average": 0}
+            snapshot[type_value] = {"count": count, "price_range": price_range}
+
+        self._snapshot = snapshot
+        self._snapshot_at = time.monotonic()
+        return snapshot
@@ -2,6 +2,8 @@
 print('🚀 Initializing VELES DRIVE database...');
 
 // Создание индексов для оптимизации производительности
+// Полный план индексов объявлен в backend/indexes.py и достраивается при старте backend
+// (python indexes.py --check показывает расхождения)
 db = db.getSiblingDB('veles_drive');
 
 // Users collection indexes
@@ -21,6 +23,36 @@ db.cars.createIndex({ "dealer_id": 1 });
 db.cars.createIndex({ "is_active": 1 });
 db.cars.createIndex({ "created_at": 1 });
 
+// Catalog keyset pagination: (status[, vehicle_type], sort key, id)
+db.cars.createIndex({ "status": 1, "created_at": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "price": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "year": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "mileage": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "created_at": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "price": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "year": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "mileage": 1, "id": 1 });
+
+// Brand/model filtering on normalized keys
+db.cars.createIndex({ "status": 1, "brand_key": 1, "model_key": 1 });
+db.cars.createIndex({ "status": 1, "model_key": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "brand_key": 1, "model_key": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "model_key": 1 });
+
+// Catalog full-text search (Russian stemming); status is an equality prefix
+db.cars.createIndex(
+    {
+        "status": 1,
+        "brand": "text", "model": "text", "brand_key": "text", "model_key": "text",
+        "features": "text", "location": "text", "color": "text", "description": "text"
+    },
+    {
+        name: "catalog_text",
+        default_language: "russian",
+        weights: { brand: 10, brand_key: 10, model: 8, model_key: 8, features: 3, location: 2, color: 2, description: 1 }
+    }
+);
+
 // Reviews collection indexes
 db.reviews.createIndex({ "dealer_id": 1 });
 db.reviews.createIndex({ "user_id": 1 });
@@ -61,6 +93,15 @@ db.telegram_connections.createIndex({ "telegram_id": 1 }, { unique: true });
 db.telegram_connections.createIndex({ "connection_code": 1 });
 db.telegram_connections.createIndex({ "expires_at": 1 });
 
+// Refresh tokens indexes
+db.refresh_tokens.createIndex({ "token_hash": 1 }, { unique: true });
+db.refresh_tokens.createIndex({ "user_id": 1 });
+db.refresh_tokens.createIndex({ "expires_at": 1 }, { expireAfterSeconds: 0 });
+
+// Audit log indexes
+db.audit_log.createIndex({ "user_id": 1, "timestamp": -1 });
+db.audit_log.createIndex({ "timestamp": -1 });
+
 print('✅ Database indexes created successfully!');
 
 // Создание базового администратора (только если нет пользователей)
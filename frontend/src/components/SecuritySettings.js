@@ -64,6 +64,7 @@ const SecuritySettings = () => {
       setLoading(prev => ({ ...prev, setup: true }));
       
       const response = await axios.get(`${backendUrl}/api/security/2fa/setup`, {
+        params: { format: 'svg' },
         headers: { Authorization: `Bearer ${token}` }
       });
       
@@ -67,7 +67,7 @@ const CarsManagement = () => {
 
   const loadCars = async () => {
     try {
-      const response = await axios.get(`${BACKEND_URL}/api/cars?dealer_only=true`);
+      const response = await axios.get(`${BACKEND_URL}/api/cars?dealer_only=true&fields=all`);
       setCars(response.data);
     } catch (error) {
       console.log('Using mock data for dealer cars');
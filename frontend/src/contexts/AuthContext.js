@@ -18,6 +18,20 @@ export const AuthProvider = ({ children }) => {
   const [loading, setLoading] = useState(true);
   const [token, setToken] = useState(localStorage.getItem('veles_token'));
 
+  const storeTokens = (accessToken, refreshToken) => {
+    setToken(accessToken);
+    localStorage.setItem('veles_token', accessToken);
+    if (refreshToken) {
+      localStorage.setItem('veles_refresh_token', refreshToken);
+    }
+  };
+
+  const clearTokens = () => {
+    localStorage.removeItem('veles_token');
+    localStorage.removeItem('veles_refresh_token');
+    setToken(null);
+  };
+
   // Configure axios defaults
   useEffect(() => {
     if (token) {
@@ -27,6 +41,55 @@ export const AuthProvider = ({ children }) => {
     }
   }, [token]);
 
+  // Access tokens are short-lived: on 401 exchange the refresh token once and retry
+  useEffect(() => {
+    let refreshRequest = null;
+
+    const interceptor = axios.interceptors.response.use(
+      response => response,
+      async error => {
+        const originalRequest = error.config;
+        const refreshToken = localStorage.getItem('veles_refresh_token');
+
+        if (
+          error.response?.status !== 401 ||
+          !refreshToken ||
+          !originalRequest ||
+          originalRequest._retried ||
+          originalRequest.url?.includes('/api/auth/')
+        ) {
+          return Promise.reject(error);
+        }
+
+        originalRequest._retried = true;
+
+        try {
+          if (!refreshRequest) {
+            refreshRequest = axios
+              .post(`${BACKEND_URL}/api/auth/refresh`, { refresh_token: refreshToken })
+              .finally(() => { refreshRequest = null; });
+          }
+          const response = await refreshRequest;
+          const { access_token, refresh_token } = response.data;
+
+          storeTokens(access_token, refresh_token);
+          axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
+          originalRequest.headers = {
+            ...originalRequest.headers,
+            Authorization: `Bearer ${access_token}`
+          };
+          return axios(originalRequest);
+        } catch (refreshError) {
+          clearTokens();
+          setUser(null);
+          return Promise.reject(error);
+        }
+      }
+    );
+
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   // Load user from token on app start
   useEffect(() => {
     const loadUser = async () => {
@@ -41,8 +104,7 @@ export const AuthProvider = ({ children }) => {
         setUser(response.data);
       } catch (error) {
         console.error('Token validation failed:', error);
-        localStorage.removeItem('veles_token');
-        setToken(null);
+        clearTokens();
         setUser(null);
       } finally {
         setLoading(false);
@@ -59,11 +121,10 @@ export const AuthProvider = ({ children }) => {
         password
       });
 
-      const { access_token, user: userData } = response.data;
+      const { access_token, refresh_token, user: userData } = response.data;
       
-      setToken(access_token);
+      storeTokens(access_token, refresh_token);
       setUser(userData);
-      localStorage.setItem('veles_token', access_token);
       
       return { success: true };
     } catch (error) {
@@ -77,11 +138,10 @@ export const AuthProvider = ({ children }) => {
     try {
       const response = await axios.post(`${BACKEND_URL}/api/auth/register`, userData);
 
-      const { access_token, user: newUser } = response.data;
+      const { access_token, refresh_token, user: newUser } = response.data;
       
-      setToken(access_token);
+      storeTokens(access_token, refresh_token);
       setUser(newUser);
-      localStorage.setItem('veles_token', access_token);
       
       return { success: true };
     } catch (error) {
@@ -92,9 +152,12 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('veles_refresh_token');
+    if (refreshToken) {
+      axios.post(`${BACKEND_URL}/api/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+    }
     setUser(null);
-    setToken(null);
-    localStorage.removeItem('veles_token');
+    clearTokens();
     delete axios.defaults.headers.common['Authorization'];
   };
 
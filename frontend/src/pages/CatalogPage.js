@@ -14,6 +14,9 @@ const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const CatalogPage = () => {
   const [cars, setCars] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [facets, setFacets] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedForComparison, setSelectedForComparison] = useState([]);
   const [filters, setFilters] = useState({
     vehicleType: 'car',
@@ -23,7 +26,8 @@ const CatalogPage = () => {
     maxPrice: '',
     minYear: '',
     maxYear: '',
-    isPremium: false
+    isPremium: false,
+    sort: 'created_at:desc'
   });
 
   const { user, token } = useContext(AuthContext);
@@ -192,22 +196,34 @@ const CatalogPage = () => {
     loadCars();
   }, [filters]);
 
+  useEffect(() => {
+    loadFacets();
+  }, [filters.vehicleType, filters.brand, filters.model, filters.minPrice, filters.maxPrice,
+      filters.minYear, filters.maxYear, filters.isPremium]);
+
+  const buildQueryParams = () => {
+    const queryParams = new URLSearchParams();
+    const [sortField, sortOrder] = filters.sort.split(':');
+    
+    if (filters.vehicleType) queryParams.append('vehicle_type', filters.vehicleType);
+    if (filters.brand) queryParams.append('brand', filters.brand);
+    if (filters.model) queryParams.append('model', filters.model);
+    if (filters.minPrice) queryParams.append('min_price', filters.minPrice);
+    if (filters.maxPrice) queryParams.append('max_price', filters.maxPrice);
+    if (filters.minYear) queryParams.append('min_year', filters.minYear);
+    if (filters.maxYear) queryParams.append('max_year', filters.maxYear);
+    if (filters.isPremium) queryParams.append('is_premium', 'true');
+    queryParams.append('sort', sortField);
+    queryParams.append('order', sortOrder);
+    return queryParams;
+  };
+
   const loadCars = async () => {
     try {
       setLoading(true);
-      const queryParams = new URLSearchParams();
-      
-      if (filters.vehicleType) queryParams.append('vehicle_type', filters.vehicleType);
-      if (filters.brand) queryParams.append('brand', filters.brand);
-      if (filters.model) queryParams.append('model', filters.model);
-      if (filters.minPrice) queryParams.append('min_price', filters.minPrice);
-      if (filters.maxPrice) queryParams.append('max_price', filters.maxPrice);
-      if (filters.minYear) queryParams.append('min_year', filters.minYear);
-      if (filters.maxYear) queryParams.append('max_year', filters.maxYear);
-      if (filters.isPremium) queryParams.append('is_premium', 'true');
-
-      const response = await axios.get(`${BACKEND_URL}/api/cars?${queryParams}`);
+      const response = await axios.get(`${BACKEND_URL}/api/cars?${buildQueryParams()}`);
       setCars(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.log('Using mock data for catalog');
       // Filter mock data based on vehicleType
@@ -215,11 +231,40 @@ const CatalogPage = () => {
         car.vehicle_type === filters.vehicleType
       );
       setCars(filteredMockCars);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
   };
 
+  const loadFacets = async () => {
+    try {
+      const queryParams = buildQueryParams();
+      queryParams.delete('sort');
+      queryParams.delete('order');
+      const response = await axios.get(`${BACKEND_URL}/api/cars/facets?${queryParams}`);
+      setFacets(response.data);
+    } catch (error) {
+      setFacets(null);
+    }
+  };
+
+  const loadMoreCars = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const queryParams = buildQueryParams();
+      queryParams.append('cursor', nextCursor);
+      const response = await axios.get(`${BACKEND_URL}/api/cars?${queryParams}`);
+      setCars(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error loading more cars:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const formatPrice = (price, currency = 'RUB') => {
     if (currency === 'RUB') {
       return new Intl.NumberFormat('ru-RU').format(price) + ' ₽';
@@ -327,7 +372,13 @@ const CatalogPage = () => {
                   className="form-input w-full"
                   value={filters.brand}
                   onChange={(e) => handleFilterChange('brand', e.target.value)}
+                  list="catalog-brand-facets"
                 />
+                <datalist id="catalog-brand-facets">
+                  {facets?.brands.map((brand) => (
+                    <option key={brand.key} value={brand.value}>{brand.count}</option>
+                  ))}
+                </datalist>
               </div>
               
               <div>
@@ -397,6 +448,21 @@ const CatalogPage = () => {
                 </label>
               </div>
 
+              <div>
+                <label className="block text-sm font-medium text-gray-300 mb-2">Сортировка</label>
+                <select
+                  className="form-input w-full"
+                  value={filters.sort}
+                  onChange={(e) => handleFilterChange('sort', e.target.value)}
+                >
+                  <option value="created_at:desc">Сначала новые</option>
+                  <option value="price:asc">Сначала дешевле</option>
+                  <option value="price:desc">Сначала дороже</option>
+                  <option value="year:desc">Год выпуска: новее</option>
+                  <option value="mileage:asc">Пробег: меньше</option>
+                </select>
+              </div>
+
               <div className="flex items-end">
                 <Button 
                   className="btn-gold w-full"
@@ -435,7 +501,7 @@ const CatalogPage = () => {
                     filters.vehicleType === 'motorcycle' ? 'мотоциклов' :
                     filters.vehicleType === 'boat' ? 'лодок' :
                     'самолетов'
-                  }: <span className="text-gold">{cars.length}</span>
+                  }: <span className="text-gold">{facets ? facets.total : cars.length}</span>
                 </h2>
                 <div className="flex gap-4">
                   <Button variant="ghost" className="text-gray-400 hover:text-white">
@@ -623,6 +689,17 @@ const CatalogPage = () => {
                       </div>
                     </Card>
                   ))}
+                  {nextCursor && (
+                    <div className="col-span-full text-center mt-4">
+                      <Button
+                        className="btn-outline-gold"
+                        onClick={loadMoreCars}
+                        disabled={loadingMore}
+                      >
+                        {loadingMore ? 'Загрузка...' : 'Показать ещё'}
+                      </Button>
+                    </div>
+                  )}
                 </div>
               ) : (
                 <div className="text-center py-16">
@@ -649,7 +726,8 @@ const CatalogPage = () => {
                       maxPrice: '',
                       minYear: '',
                       maxYear: '',
-                      isPremium: false
+                      isPremium: false,
+                      sort: filters.sort
                     })}
                   >
                     Сбросить фильтры
@@ -5,6 +5,8 @@ print('🚀 Инициализация VELES DRIVE database...');
 db = db.getSiblingDB('veles_drive');
 
 // Создание основных индексов для производительности
+// Полный план индексов объявлен в backend/indexes.py и достраивается при старте backend
+// (python indexes.py --check показывает расхождения)
 print('📊 Создание индексов...');
 
 // Users
@@ -16,6 +18,36 @@ db.cars.createIndex({ "brand": 1 });
 db.cars.createIndex({ "price": 1 });
 db.cars.createIndex({ "dealer_id": 1 });
 
+// Catalog pagination
+db.cars.createIndex({ "status": 1, "created_at": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "price": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "year": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "mileage": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "created_at": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "price": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "year": 1, "id": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "mileage": 1, "id": 1 });
+
+// Brand/model keys
+db.cars.createIndex({ "status": 1, "brand_key": 1, "model_key": 1 });
+db.cars.createIndex({ "status": 1, "model_key": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "brand_key": 1, "model_key": 1 });
+db.cars.createIndex({ "status": 1, "vehicle_type": 1, "model_key": 1 });
+
+// Catalog full-text search
+db.cars.createIndex(
+    {
+        "status": 1,
+        "brand": "text", "model": "text", "brand_key": "text", "model_key": "text",
+        "features": "text", "location": "text", "color": "text", "description": "text"
+    },
+    {
+        name: "catalog_text",
+        default_language: "russian",
+        weights: { brand: 10, brand_key: 10, model: 8, model_key: 8, features: 3, location: 2, color: 2, description: 1 }
+    }
+);
+
 // Reviews
 db.reviews.createIndex({ "dealer_id": 1 });
 
@@ -23,6 +55,15 @@ db.reviews.createIndex({ "dealer_id": 1 });
 db.auctions.createIndex({ "status": 1 });
 db.auctions.createIndex({ "end_time": 1 });
 
+// Refresh tokens
+db.refresh_tokens.createIndex({ "token_hash": 1 }, { unique: true });
+db.refresh_tokens.createIndex({ "user_id": 1 });
+db.refresh_tokens.createIndex({ "expires_at": 1 }, { expireAfterSeconds: 0 });
+
+// Audit log
+db.audit_log.createIndex({ "user_id": 1, "timestamp": -1 });
+db.audit_log.createIndex({ "timestamp": -1 });
+
 print('✅ Индексы созданы');
 
 // Создание администратора по умолчанию
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+VELES DRIVE Login Lockout Concurrency Testing
+Fires hundreds of parallel bad passwords at one account and checks that
+the atomic attempt counter and account lock hold under concurrency.
+
+Runs the FastAPI app in-process against a real MongoDB:
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=veles_lockout_test python login_lockout_concurrency_test.py
+Every request comes from its own client IP so the per-IP blocking in
+SecurityService does not mask the per-account lock.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+import logging
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "veles_lockout_test")
+
+import server  # noqa: E402
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PARALLEL_ATTEMPTS = int(os.environ.get("LOCKOUT_PARALLEL_ATTEMPTS", 300))
+
+class LoginLockoutTester:
+    """Concurrency tester for the single-round-trip login state machine"""
+
+    def __init__(self):
+        self.credentials = {
+            "email": f"lockout_{uuid.uuid4().hex[:8]}@velesdrive.com",
+            "password": "LockoutPass123!"
+        }
+        self.results = []
+
+    def client_for(self, ip_address: str) -> httpx.AsyncClient:
+        """ASGI client that presents the given client IP"""
+        transport = httpx.ASGITransport(app=server.app, client=(ip_address, 40000))
+        return httpx.AsyncClient(transport=transport, base_url="http://testserver/api")
+
+    async def login(self, ip_address: str, password: str) -> int:
+        async with self.client_for(ip_address) as client:
+            response = await client.post("/auth/login", json={
+                "email": self.credentials["email"],
+                "password": password
+            })
+            return response.status_code
+
+    def log_test_result(self, test_name: str, success: bool, details: str = ""):
+        status = "✅ PASS" if success else "❌ FAIL"
+        logger.info(f"{status} - {test_name}: {details}")
+        self.results.append(success)
+
+    async def run(self) -> bool:
+        async with self.client_for("10.0.0.1") as client:
+            response = await client.post("/auth/register", json={
+                **self.credentials,
+                "full_name": "Lockout Test",
+                "role": "buyer"
+            })
+            if response.status_code != 200:
+                logger.error(f"Registration failed: {response.status_code} {response.text}")
+                return False
+            user_id = response.json()["user"]["id"]
+
+        # Parallel bad passwords, one IP each
+        statuses = await asyncio.gather(*[
+            self.login(f"10.1.{i // 250}.{i % 250 + 1}", f"wrong-{i}")
+            for i in range(PARALLEL_ATTEMPTS)
+        ])
+        breakdown = Counter(statuses)
+        logger.info(f"Status breakdown for {PARALLEL_ATTEMPTS} bad logins: {dict(breakdown)}")
+
+        user_data = await server.db.users.find_one({"id": user_id})
+        attempts = user_data.get("login_attempts", 0)
+        locked_until = user_data.get("account_locked_until")
+
+        self.log_test_result(
+            "No bad password succeeds",
+            breakdown.get(200, 0) == 0,
+            f"{breakdown.get(200, 0)} successful logins"
+        )
+        self.log_test_result(
+            "Every password check was counted",
+            attempts == breakdown.get(400, 0),
+            f"login_attempts={attempts}, rejected passwords={breakdown.get(400, 0)}"
+        )
+        self.log_test_result(
+            "Account locked after limit",
+            locked_until is not None and attempts >= server.MAX_LOGIN_ATTEMPTS,
+            f"account_locked_until={locked_until}"
+        )
+
+        status = await self.login("10.2.0.1", self.credentials["password"])
+        self.log_test_result(
+            "Correct password rejected while locked",
+            status == 423,
+            f"status={status}"
+        )
+
+        await server.db.users.delete_one({"id": user_id})
+        await server.db.refresh_tokens.delete_many({"user_id": user_id})
+        return all(self.results)
+
+async def main():
+    tester = LoginLockoutTester()
+    success = await tester.run()
+    print("\n" + "=" * 60)
+    print(f"LOGIN LOCKOUT CONCURRENCY: {'PASSED' if success else 'FAILED'}")
+    print("=" * 60)
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+VELES DRIVE Login Storm Benchmark
+Measures login throughput and latency of unrelated catalog reads
+(GET /api/cars) while many concurrent logins hash passwords
+"""
+
+import asyncio
+import aiohttp
+import os
+import time
+import uuid
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BASE_URL = os.environ.get("BENCH_BASE_URL", "http://localhost:8001/api")
+LOGIN_CONCURRENCY = int(os.environ.get("BENCH_LOGIN_CONCURRENCY", 32))
+DURATION_SECONDS = float(os.environ.get("BENCH_DURATION", 10))
+READ_INTERVAL_SECONDS = 0.01
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class LoginStormBenchmark:
+    """Runs a login storm against the API and samples catalog read latency"""
+
+    def __init__(self):
+        self.base_url = BASE_URL
+        self.session = None
+        self.credentials = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60))
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.session:
+            await self.session.close()
+
+    async def create_user(self):
+        """Register a throwaway buyer account"""
+        self.credentials = {
+            "email": f"storm_{uuid.uuid4().hex[:8]}@velesdrive.com",
+            "password": "StormPass123!"
+        }
+        payload = {**self.credentials, "full_name": "Login Storm", "role": "buyer"}
+        async with self.session.post(f"{self.base_url}/auth/register", json=payload) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Registration failed: {response.status} {await response.text()}")
+
+    async def sample_reads(self, stop_at: float) -> list:
+        """Issue GET /cars back to back and record latencies in ms"""
+        latencies = []
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            async with self.session.get(f"{self.base_url}/cars", params={"limit": 20}) as response:
+                await response.read()
+            latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(READ_INTERVAL_SECONDS)
+        return latencies
+
+    async def login_worker(self, stop_at: float, results: dict):
+        """Log in repeatedly until the deadline"""
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            async with self.session.post(f"{self.base_url}/auth/login", json=self.credentials) as response:
+                await response.read()
+                key = "ok" if response.status == 200 else f"status_{response.status}"
+            results[key] = results.get(key, 0) + 1
+            results.setdefault("latencies", []).append((time.perf_counter() - started) * 1000)
+
+    async def run_phase(self, with_storm: bool) -> dict:
+        """Run one measurement phase"""
+        stop_at = time.perf_counter() + DURATION_SECONDS
+        results = {}
+        tasks = [asyncio.create_task(self.sample_reads(stop_at))]
+        if with_storm:
+            tasks += [
+                asyncio.create_task(self.login_worker(stop_at, results))
+                for _ in range(LOGIN_CONCURRENCY)
+            ]
+        read_latencies, *_ = await asyncio.gather(*tasks)
+
+        login_latencies = results.pop("latencies", [])
+        return {
+            "reads": len(read_latencies),
+            "read_p50_ms": percentile(read_latencies, 50),
+            "read_p99_ms": percentile(read_latencies, 99),
+            "logins_per_second": results.get("ok", 0) / DURATION_SECONDS,
+            "login_p99_ms": percentile(login_latencies, 99),
+            "login_statuses": results
+        }
+
+    async def run(self):
+        """Baseline phase, then storm phase"""
+        await self.create_user()
+
+        logger.info(f"Baseline: GET /cars only for {DURATION_SECONDS}s")
+        baseline = await self.run_phase(with_storm=False)
+        logger.info(f"Storm: {LOGIN_CONCURRENCY} concurrent logins for {DURATION_SECONDS}s")
+        storm = await self.run_phase(with_storm=True)
+
+        print("\n" + "=" * 60)
+        print("LOGIN STORM BENCHMARK")
+        print("=" * 60)
+        print(f"GET /cars p50/p99 baseline: {baseline['read_p50_ms']:.1f} / {baseline['read_p99_ms']:.1f} ms ({baseline['reads']} reads)")
+        print(f"GET /cars p50/p99 storm:    {storm['read_p50_ms']:.1f} / {storm['read_p99_ms']:.1f} ms ({storm['reads']} reads)")
+        print(f"Login throughput:           {storm['logins_per_second']:.1f} logins/s")
+        print(f"Login p99:                  {storm['login_p99_ms']:.1f} ms")
+        print(f"Login statuses:             {storm['login_statuses']}")
+        return storm
+
+async def main():
+    async with LoginStormBenchmark() as benchmark:
+        await benchmark.run()
+
+if __name__ == "__main__":
+    asyncio.run(main())
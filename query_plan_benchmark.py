@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+VELES DRIVE Query Plan Benchmark
+Seeds a scratch MongoDB database with synthetic data, builds the backend
+index plan and explains the filter/sort shapes used by API routes
+(backend/server.py) and the Telegram bot (backend/telegram_bot.py).
+Exits non-zero when a hot shape falls back to COLLSCAN or examines too many
+documents per document returned.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from indexes import ensure_indexes
+from catalog_keys import car_search_keys, apply_brand_model_filter
+from catalog_search import text_filter
+from catalog_facets import facet_pipeline
+from pagination import KeysetPage
+from vehicle_stats import VehicleStats
+from geo import geocode_location, geo_near_stage
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("BENCH_DB_NAME", "veles_drive_query_bench")
+CARS = int(os.environ.get("BENCH_CARS", 50000))
+USERS = int(os.environ.get("BENCH_USERS", 5000))
+DEALERS = int(os.environ.get("BENCH_DEALERS", 200))
+AUCTIONS = int(os.environ.get("BENCH_AUCTIONS", 2000))
+MAX_RATIO = float(os.environ.get("BENCH_MAX_RATIO", 10))
+RUNS = int(os.environ.get("BENCH_RUNS", 5))
+KEEP_DB = os.environ.get("BENCH_KEEP_DB", "false").lower() == "true"
+REPORT_PATH = os.environ.get("BENCH_REPORT_PATH")
+INSERT_BATCH = 5000
+
+BRANDS = {
+    "Toyota": ["Camry", "Corolla", "RAV4", "Land Cruiser"],
+    "BMW": ["X5", "3 Series", "5 Series", "X3"],
+    "Mercedes-Benz": ["E-Class", "S-Class", "GLE", "C-Class"],
+    "Лада": ["Веста", "Гранта", "Нива"],
+    "Kia": ["Rio", "Sportage", "K5"],
+    "Hyundai": ["Solaris", "Creta", "Tucson"],
+    "Audi": ["A4", "A6", "Q7"],
+    "Volkswagen": ["Polo", "Tiguan", "Passat"],
+    "Haval": ["Jolion", "F7", "H9"],
+    "Chery": ["Tiggo 4", "Tiggo 7 Pro", "Tiggo 8"],
+    "Porsche": ["Cayenne", "911", "Macan"],
+    "Yamaha": ["MT-07", "R1", "FX Cruiser"],
+    "Cessna": ["172 Skyhawk", "Citation"],
+}
+VEHICLE_TYPES = (["car"] * 85) + (["motorcycle"] * 8) + (["boat"] * 5) + (["plane"] * 2)
+STATUSES = (["available"] * 80) + (["sold"] * 15) + (["reserved"] * 5)
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Екатеринбург", "Новосибирск", "Краснодар"]
+COLORS = ["белый", "черный", "серый", "синий", "красный", "серебристый"]
+FEATURES = ["кожаный салон", "панорамная крыша", "подогрев сидений", "полный привод", "адаптивный круиз", "камера 360"]
+
+class QueryShape:
+    """One filter/sort/limit (find) or pipeline (aggregate) as a route sends it"""
+
+    def __init__(self, route, source, collection, filter=None, sort=None, limit=0, projection=None,
+                 pipeline=None, hot=True, max_ratio=MAX_RATIO):
+        self.route = route
+        self.source = source
+        self.collection = collection
+        self.filter = filter or {}
+        self.sort = sort
+        self.limit = limit
+        self.projection = projection
+        self.pipeline = pipeline
+        self.hot = hot              # Hot shapes fail the run; others are reported only
+        self.max_ratio = max_ratio  # None where the route summarizes every match (facets, counts)
+
+    def command(self) -> dict:
+        if self.pipeline is not None:
+            return {"aggregate": self.collection, "pipeline": self.pipeline, "cursor": {}}
+        command = {"find": self.collection, "filter": self.filter}
+        if self.sort:
+            command["sort"] = self.sort
+        if self.projection:
+            command["projection"] = self.projection
+        if self.limit:
+            command["limit"] = self.limit
+        return command
+
+def count_pipeline(filter_query: dict) -> list:
+    """What count_documents() sends"""
+    return [{"$match": filter_query}, {"$group": {"_id": 1, "n": {"$sum": 1}}}]
+
+def keyset_sort(page: KeysetPage) -> dict:
+    return dict(page.sort)
+
+def winning_plan_and_stats(explain: dict):
+    """(winningPlan, executionStats) for find and aggregate explain output"""
+    if "stages" in explain:
+        first = explain["stages"][0]
+        cursor_stage = first.get("$cursor") or first.get("$geoNearCursor")
+        return cursor_stage["queryPlanner"]["winningPlan"], cursor_stage["executionStats"]
+    return explain["queryPlanner"]["winningPlan"], explain["executionStats"]
+
+def walk_plan(plan: dict):
+    """Yield every stage of a plan tree (classic and slot-based explain formats)"""
+    if "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    stack = [plan]
+    while stack:
+        stage = stack.pop()
+        yield stage
+        if "inputStage" in stage:
+            stack.append(stage["inputStage"])
+        stack.extend(stage.get("inputStages", []))
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class QueryPlanBenchmark:
+    """Seeds data, builds indexes and checks the plan of every route's query shape"""
+
+    def __init__(self):
+        self.client = None
+        self.db = None
+        self.random = random.Random(42)
+        self.sample = {}
+
+    async def __aenter__(self):
+        self.client = AsyncIOMotorClient(MONGO_URL)
+        self.db = self.client[DB_NAME]
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.client:
+            if not KEEP_DB:
+                await self.client.drop_database(DB_NAME)
+            self.client.close()
+
+    async def insert(self, collection: str, documents: list):
+        for start in range(0, len(documents), INSERT_BATCH):
+            await self.db[collection].insert_many(documents[start:start + INSERT_BATCH], ordered=False)
+
+    def moment(self, days: int = 730) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=self.random.randint(0, days * 86400))
+
+    async def seed(self):
+        """Synthetic dataset shaped like production: skewed statuses, types and brands"""
+        rnd = self.random
+        await self.client.drop_database(DB_NAME)
+
+        users = [{
+            "id": str(uuid.uuid4()),
+            "email": f"user{i}@bench.velesdrive.com",
+            "full_name": f"Пользователь {i}",
+            "role": "dealer" if i < DEALERS else "buyer",
+            "status": "active",
+            "created_at": self.moment()
+        } for i in range(USERS)]
+        for user in rnd.sample(users, USERS // 10):
+            user["telegram_chat_id"] = rnd.randint(10 ** 8, 10 ** 10)
+        dealer_users = users[:DEALERS]
+        buyers = users[DEALERS:]
+        await self.insert("users", users)
+
+        dealers = [{
+            "id": str(uuid.uuid4()),
+            "user_id": user["id"],
+            "company_name": f"Автосалон {i}",
+            "address": rnd.choice(CITIES),
+            "phone": f"+7900{i:07d}",
+            "email": user["email"],
+            "rating": 0.0,
+            "created_at": self.moment()
+        } for i, user in enumerate(dealer_users)]
+        await self.insert("dealers", dealers)
+
+        cars = []
+        for _ in range(CARS):
+            brand = rnd.choice(list(BRANDS))
+            model = rnd.choice(BRANDS[brand])
+            location = rnd.choice(CITIES)
+            created_at = self.moment()
+            cars.append({
+                "id": str(uuid.uuid4()),
+                "dealer_id": rnd.choice(dealer_users)["id"],
+                "vehicle_type": rnd.choice(VEHICLE_TYPES),
+                "brand": brand,
+                "model": model,
+                "year": rnd.randint(2000, 2025),
+                "price": float(rnd.randint(300, 30000) * 1000),
+                "currency": "RUB",
+                "mileage": rnd.randint(0, 300000),
+                "color": rnd.choice(COLORS),
+                "location": location,
+                "geo": geocode_location(location),
+                "features": rnd.sample(FEATURES, 2),
+                "description": f"{brand} {model} в хорошем состоянии",
+                "images": [],
+                "status": rnd.choice(STATUSES),
+                "is_premium": rnd.random() < 0.1,
+                "created_at": created_at,
+                "updated_at": created_at,
+                **car_search_keys(brand, model)
+            })
+        await self.insert("cars", cars)
+
+        favorites, views, notifications, tokens = [], [], [], []
+        for user in buyers:
+            for car in rnd.sample(cars, rnd.randint(0, 5)):
+                favorites.append({"id": str(uuid.uuid4()), "user_id": user["id"], "car_id": car["id"], "created_at": self.moment()})
+            for car in rnd.sample(cars, rnd.randint(0, 20)):
+                views.append({"id": str(uuid.uuid4()), "user_id": user["id"], "car_id": car["id"], "viewed_at": self.moment(90)})
+            for i in range(rnd.randint(0, 8)):
+                notifications.append({
+                    "id": str(uuid.uuid4()), "user_id": user["id"], "title": "Уведомление", "message": str(i),
+                    "is_read": rnd.random() < 0.5, "created_at": self.moment(90)
+                })
+            tokens.append({
+                "token_hash": uuid.uuid4().hex, "user_id": user["id"], "revoked": False,
+                "expires_at": datetime.now(timezone.utc) + timedelta(days=30)
+            })
+        await self.insert("favorites", favorites)
+        await self.insert("view_history", views)
+        await self.insert("notifications", notifications)
+        await self.insert("refresh_tokens", tokens)
+
+        reviews = [{
+            "id": str(uuid.uuid4()), "user_id": rnd.choice(buyers)["id"], "dealer_id": rnd.choice(dealers)["id"],
+            "rating": rnd.randint(1, 5), "created_at": self.moment()
+        } for _ in range(USERS)]
+        await self.insert("reviews", reviews)
+
+        auctions, bids = [], []
+        for car in rnd.sample(cars, min(AUCTIONS, CARS)):
+            start = self.moment(60)
+            auction = {
+                "id": str(uuid.uuid4()), "car_id": car["id"], "dealer_id": car["dealer_id"],
+                "start_price": car["price"], "current_price": car["price"], "min_bid_increment": 1000.0,
+                "start_time": start, "end_time": start + timedelta(days=3),
+                "status": rnd.choice(["active", "ended", "cancelled"]), "created_at": start
+            }
+            auctions.append(auction)
+            for i in range(rnd.randint(0, 20)):
+                bids.append({
+                    "id": str(uuid.uuid4()), "auction_id": auction["id"], "user_id": rnd.choice(buyers)["id"],
+                    "amount": car["price"] + 1000.0 * (i + 1), "created_at": start + timedelta(minutes=i)
+                })
+        await self.insert("auctions", auctions)
+        await self.insert("bids", bids)
+
+        customers, sales = [], []
+        for dealer in dealer_users:
+            for i in range(20):
+                customers.append({
+                    "id": str(uuid.uuid4()), "dealer_id": dealer["id"], "name": f"Клиент {i}",
+                    "email": f"client{i}.{dealer['id'][:8]}@bench.velesdrive.com", "phone": f"+7901{i:07d}",
+                    "created_at": self.moment()
+                })
+            for customer in rnd.sample(customers[-20:], 5):
+                sales.append({
+                    "id": str(uuid.uuid4()), "dealer_id": dealer["id"], "customer_id": customer["id"],
+                    "car_id": rnd.choice(cars)["id"], "sale_price": 1000000.0, "sale_date": self.moment()
+                })
+        await self.insert("customers", customers)
+        await self.insert("sales", sales)
+
+        comparisons = [{
+            "id": str(uuid.uuid4()), "user_id": user["id"], "car_ids": [car["id"] for car in rnd.sample(cars, 3)],
+            "created_at": self.moment()
+        } for user in rnd.sample(buyers, len(buyers) // 5)]
+        await self.insert("comparisons", comparisons)
+
+        connections = [{
+            "connection_code": uuid.uuid4().hex[:8].upper(), "user_id": user["id"], "status": "pending",
+            "created_at": self.moment(1).isoformat()
+        } for user in rnd.sample(buyers, len(buyers) // 10)]
+        await self.insert("telegram_connections", connections)
+
+        available = [car for car in cars if car["status"] == "available"]
+        viewer_id = Counter(view["user_id"] for view in views).most_common(1)[0][0]
+        self.sample = {
+            "user": next(user for user in buyers if user["id"] == viewer_id),
+            "telegram_user": next(user for user in users if "telegram_chat_id" in user),
+            "dealer_user": dealer_users[0],
+            "dealer": dealers[0],
+            "car": rnd.choice(cars),
+            "available_car": rnd.choice(available),
+            "favorite": favorites[0],
+            "auction": auctions[0],
+            "customer": customers[0],
+            "comparison": comparisons[0],
+            "connection": connections[0],
+            "token": tokens[0],
+            "car_ids": [car["id"] for car in rnd.sample(cars, 20)]
+        }
+        logger.info(
+            f"Seeded {len(users)} users, {len(cars)} cars, {len(favorites)} favorites, "
+            f"{len(views)} views, {len(bids)} bids, {len(notifications)} notifications"
+        )
+
+    def build_shapes(self) -> list:
+        s = self.sample
+        user_id, dealer_user_id = s["user"]["id"], s["dealer_user"]["id"]
+        available = {"status": "available"}
+        newest = KeysetPage("created_at", "desc")
+        by_price = KeysetPage("price", "asc")
+        next_page = KeysetPage("price", "asc", by_price.encode_cursor(s["available_car"]))
+        text_sort = {"score": {"$meta": "textScore"}, "id": 1}
+        text_projection = {"score": {"$meta": "textScore"}}
+
+        shapes = [
+            # Auth
+            QueryShape("POST /auth/login", "server.py", "users", {"email": s["user"]["email"]}, limit=1),
+            QueryShape("token principal / get_current_user", "server.py", "users", {"id": user_id}, limit=1),
+            QueryShape("POST /auth/refresh", "server.py", "refresh_tokens", {
+                "token_hash": s["token"]["token_hash"], "revoked": False, "expires_at": {"$gt": datetime.now(timezone.utc)}
+            }, limit=1),
+
+            # Catalog
+            QueryShape("GET /cars", "server.py", "cars", newest.apply(dict(available)), keyset_sort(newest), limit=21),
+            QueryShape("GET /cars?sort=price&cursor=", "server.py", "cars", next_page.apply(dict(available)), keyset_sort(next_page), limit=21),
+            QueryShape("GET /vehicles/{type}", "server.py", "cars", {**available, "vehicle_type": "motorcycle"}, keyset_sort(newest), limit=21),
+            QueryShape("GET /cars?brand=", "server.py", "cars",
+                       apply_brand_model_filter(dict(available), "мерседес"), keyset_sort(newest), limit=21,
+                       max_ratio=None),
+            QueryShape("GET /cars?brand=&model=", "server.py", "cars",
+                       apply_brand_model_filter(dict(available), "toyota", "camry"), keyset_sort(newest), limit=21,
+                       max_ratio=None),
+            QueryShape("GET /cars?q=", "server.py", "cars", {**available, **text_filter("toyota camry")},
+                       text_sort, limit=20, projection=text_projection, max_ratio=None),
+            QueryShape("GET /cars/facets", "server.py", "cars", pipeline=facet_pipeline(dict(available)), max_ratio=None),
+            QueryShape("GET /cars/facets?vehicle_type=", "server.py", "cars",
+                       pipeline=facet_pipeline({**available, "vehicle_type": "car"}), max_ratio=None),
+            QueryShape("vehicle stats rebuild", "vehicle_stats.py", "cars",
+                       pipeline=VehicleStats._group_pipeline(dict(available)), max_ratio=None),
+            QueryShape("vehicle stats rebuild (one type)", "vehicle_stats.py", "cars",
+                       pipeline=VehicleStats._group_pipeline({**available, "vehicle_type": "boat"}), max_ratio=None),
+            QueryShape("GET /cars?near=&radius_km=", "server.py", "cars",
+                       pipeline=[geo_near_stage(55.75, 37.62, dict(available), 100), {"$limit": 20}]),
+            QueryShape("GET /vehicles/{type}?near=", "server.py", "cars",
+                       pipeline=[geo_near_stage(59.93, 30.34, {**available, "vehicle_type": "car"}), {"$limit": 20}]),
+            QueryShape("GET /cars/{id}", "server.py", "cars", {"id": s["car"]["id"]}, limit=1),
+            QueryShape("POST /crm/sales (car check)", "server.py", "cars",
+                       {"id": s["car"]["id"], "dealer_id": s["car"]["dealer_id"]}, limit=1),
+            QueryShape("GET /cars/history (cars)", "server.py", "cars", {"id": {"$in": s["car_ids"]}}),
+            QueryShape("GET /erp/dashboard (counts)", "server.py", "cars",
+                       pipeline=count_pipeline({"dealer_id": dealer_user_id, "status": "sold"}), max_ratio=None),
+
+            # User data
+            QueryShape("GET /cars/history", "server.py", "view_history", {"user_id": user_id},
+                       {"viewed_at": -1}, limit=20, projection={"car_id": 1}),
+            QueryShape("GET /favorites", "server.py", "favorites", {"user_id": user_id}, projection={"car_id": 1}),
+            QueryShape("POST /favorites/{car_id}", "server.py", "favorites",
+                       {"user_id": s["favorite"]["user_id"], "car_id": s["favorite"]["car_id"]}, limit=1),
+            QueryShape("GET /notifications", "server.py", "notifications", {"user_id": user_id}, {"created_at": -1}),
+            QueryShape("GET /comparisons", "server.py", "comparisons", {"user_id": s["comparison"]["user_id"]}),
+            QueryShape("GET /comparisons/{id}/cars", "server.py", "comparisons",
+                       {"id": s["comparison"]["id"], "user_id": s["comparison"]["user_id"]}, limit=1),
+
+            # Dealers, reviews, auctions
+            QueryShape("GET /dealers/{id}", "server.py", "dealers", {"id": s["dealer"]["id"]}, limit=1),
+            QueryShape("POST /upload/dealer-logo", "server.py", "dealers", {"user_id": dealer_user_id}, limit=1),
+            QueryShape("GET /reviews/dealer/{id}", "server.py", "reviews", {"dealer_id": s["dealer"]["id"]},
+                       {"created_at": -1}, limit=20),
+            QueryShape("POST /reviews (duplicate check)", "server.py", "reviews",
+                       {"user_id": user_id, "dealer_id": s["dealer"]["id"]}, limit=1),
+            QueryShape("GET /auctions", "server.py", "auctions", {}, {"created_at": -1}, limit=20),
+            QueryShape("GET /auctions?status=", "server.py", "auctions", {"status": "active"}, {"created_at": -1}, limit=20),
+            QueryShape("GET /auctions/{id}", "server.py", "auctions", {"id": s["auction"]["id"]}, limit=1),
+            QueryShape("GET /auctions/{id}/bids", "server.py", "bids", {"auction_id": s["auction"]["id"]}, {"amount": -1}),
+            # GET /cars/{id}/full: each $lookup probes its foreign collection like these finds
+            QueryShape("GET /cars/{id}/full (car)", "car_detail.py", "cars", {"id": s["car"]["id"]}, limit=1),
+            QueryShape("GET /cars/{id}/full (dealer)", "car_detail.py", "dealers", {"user_id": dealer_user_id}, limit=1),
+            QueryShape("GET /cars/{id}/full (top reviews)", "car_detail.py", "reviews", {"dealer_id": s["dealer"]["id"]},
+                       {"rating": -1, "created_at": -1}, limit=5),
+            QueryShape("GET /cars/{id}/full (live auction)", "car_detail.py", "auctions", {
+                "car_id": s["auction"]["car_id"], "status": "active", "end_time": {"$gt": datetime.now(timezone.utc)}
+            }, {"created_at": -1}, limit=1),
+
+            # CRM
+            QueryShape("GET /crm/customers", "server.py", "customers", {"dealer_id": s["customer"]["dealer_id"]}),
+            QueryShape("GET /crm/customers/{id}", "server.py", "customers",
+                       {"id": s["customer"]["id"], "dealer_id": s["customer"]["dealer_id"]}, limit=1),
+            QueryShape("GET /crm/customers/{id}/sales", "server.py", "sales",
+                       {"customer_id": s["customer"]["id"], "dealer_id": s["customer"]["dealer_id"]}, {"sale_date": -1}),
+
+            # Telegram
+            QueryShape("POST /telegram/connect", "server.py", "telegram_connections",
+                       {"connection_code": s["connection"]["connection_code"], "status": "pending"}, limit=1),
+            QueryShape("bot: user by chat id", "telegram_bot.py", "users",
+                       {"telegram_chat_id": s["telegram_user"]["telegram_chat_id"]}, limit=1),
+            QueryShape("bot: /search <type>", "telegram_bot.py", "cars", {**available, "vehicle_type": "boat"}, limit=10),
+            QueryShape("bot: /search <type> <brand>", "telegram_bot.py", "cars",
+                       {**available, "vehicle_type": "car", **text_filter("bmw")},
+                       text_sort, limit=10, projection=text_projection, max_ratio=None),
+            QueryShape("bot: /favorites", "telegram_bot.py", "favorites", {"user_id": user_id}),
+
+            # Admin (reported, not enforced)
+            QueryShape("GET /admin/users?role=", "server.py", "users", {"role": "dealer"}, limit=50, hot=False),
+        ]
+        return shapes
+
+    async def measure(self, shape: QueryShape) -> dict:
+        explain = await self.db.command({"explain": shape.command(), "verbosity": "executionStats"})
+        plan, stats = winning_plan_and_stats(explain)
+        stages = list(walk_plan(plan))
+        stage_names = [stage.get("stage") for stage in stages]
+        index_names = sorted({stage["indexName"] for stage in stages if stage.get("indexName")})
+
+        latencies = []
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            await self.db.command(shape.command())
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        returned = stats.get("nReturned", 0)
+        examined = stats.get("totalDocsExamined", 0)
+        ratio = examined / max(returned, 1)
+
+        problems = []
+        if "COLLSCAN" in stage_names:
+            problems.append("COLLSCAN")
+        if shape.max_ratio is not None and ratio > shape.max_ratio:
+            problems.append(f"examined/returned {ratio:.1f} > {shape.max_ratio:g}")
+
+        return {
+            "route": shape.route,
+            "source": shape.source,
+            "collection": shape.collection,
+            "hot": shape.hot,
+            "indexes": index_names,
+            "stages": stage_names,
+            "keys_examined": stats.get("totalKeysExamined", 0),
+            "docs_examined": examined,
+            "returned": returned,
+            "ratio": ratio,
+            "ratio_enforced": shape.max_ratio is not None,
+            "execution_ms": stats.get("executionTimeMillis", 0),
+            "latency_p50_ms": percentile(latencies, 50),
+            "problems": problems,
+            "failed": bool(problems) and shape.hot
+        }
+
+    async def run(self) -> list:
+        logger.info(f"Seeding {DB_NAME} at {MONGO_URL} ({CARS} cars, {USERS} users)")
+        await self.seed()
+        logger.info("Building the backend index plan")
+        await ensure_indexes(self.db)
+
+        results = [await self.measure(shape) for shape in self.build_shapes()]
+
+        print("\n" + "=" * 100)
+        print("QUERY PLAN BENCHMARK")
+        print("=" * 100)
+        print(f"{'route':<40} {'index':<34} {'keys':>7} {'docs':>7} {'ret':>5} {'ratio':>7} {'p50 ms':>7}")
+        for result in results:
+            index = ", ".join(result["indexes"]) or "-"
+            ratio = f"{result['ratio']:.1f}" + ("" if result["ratio_enforced"] else "*")
+            marker = "FAIL " if result["failed"] else ("warn " if result["problems"] else "")
+            print(
+                f"{result['route'][:40]:<40} {index[:34]:<34} {result['keys_examined']:>7} "
+                f"{result['docs_examined']:>7} {result['returned']:>5} {ratio:>7} {result['latency_p50_ms']:>7.1f}"
+                + (f"  {marker}{'; '.join(result['problems'])}" if result["problems"] else "")
+            )
+        print("* ratio reported only: the route aggregates or ranks every match")
+
+        failures = [result for result in results if result["failed"]]
+        print(f"\n{len(results)} shapes, {len(failures)} failing (max examined/returned {MAX_RATIO:g})")
+
+        if REPORT_PATH:
+            with open(REPORT_PATH, "w", encoding="utf-8") as report:
+                json.dump(results, report, indent=2, ensure_ascii=False)
+            logger.info(f"Report written to {REPORT_PATH}")
+        return failures
+
+async def main():
+    async with QueryPlanBenchmark() as benchmark:
+        failures = await benchmark.run()
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())